@@ -14,7 +14,7 @@ from typing import List
 import yaml
 from yaml.constructor import ConstructorError
 
-from c7n import deprecated
+from c7n import deprecated, tagplan
 from c7n.exceptions import ClientError, PolicyValidationError
 from c7n.loader import SourceLocator
 from c7n.provider import clouds
@@ -303,17 +303,28 @@ def run(options, policies: List[Policy]) -> None:
             sys.exit(1)
 
     errored_policies: List[str] = []
-    for policy in policies:
+    with tagplan.run_scope() as planner:
+        for policy in policies:
+            try:
+                policy()
+            except Exception:
+                exit_code = 2
+                errored_policies.append(policy.name)
+                if options.debug:
+                    raise
+                log.exception(
+                    "Error while executing policy %s, continuing" % (
+                        policy.name))
         try:
-            policy()
+            planner.flush()
         except Exception:
             exit_code = 2
-            errored_policies.append(policy.name)
             if options.debug:
                 raise
-            log.exception(
-                "Error while executing policy %s, continuing" % (
-                    policy.name))
+            log.exception("Error while applying planned tag mutations")
+    for name in sorted(planner.errored):
+        if name not in errored_policies:
+            errored_policies.append(name)
     if exit_code != 0:
         log.error("The following policies had errors while executing\n - %s" % (
             "\n - ".join(errored_policies)))
@@ -13,6 +13,8 @@ class Element:
 
     permissions = ()
     metrics = ()
+    # top level resource attributes this element reads, None if unknown.
+    resource_keys = None
 
     executor_factory = ThreadPoolExecutor
 
@@ -24,6 +26,15 @@ class Element:
     def get_permissions(self):
         return self.permissions
 
+    def get_resource_keys(self):
+        """Return the top level resource attributes this element reads.
+
+        Used to determine which resource augmentation steps a policy
+        needs, a return value of None means the element may read any
+        attribute and resources must be fully augmented.
+        """
+        return self.resource_keys
+
     def validate(self):
         """Validate the current element's configuration.
 
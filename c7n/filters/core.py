@@ -41,6 +41,27 @@ class FilterValidationError(Exception):
 ANNOTATION_KEY = "c7n:MatchedFilters"
 
 
+# A plain jmespath path ie. Foo, Foo.Bar, Foo[0].Bar
+RESOURCE_KEY_REGEX = re.compile(r'^([A-Za-z_]\w*)(?:\.[A-Za-z_]\w*|\[\d+\])*$')
+
+
+def resource_key(expr):
+    """Return the top level resource attribute referenced by a filter key.
+
+    Returns None for expressions we can't resolve to a single attribute,
+    ie. jmespath functions, quoted identifiers, or/and/pipe expressions,
+    projections and filter expressions.
+    """
+    if not isinstance(expr, str):
+        return None
+    if expr.startswith('tag:'):
+        return 'Tags'
+    m = RESOURCE_KEY_REGEX.match(expr)
+    if m is None:
+        return None
+    return m.group(1)
+
+
 def glob_match(value, pattern):
     if not isinstance(value, str):
         return False
@@ -602,6 +623,29 @@ class ValueFilter(BaseValueFilter):
     def get_resource_value(self, k, i):
         return super(ValueFilter, self).get_resource_value(k, i, self.data.get('value_regex'))
 
+    def get_resource_keys(self):
+        # subclasses typically evaluate their key against a document
+        # other than the resource.
+        if self.type != 'value':
+            return super().get_resource_keys()
+        if self.data.get('value_type') == 'resource_count':
+            return ()
+        if len(self.data) == 1:
+            exprs = list(self.data.keys())
+        else:
+            exprs = [self.data.get('key')]
+        if 'value_path' in self.data:
+            exprs.append(self.data['value_path'])
+        if self.data.get('value_type') == 'expr':
+            exprs.append(self.data.get('value'))
+        keys = set()
+        for e in exprs:
+            k = resource_key(e)
+            if k is None:
+                return None
+            keys.add(k)
+        return keys
+
     def get_path_value(self, i):
         """Retrieve values using JMESPath.
 
@@ -808,6 +852,7 @@ class EventFilter(ValueFilter):
 
     schema = type_schema('event', rinherit=ValueFilter.schema)
     schema_alias = True
+    resource_keys = ()
 
     def validate(self):
         if 'mode' not in self.manager.data:
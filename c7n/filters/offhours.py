@@ -361,6 +361,13 @@ class Time(Filter):
         self.parse_errors = []
         self.enabled_count = 0
 
+        # resolved schedules and timezones by tag value
+        self.schedules = {}
+        # skip days are resolved once per run, and evaluation results
+        # are shared by resources with the same tag value.
+        self.skip_days = None
+        self.evaluations = None
+
     def validate(self):
         if self.get_tz(self.default_tz) is None:
             raise PolicyValidationError(
@@ -377,7 +384,12 @@ class Time(Filter):
         return self
 
     def process(self, resources, event=None):
-        resources = super(Time, self).process(resources)
+        self.skip_days = None
+        self.evaluations = {}
+        try:
+            resources = super(Time, self).process(resources)
+        finally:
+            self.evaluations = None
         if self.parse_errors and self.manager and self.manager.ctx.log_dir:
             self.log.warning("parse errors %d", len(self.parse_errors))
             with open(join(
@@ -429,40 +441,58 @@ class Time(Filter):
         # dateutil.parser.parse to process: value='off=(m-f,1);' properly.
         # before this normalization, some cases would silently fail.
         value = ';'.join(filter(None, value.split(';')))
-        if self.parser.has_resource_schedule(value, time_type):
-            schedule = self.parser.parse(value)
-        elif self.parser.keys_are_valid(value):
-            # respect timezone from tag
-            raw_data = self.parser.raw_data(value)
-            if 'tz' in raw_data:
-                schedule = dict(self.default_schedule)
-                schedule['tz'] = raw_data['tz']
-            else:
-                schedule = self.default_schedule
-        else:
-            schedule = None
+        schedule, tz = self.get_schedule(value, time_type)
         if schedule is None:
             log.warning(
                 "Invalid schedule on resource:%s value:%s", rid, value)
             self.parse_errors.append((rid, value))
             return False
-        tz = self.get_tz(schedule['tz'])
         if not tz:
             log.warning(
                 "Could not resolve tz on resource:%s value:%s", rid, value)
             self.parse_errors.append((rid, value))
             return False
+        if self.evaluations is not None and value in self.evaluations:
+            return self.evaluations[value]
         now = datetime.datetime.now(tz).replace(
             minute=0, second=0, microsecond=0)
         now_str = now.strftime("%Y-%m-%d")
-        if 'skip-days-from' in self.data:
-            values = ValuesFrom(self.data['skip-days-from'], self.manager)
-            self.skip_days = values.get_values()
+        if now_str in self.get_skip_days():
+            result = False
         else:
-            self.skip_days = self.data.get('skip-days', [])
-        if now_str in self.skip_days:
-            return False
-        return self.match(now, schedule)
+            result = self.match(now, schedule)
+        if self.evaluations is not None:
+            self.evaluations[value] = result
+        return result
+
+    def get_schedule(self, value, time_type):
+        """Resolve a normalized tag value to its schedule and timezone."""
+        if (value, time_type) in self.schedules:
+            return self.schedules[(value, time_type)]
+        if self.parser.has_resource_schedule(value, time_type):
+            schedule = self.parser.parse(value)
+        elif self.parser.keys_are_valid(value):
+            # respect timezone from tag
+            raw_data = self.parser.raw_data(value)
+            if 'tz' in raw_data:
+                schedule = dict(self.default_schedule)
+                schedule['tz'] = raw_data['tz']
+            else:
+                schedule = self.default_schedule
+        else:
+            schedule = None
+        tz = schedule and self.get_tz(schedule['tz']) or None
+        self.schedules[(value, time_type)] = (schedule, tz)
+        return schedule, tz
+
+    def get_skip_days(self):
+        if self.skip_days is None:
+            if 'skip-days-from' in self.data:
+                values = ValuesFrom(self.data['skip-days-from'], self.manager)
+                self.skip_days = values.get_values()
+            else:
+                self.skip_days = self.data.get('skip-days', [])
+        return self.skip_days
 
     def match(self, now, schedule):
         time = schedule.get(self.time_type, ())
@@ -1,6 +1,7 @@
 # Copyright The Cloud Custodian Authors.
 # SPDX-License-Identifier: Apache-2.0
 from collections import deque
+import itertools
 import logging
 
 from c7n import cache, deprecated
@@ -99,12 +100,14 @@ class ResourceManager:
             return klass(self.ctx, {'source': self.source_type})
         return klass(self.ctx, data or {})
 
-    def filter_resources(self, resources, event=None):
+    def filter_resources(self, resources, event=None, filters=None):
         original = len(resources)
+        if filters is None:
+            filters = self.filters
         if event and event.get('debug', False):
             self.log.info(
-                "Filtering resources using %d filters", len(self.filters))
-        for idx, f in enumerate(self.filters, start=1):
+                "Filtering resources using %d filters", len(filters))
+        for idx, f in enumerate(filters, start=1):
             if not resources:
                 break
             rcount = len(resources)
@@ -128,6 +131,39 @@ class ResourceManager:
     def iter_filters(self, block_end=False):
         return iter_filters(self.filters, block_end=block_end)
 
+    def get_resource_keys(self, permission_keys=None):
+        """Return the set of top level resource keys referenced by the
+        filters and actions of this resource manager.
+
+        Elements that don't declare the keys they read are resolved via
+        their permissions, using `permission_keys` a mapping of augment
+        permission to the resource key it populates.
+
+        Returns None if any element may reference arbitrary keys.
+        """
+        permission_keys = permission_keys or {}
+        keys = set()
+        elements = itertools.chain(
+            self.iter_filters(), getattr(self, 'actions', ()))
+        for e in elements:
+            if e.type in ('and', 'or', 'not'):
+                continue
+            ekeys = e.get_resource_keys()
+            if ekeys is None:
+                perms = e.get_permissions()
+                if not perms or not all(p in permission_keys for p in perms):
+                    return None
+                ekeys = [permission_keys[p] for p in perms]
+            keys.update(ekeys)
+        return keys
+
+    def get_augment_keys(self):
+        """Return the resource keys that augmentation needs to populate.
+
+        None indicates resources should be fully augmented.
+        """
+        return None
+
     def validate(self):
         """
         Validates resource definition, does NOT validate filters, actions, modes.
@@ -20,7 +20,7 @@ from c7n.output import DEFAULT_NAMESPACE
 from c7n.resources import load_resources
 from c7n.registry import PluginRegistry
 from c7n.provider import clouds, get_resource_class
-from c7n import deprecated, utils
+from c7n import deprecated, tagplan, utils
 from c7n.version import version
 from c7n.query import RetryPageIterator
 from c7n.varfmt import VarFormat
@@ -358,18 +358,32 @@ class PullMode(PolicyExecutionMode):
                 return resources
 
             at = time.time()
-            for a in self.policy.resource_manager.actions:
-                s = time.time()
-                with ctx.tracer.subsegment('action:%s' % a.type):
-                    results = a.process(resources)
-                self.policy.log.info(
-                    "policy:%s action:%s"
-                    " resources:%d"
-                    " execution_time:%0.2f"
-                    % (self.policy.name, a.name, len(resources), time.time() - s)
-                )
-                if results:
-                    ctx.output.write_file("action-%s" % a.name, utils.dumps(results))
+            # tag mutations are coalesced across the run's policies when
+            # running under a run scope, else across the policy's actions.
+            planner = tagplan.get_planner()
+            scoped = planner is None
+            if scoped:
+                planner = tagplan.TagPlanner()
+            try:
+                for a in self.policy.resource_manager.actions:
+                    s = time.time()
+                    with ctx.tracer.subsegment('action:%s' % a.type):
+                        if planner.plan(a, resources):
+                            results = None
+                        else:
+                            planner.flush(self.policy.resource_manager)
+                            results = a.process(resources)
+                    self.policy.log.info(
+                        "policy:%s action:%s"
+                        " resources:%d"
+                        " execution_time:%0.2f"
+                        % (self.policy.name, a.name, len(resources), time.time() - s)
+                    )
+                    if results:
+                        ctx.output.write_file("action-%s" % a.name, utils.dumps(results))
+            finally:
+                if scoped:
+                    planner.flush()
             ctx.metrics.put_metric(
                 "ActionTime", time.time() - at, "Seconds", Scope="Policy"
             )
@@ -539,18 +553,26 @@ class LambdaMode(ServerlessExecutionMode):
 
             ctx.output.write_file('resources.json', utils.dumps(resources, indent=2))
 
-            for action in self.policy.resource_manager.actions:
-                self.policy.log.info(
-                    "policy:%s invoking action:%s resources:%d",
-                    self.policy.name,
-                    action.name,
-                    len(resources),
-                )
-                if isinstance(action, EventAction):
-                    results = action.process(resources, event)
-                else:
-                    results = action.process(resources)
-                ctx.output.write_file("action-%s" % action.name, utils.dumps(results))
+            planner = tagplan.TagPlanner()
+            try:
+                for action in self.policy.resource_manager.actions:
+                    self.policy.log.info(
+                        "policy:%s invoking action:%s resources:%d",
+                        self.policy.name,
+                        action.name,
+                        len(resources),
+                    )
+                    if planner.plan(action, resources):
+                        results = None
+                    elif isinstance(action, EventAction):
+                        planner.flush()
+                        results = action.process(resources, event)
+                    else:
+                        planner.flush()
+                        results = action.process(resources)
+                    ctx.output.write_file("action-%s" % action.name, utils.dumps(results))
+            finally:
+                planner.flush()
         return resources
 
     @property
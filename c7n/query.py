@@ -18,6 +18,7 @@ from c7n.exceptions import ClientError, ResourceLimitExceeded, PolicyExecutionEr
 from c7n.filters import FilterRegistry, MetricsFilter
 from c7n.manager import ResourceManager
 from c7n.registry import PluginRegistry
+from c7n import tagplan
 from c7n.tags import register_ec2_tags, register_universal_tags, universal_augment
 from c7n.utils import (
     local_session, generate_arn, get_retry, chunks, camelResource, jmespath_compile, get_path)
@@ -253,6 +254,29 @@ class DescribeSource:
             perms.append("%s:%s" % (prefix, _napi(m.batch_detail_spec[0])))
         return perms
 
+    def get_augment_permission_keys(self):
+        """Return a mapping of augment permission to the resource key it populates.
+        """
+        m = self.manager.get_model()
+        if m.universal_taggable is not False:
+            return {'tag:GetResources': 'Tags'}
+        return {}
+
+    def get_augmented_keys(self):
+        """Return the set of resource keys populated by augment.
+
+        Returns None if augment may populate arbitrary keys, ie. when
+        merging in a detail api response.
+        """
+        m = self.manager.get_model()
+        if getattr(m, 'detail_spec', None) or getattr(m, 'batch_detail_spec', None):
+            return None
+        if type(self).augment is DescribeSource.augment:
+            return set()
+        elif type(self).augment is DescribeWithResourceTags.augment:
+            return {'Tags'}
+        return None
+
     def augment(self, resources):
         model = self.manager.get_model()
         if getattr(model, 'detail_spec', None):
@@ -513,21 +537,86 @@ class QueryResourceManager(ResourceManager, metaclass=QueryMeta):
         return perms
 
     def get_cache_key(self, query):
-        return {
+        key = {
             'account': self.account_id,
             'region': self.config.region,
             'resource': str(self.__class__.__name__),
             'source': self.source_type,
             'q': query
         }
+        # partially augmented resources get their own cache entry
+        augment_keys = self.get_augment_keys()
+        if augment_keys is not None:
+            key['augment'] = sorted(augment_keys)
+        return key
+
+    def get_augment_keys(self):
+        # selective augmentation is opt-in per policy, and only applies to
+        # the policy's own resources, related resource lookups are always
+        # fully augmented.
+        if self.data.get('augment', 'full') != 'selective':
+            return None
+        if self.data != self.ctx.policy.data:
+            return None
+        get_permission_keys = getattr(self.source, 'get_augment_permission_keys', None)
+        if get_permission_keys is None:
+            return None
+        return self.get_resource_keys(get_permission_keys())
+
+    def get_prefilters(self):
+        """Return the top level filters that can be evaluated prior to augment.
+
+        A filter can run before augmentation if it only references keys
+        that augment doesn't populate, in which case only resources
+        matching these filters need to be augmented.
+        """
+        if self.data.get('augment', 'full') == 'full':
+            return []
+        if self.data != self.ctx.policy.data:
+            return []
+        # percentage based limits need the full population count.
+        p = self.ctx.policy
+        if p.max_resources_percent or isinstance(p.max_resources, dict):
+            return []
+        if type(self).augment is not QueryResourceManager.augment:
+            return []
+        get_augmented_keys = getattr(self.source, 'get_augmented_keys', None)
+        augmented = get_augmented_keys and get_augmented_keys() or None
+        if augmented is None:
+            return []
+
+        prefilters = []
+        for f in self.filters:
+            if f.type in ('and', 'or', 'not'):
+                continue
+            keys = f.get_resource_keys()
+            # filters on annotations depend on evaluation order
+            if not keys or any(k in augmented or k.startswith('c7n:') for k in keys):
+                continue
+            prefilters.append(f)
+        return prefilters
 
     def resources(self, query=None, augment=True) -> List[dict]:
         query = self.source.get_query_params(query)
         cache_key = self.get_cache_key(query)
         resources = None
 
+        prefilters = augment and self.get_prefilters() or []
+        if prefilters:
+            # resources filtered before augment are cached separately
+            prefilter_key = dict(cache_key, prefilter=[f.data for f in prefilters])
+
+        planner = tagplan.get_planner()
+        if planner is not None:
+            planner.prepare(self, cache_key)
+
         with self._cache:
             resources = self._cache.get(cache_key)
+            if resources is not None:
+                # fully augmented resources are cached, no need to prefilter
+                prefilters = []
+            elif prefilters:
+                resources = self._cache.get(prefilter_key)
             if resources is not None:
                 self.log.debug("Using cached %s: %d" % (
                     "%s.%s" % (self.__class__.__module__, self.__class__.__name__),
@@ -538,15 +627,19 @@ class QueryResourceManager(ResourceManager, metaclass=QueryMeta):
                     query = {}
                 with self.ctx.tracer.subsegment('resource-fetch'):
                     resources = self.source.resources(query)
+                if prefilters:
+                    with self.ctx.tracer.subsegment('prefilter'):
+                        resources = self.filter_resources(resources, filters=prefilters)
                 if augment:
                     with self.ctx.tracer.subsegment('resource-augment'):
                         resources = self.augment(resources)
                     # Don't pollute cache with unaugmented resources.
-                    self._cache.save(cache_key, resources)
+                    self._cache.save(prefilters and prefilter_key or cache_key, resources)
 
         resource_count = len(resources)
         with self.ctx.tracer.subsegment('filter'):
-            resources = self.filter_resources(resources)
+            resources = self.filter_resources(
+                resources, filters=[f for f in self.filters if f not in prefilters])
 
         # Check if we're out of a policies execution limits.
         if self.data == self.ctx.policy.data:
@@ -577,6 +670,9 @@ class QueryResourceManager(ResourceManager, metaclass=QueryMeta):
     def get_resources(self, ids, cache=True, augment=True):
         if not ids:
             return []
+        planner = tagplan.get_planner()
+        if planner is not None:
+            planner.prepare(self, cache and self.get_cache_key(None) or None)
         if cache:
             resources = self._get_cached_resources(ids)
             if resources is not None:
@@ -250,17 +250,13 @@ def fs_record_set(output_path, policy_name):
         return records
 
 
-def record_set(session_factory, bucket, key_prefix, start_date, specify_hour=False):
-    """Retrieve all s3 records for the given policy output url
+def record_keys(session_factory, bucket, key_prefix, start_date, specify_hour=False):
+    """Retrieve the s3 resource record keys for the given policy output url
 
     From the given start date.
     """
-
     s3 = local_session(session_factory).client('s3')
 
-    records = []
-    key_count = 0
-
     date = start_date.strftime('%Y/%m/%d')
     if specify_hour:
         date += "/{}".format(start_date.hour)
@@ -275,21 +271,32 @@ def record_set(session_factory, bucket, key_prefix, start_date, specify_hour=Fal
         StartAfter=marker,
     )
 
+    keys = []
+    for key_set in p:
+        if 'Contents' not in key_set:
+            continue
+        keys.extend(k for k in key_set['Contents']
+                    if k['Key'].endswith('resources.json.gz'))
+    return keys
+
+
+def record_set(session_factory, bucket, key_prefix, start_date, specify_hour=False,
+               keys=None):
+    """Retrieve all s3 records for the given policy output url
+
+    From the given start date, or from the given record keys.
+    """
+    if keys is None:
+        keys = record_keys(session_factory, bucket, key_prefix, start_date, specify_hour)
+
+    records = []
     with ThreadPoolExecutor(max_workers=20) as w:
-        for key_set in p:
-            if 'Contents' not in key_set:
-                continue
-            keys = [k for k in key_set['Contents']
-                    if k['Key'].endswith('resources.json.gz')]
-            key_count += len(keys)
-            futures = map(lambda k: w.submit(
-                get_records, bucket, k, session_factory), keys)
-
-            for f in as_completed(futures):
-                records.extend(f.result())
+        futures = [w.submit(get_records, bucket, k, session_factory) for k in keys]
+        for f in as_completed(futures):
+            records.extend(f.result())
 
     log.info("Fetched %d records across %d files" % (
-        len(records), key_count))
+        len(records), len(keys)))
     return records
 
 
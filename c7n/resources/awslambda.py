@@ -40,6 +40,9 @@ class DescribeLambda(query.DescribeSource):
         return universal_augment(
             self.manager, super(DescribeLambda, self).augment(resources))
 
+    def get_augmented_keys(self):
+        return {'Tags'}
+
     def get_resources(self, ids):
         client = local_session(self.manager.session_factory).client('lambda')
         resources = []
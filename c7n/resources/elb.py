@@ -35,6 +35,12 @@ class DescribeELB(DescribeSource):
     def augment(self, resources):
         return tags.universal_augment(self.manager, resources)
 
+    def get_augmented_keys(self):
+        return {'Tags'}
+
+    def get_augment_permission_keys(self):
+        return {'tag:GetResources': 'Tags', 'elasticloadbalancing:DescribeTags': 'Tags'}
+
 
 @resources.register('elb')
 class ELB(QueryResourceManager):
@@ -26,7 +26,8 @@ from c7n.filters import ValueFilter, Filter
 from c7n.filters.multiattr import MultiAttrFilter
 from c7n.filters.iamaccess import CrossAccountAccessFilter
 from c7n.manager import resources
-from c7n.query import ConfigSource, QueryResourceManager, DescribeSource, TypeInfo
+from c7n.query import (
+    ConfigSource, QueryResourceManager, DescribeSource, TypeInfo, RetryPageIterator)
 from c7n.resolver import ValuesFrom
 from c7n.tags import TagActionFilter, TagDelayedAction, Tag, RemoveTag, universal_augment
 from c7n.utils import (
@@ -500,6 +501,117 @@ class CertificateDelete(BaseAction):
             )
 
 
+class AuthorizationDetails:
+    """Indexed snapshot of an account's iam authorization details.
+
+    GetAccountAuthorizationDetails returns all users, groups and roles
+    in an account, along with their inline and attached policies and
+    group memberships, in a handful of paginated calls. For larger sets
+    of principals this is far cheaper than per principal api calls. The
+    snapshot is cached per account, so its shared across filters and
+    policies.
+
+    Managed policy documents are not requested, as they're the bulk of
+    the response and aren't used.
+    """
+
+    principal_lists = (
+        ('user', 'UserDetailList', 'UserName', 'UserPolicyList'),
+        ('group', 'GroupDetailList', 'GroupName', 'GroupPolicyList'),
+        ('role', 'RoleDetailList', 'RoleName', 'RolePolicyList'))
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def get(cls, manager):
+        cache = manager._cache
+        with cache:
+            cache_key = {
+                'account': manager.config.account_id, 'iam-authorization-details': True}
+            data = cache.get(cache_key)
+            if data is None:
+                data = cls.index(cls.fetch(manager))
+                cache.save(cache_key, data)
+        return cls(data)
+
+    @staticmethod
+    def fetch(manager):
+        client = local_session(manager.session_factory).client('iam')
+        paginator = client.get_paginator('get_account_authorization_details')
+        paginator.PAGE_ITERATOR_CLS = RetryPageIterator
+        return paginator.paginate(
+            Filter=['User', 'Role', 'Group']).build_full_result()
+
+    @classmethod
+    def index(cls, details):
+        data = {'group-users': {}}
+        for kind, list_key, name_key, inline_key in cls.principal_lists:
+            data[kind] = index = {}
+            for p in details.get(list_key, ()):
+                index[p[name_key]] = {
+                    'inline': [ip['PolicyName'] for ip in p.get(inline_key, ())],
+                    'attached': p.get('AttachedManagedPolicies', []),
+                    'groups': p.get('GroupList', [])}
+                if kind == 'group':
+                    index[p[name_key]]['group'] = select_keys(
+                        p, ('Path', 'GroupName', 'GroupId', 'Arn', 'CreateDate'))
+        for u in details.get('UserDetailList', ()):
+            for g in u.get('GroupList', ()):
+                data['group-users'].setdefault(g, []).append(u['UserName'])
+        return data
+
+    def get_inline_policies(self, kind, name):
+        """Return inline policy names for a principal, None if not in snapshot."""
+        principal = self.data[kind].get(name)
+        if principal is None:
+            return None
+        return list(principal['inline'])
+
+    def get_attached_policies(self, kind, name):
+        """Return attached managed policies for a principal, None if not in snapshot."""
+        principal = self.data[kind].get(name)
+        if principal is None:
+            return None
+        return [dict(p) for p in principal['attached']]
+
+    def get_user_groups(self, name):
+        principal = self.data['user'].get(name)
+        if principal is None:
+            return None
+        groups = []
+        for g in principal['groups']:
+            group = self.data['group'].get(g)
+            if group is None:
+                return None
+            groups.append(dict(group['group']))
+        return groups
+
+    def get_group_users(self, name):
+        if name not in self.data['group']:
+            return None
+        return list(self.data['group-users'].get(name, ()))
+
+
+class AuthorizationDetailsMixin:
+    """Filter support for answering from an account authorization snapshot.
+
+    Below `snapshot_threshold` resources, per principal api calls are
+    used instead.
+    """
+
+    snapshot_threshold = 50
+    snapshot_permissions = ('iam:GetAccountAuthorizationDetails',)
+
+    def get_permissions(self):
+        return tuple(super().get_permissions()) + self.snapshot_permissions
+
+    def get_authorization_details(self, resources):
+        if len(resources) < self.snapshot_threshold:
+            return None
+        return AuthorizationDetails.get(self.manager)
+
+
 @User.filter_registry.register('usage')
 @Role.filter_registry.register('usage')
 @Group.filter_registry.register('usage')
@@ -949,7 +1061,7 @@ class RoleCrossAccountAccess(CrossAccountAccessFilter):
 
 
 @Role.filter_registry.register('has-inline-policy')
-class IamRoleInlinePolicy(Filter):
+class IamRoleInlinePolicy(AuthorizationDetailsMixin, Filter):
     """Filter IAM roles that have an inline-policy attached
     True: Filter roles that have an inline-policy
     False: Filter roles that do not have an inline-policy
@@ -969,18 +1081,21 @@ class IamRoleInlinePolicy(Filter):
     schema = type_schema('has-inline-policy', value={'type': 'boolean'})
     permissions = ('iam:ListRolePolicies',)
 
-    def _inline_policies(self, client, resource):
-        policies = client.list_role_policies(
-            RoleName=resource['RoleName'])['PolicyNames']
+    def _inline_policies(self, client, resource, details=None):
+        policies = details and details.get_inline_policies('role', resource['RoleName'])
+        if policies is None:
+            policies = client.list_role_policies(
+                RoleName=resource['RoleName'])['PolicyNames']
         resource['c7n:InlinePolicies'] = policies
         return resource
 
     def process(self, resources, event=None):
         c = local_session(self.manager.session_factory).client('iam')
+        details = self.get_authorization_details(resources)
         res = []
         value = self.data.get('value', True)
         for r in resources:
-            r = self._inline_policies(c, r)
+            r = self._inline_policies(c, r, details)
             if len(r['c7n:InlinePolicies']) > 0 and value:
                 res.append(r)
             if len(r['c7n:InlinePolicies']) == 0 and not value:
@@ -989,7 +1104,7 @@ class IamRoleInlinePolicy(Filter):
 
 
 @Role.filter_registry.register('has-specific-managed-policy')
-class SpecificIamRoleManagedPolicy(ValueFilter):
+class SpecificIamRoleManagedPolicy(AuthorizationDetailsMixin, ValueFilter):
     """Find IAM roles that have a specific policy attached
 
     :example:
@@ -1073,6 +1188,16 @@ class SpecificIamRoleManagedPolicy(ValueFilter):
 
     def process(self, resources, event=None):
         client = local_session(self.manager.session_factory).client('iam')
+        details = self.get_authorization_details(
+            [r for r in resources if self.annotation_key not in r])
+        if details:
+            for r in resources:
+                if self.annotation_key in r:
+                    continue
+                policies = details.get_attached_policies('role', r['RoleName'])
+                if policies is not None:
+                    r[self.annotation_key] = policies
+
         with self.executor_factory(max_workers=2) as w:
             augment_set = [r for r in resources if self.annotation_key not in r]
             self.log.debug(
@@ -1091,7 +1216,7 @@ class SpecificIamRoleManagedPolicy(ValueFilter):
 
 
 @Role.filter_registry.register('no-specific-managed-policy')
-class NoSpecificIamRoleManagedPolicy(Filter):
+class NoSpecificIamRoleManagedPolicy(AuthorizationDetailsMixin, Filter):
     """Filter IAM roles that do not have a specific policy attached
 
     For example, if the user wants to check all roles without 'ip-restriction':
@@ -1111,15 +1236,19 @@ class NoSpecificIamRoleManagedPolicy(Filter):
     schema = type_schema('no-specific-managed-policy', value={'type': 'string'})
     permissions = ('iam:ListAttachedRolePolicies',)
 
-    def _managed_policies(self, client, resource):
-        return [r['PolicyName'] for r in client.list_attached_role_policies(
-            RoleName=resource['RoleName'])['AttachedPolicies']]
+    def _managed_policies(self, client, resource, details=None):
+        policies = details and details.get_attached_policies('role', resource['RoleName'])
+        if policies is None:
+            policies = client.list_attached_role_policies(
+                RoleName=resource['RoleName'])['AttachedPolicies']
+        return [r['PolicyName'] for r in policies]
 
     def process(self, resources, event=None):
         c = local_session(self.manager.session_factory).client('iam')
         if self.data.get('value'):
+            details = self.get_authorization_details(resources)
             return [r for r in resources if self.data.get('value') not in
-            self._managed_policies(c, r)]
+            self._managed_policies(c, r, details)]
         return []
 
 
@@ -1966,7 +2095,7 @@ class UserCredentialReport(CredentialReport):
 
 
 @User.filter_registry.register('has-inline-policy')
-class IamUserInlinePolicy(Filter):
+class IamUserInlinePolicy(AuthorizationDetailsMixin, Filter):
     """
         Filter IAM users that have an inline-policy attached
 
@@ -1977,17 +2106,21 @@ class IamUserInlinePolicy(Filter):
     schema = type_schema('has-inline-policy', value={'type': 'boolean'})
     permissions = ('iam:ListUserPolicies',)
 
-    def _inline_policies(self, client, resource):
-        resource['c7n:InlinePolicies'] = client.list_user_policies(
-            UserName=resource['UserName'])['PolicyNames']
+    def _inline_policies(self, client, resource, details=None):
+        policies = details and details.get_inline_policies('user', resource['UserName'])
+        if policies is None:
+            policies = client.list_user_policies(
+                UserName=resource['UserName'])['PolicyNames']
+        resource['c7n:InlinePolicies'] = policies
         return resource
 
     def process(self, resources, event=None):
         c = local_session(self.manager.session_factory).client('iam')
+        details = self.get_authorization_details(resources)
         value = self.data.get('value', True)
         res = []
         for r in resources:
-            r = self._inline_policies(c, r)
+            r = self._inline_policies(c, r, details)
             if len(r['c7n:InlinePolicies']) > 0 and value:
                 res.append(r)
             if len(r['c7n:InlinePolicies']) == 0 and not value:
@@ -2086,7 +2219,7 @@ class UserPolicy(ValueFilter):
 
 
 @User.filter_registry.register('group')
-class GroupMembership(ValueFilter):
+class GroupMembership(AuthorizationDetailsMixin, ValueFilter):
     """Filter IAM users based on attached group values
 
     :example:
@@ -2113,6 +2246,16 @@ class GroupMembership(ValueFilter):
 
     def process(self, resources, event=None):
         client = local_session(self.manager.session_factory).client('iam')
+        details = self.get_authorization_details(
+            [r for r in resources if 'c7n:Groups' not in r])
+        if details:
+            for r in resources:
+                if 'c7n:Groups' in r:
+                    continue
+                groups = details.get_user_groups(r['UserName'])
+                if groups is not None:
+                    r['c7n:Groups'] = groups
+
         with self.executor_factory(max_workers=2) as w:
             futures = []
             for user_set in chunks(
@@ -2766,7 +2909,7 @@ def resolve_credential_keys(m_keys, keys):
 
 
 @Group.filter_registry.register('has-specific-managed-policy')
-class SpecificIamGroupManagedPolicy(Filter):
+class SpecificIamGroupManagedPolicy(AuthorizationDetailsMixin, Filter):
     """Filter IAM groups that have a specific policy attached
 
     For example, if the user wants to check all groups with 'admin-policy':
@@ -2786,16 +2929,20 @@ class SpecificIamGroupManagedPolicy(Filter):
     schema = type_schema('has-specific-managed-policy', value={'type': 'string'})
     permissions = ('iam:ListAttachedGroupPolicies',)
 
-    def _managed_policies(self, client, resource):
-        return [r['PolicyName'] for r in client.list_attached_group_policies(
-            GroupName=resource['GroupName'])['AttachedPolicies']]
+    def _managed_policies(self, client, resource, details=None):
+        policies = details and details.get_attached_policies('group', resource['GroupName'])
+        if policies is None:
+            policies = client.list_attached_group_policies(
+                GroupName=resource['GroupName'])['AttachedPolicies']
+        return [r['PolicyName'] for r in policies]
 
     def process(self, resources, event=None):
         c = local_session(self.manager.session_factory).client('iam')
         if self.data.get('value'):
+            details = self.get_authorization_details(resources)
             results = []
             for r in resources:
-                r["ManagedPolicies"] = self._managed_policies(c, r)
+                r["ManagedPolicies"] = self._managed_policies(c, r, details)
                 if self.data.get('value') in r["ManagedPolicies"]:
                     results.append(r)
             return results
@@ -2803,7 +2950,7 @@ class SpecificIamGroupManagedPolicy(Filter):
 
 
 @Group.filter_registry.register('has-users')
-class IamGroupUsers(Filter):
+class IamGroupUsers(AuthorizationDetailsMixin, Filter):
     """Filter IAM groups that have users attached based on True/False value:
     True: Filter all IAM groups with users assigned to it
     False: Filter all IAM groups without any users assigned to it
@@ -2821,18 +2968,22 @@ class IamGroupUsers(Filter):
     schema = type_schema('has-users', value={'type': 'boolean'})
     permissions = ('iam:GetGroup',)
 
-    def _user_count(self, client, resource):
-        return len(client.get_group(GroupName=resource['GroupName'])['Users'])
+    def _user_count(self, client, resource, details=None):
+        users = details and details.get_group_users(resource['GroupName'])
+        if users is None:
+            users = client.get_group(GroupName=resource['GroupName'])['Users']
+        return len(users)
 
     def process(self, resources, events=None):
         c = local_session(self.manager.session_factory).client('iam')
+        details = self.get_authorization_details(resources)
         if self.data.get('value', True):
-            return [r for r in resources if self._user_count(c, r) > 0]
-        return [r for r in resources if self._user_count(c, r) == 0]
+            return [r for r in resources if self._user_count(c, r, details) > 0]
+        return [r for r in resources if self._user_count(c, r, details) == 0]
 
 
 @Group.filter_registry.register('has-inline-policy')
-class IamGroupInlinePolicy(Filter):
+class IamGroupInlinePolicy(AuthorizationDetailsMixin, Filter):
     """Filter IAM groups that have an inline-policy based on boolean value:
     True: Filter all groups that have an inline-policy attached
     False: Filter all groups that do not have an inline-policy attached
@@ -2850,17 +3001,21 @@ class IamGroupInlinePolicy(Filter):
     schema = type_schema('has-inline-policy', value={'type': 'boolean'})
     permissions = ('iam:ListGroupPolicies',)
 
-    def _inline_policies(self, client, resource):
-        resource['c7n:InlinePolicies'] = client.list_group_policies(
-            GroupName=resource['GroupName'])['PolicyNames']
+    def _inline_policies(self, client, resource, details=None):
+        policies = details and details.get_inline_policies('group', resource['GroupName'])
+        if policies is None:
+            policies = client.list_group_policies(
+                GroupName=resource['GroupName'])['PolicyNames']
+        resource['c7n:InlinePolicies'] = policies
         return resource
 
     def process(self, resources, events=None):
         c = local_session(self.manager.session_factory).client('iam')
+        details = self.get_authorization_details(resources)
         value = self.data.get('value', True)
         res = []
         for r in resources:
-            r = self._inline_policies(c, r)
+            r = self._inline_policies(c, r, details)
             if len(r['c7n:InlinePolicies']) > 0 and value:
                 res.append(r)
             if len(r['c7n:InlinePolicies']) == 0 and not value:
@@ -42,6 +42,8 @@ class KeyAlias(QueryResourceManager):
 class DescribeKey(DescribeSource):
 
     FetchThreshold = 10  # ie should we describe all keys or just fetch them directly
+    # keys available without describing each key, tags are fetched separately.
+    list_keys = frozenset(('KeyId', 'KeyArn', 'Arn', 'AliasNames', 'Tags'))
 
     def get_resources(self, ids, cache=True):
         # this forms a threshold beyond which we'll fetch individual keys of interest.
@@ -60,15 +62,24 @@ class DescribeKey(DescribeSource):
             return results
         return super().get_resources(ids, cache)
 
+    def get_augment_permission_keys(self):
+        keys = super().get_augment_permission_keys()
+        keys['kms:DescribeKey'] = 'KeyMetadata'
+        return keys
+
     def augment(self, resources):
         client = local_session(self.manager.session_factory).client('kms')
+        keys = self.manager.get_augment_keys()
+        describe = keys is None or not keys.issubset(self.list_keys)
         for r in resources:
             key_id = r.get('KeyId')
 
             # We get `KeyArn` from list_keys and `Arn` from describe_key.
             # If we already have describe_key details we don't need to fetch
             # it again.
-            if 'Arn' not in r:
+            if 'Arn' not in r and not describe:
+                r['Arn'] = r['KeyArn']
+            elif 'Arn' not in r:
                 try:
                     key_arn = r.get('KeyArn', key_id)
                     key_detail = client.describe_key(KeyId=key_arn)['KeyMetadata']
@@ -80,14 +80,22 @@ MAX_COPY_SIZE = 1024 * 1024 * 1024 * 2
 class DescribeS3(query.DescribeSource):
 
     def augment(self, buckets):
+        keys = self.manager.get_augment_keys()
         with self.manager.executor_factory(
                 max_workers=min((10, len(buckets) + 1))) as w:
             results = w.map(
                 assemble_bucket,
-                zip(itertools.repeat(self.manager.session_factory), buckets))
+                zip(itertools.repeat(self.manager.session_factory), buckets,
+                    itertools.repeat(keys)))
             results = list(filter(None, results))
             return results
 
+    def get_augment_permission_keys(self):
+        return {m[-1]: m[1] for m in S3_AUGMENT_TABLE}
+
+    def get_augmented_keys(self):
+        return {m[1] for m in S3_AUGMENT_TABLE}
+
 
 class ConfigS3(query.ConfigSource):
 
@@ -436,12 +444,17 @@ def assemble_bucket(item):
 
     TODO: Refactor this, the logic here feels quite muddled.
     """
-    factory, b = item
+    factory, b = item[:2]
+    # Only fetch the augments a policy references, location is always
+    # needed to resolve the bucket's regional endpoint.
+    keys = item[2] if len(item) > 2 else None
     s = factory()
     c = s.client('s3')
     # Bucket Location, Current Client Location, Default Location
     b_location = c_location = location = "us-east-1"
-    methods = list(S3_AUGMENT_TABLE)
+    methods = [
+        m for m in S3_AUGMENT_TABLE
+        if keys is None or m[1] in keys or m[1] == 'Location']
     for minfo in methods:
         m, k, default, select = minfo[:4]
         try:
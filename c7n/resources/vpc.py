@@ -1,5 +1,6 @@
 # Copyright The Cloud Custodian Authors.
 # SPDX-License-Identifier: Apache-2.0
+from concurrent.futures import as_completed
 import itertools
 import zlib
 import re
@@ -942,8 +943,17 @@ class SecurityGroupPatch:
 
 
 class SGUsage(Filter):
+    """Base for filters on security group usage.
+
+    Usage is computed into a graph of the groups referenced by each
+    scanner, the attributes of the enis each group is attached to, and
+    whether a group has cross vpc peered references. The graph is cached
+    per account and region, so multiple security group policies in a
+    run share a single scan.
+    """
 
     nics = ()
+    scan_workers = 4
 
     def get_permissions(self):
         return list(itertools.chain(
@@ -956,13 +966,18 @@ class SGUsage(Filter):
         if not resources:
             return resources
         # Check that groups are not referenced across accounts
-        client = local_session(self.manager.session_factory).client('ec2')
-        peered_ids = set()
-        for resource_set in chunks(resources, 200):
-            for sg_ref in client.describe_security_group_references(
-                    GroupId=[r['GroupId'] for r in resource_set]
-            )['SecurityGroupReferenceSet']:
-                peered_ids.add(sg_ref['GroupId'])
+        graph = self.get_usage_graph()
+        peered = graph['peered']
+        unknown = [r['GroupId'] for r in resources if r['GroupId'] not in peered]
+        if unknown:
+            client = local_session(self.manager.session_factory).client('ec2')
+            peered.update(dict.fromkeys(unknown, False))
+            for group_ids in chunks(unknown, 200):
+                for sg_ref in client.describe_security_group_references(
+                        GroupId=group_ids)['SecurityGroupReferenceSet']:
+                    peered[sg_ref['GroupId']] = True
+            self.save_usage_graph(graph)
+        peered_ids = {r['GroupId'] for r in resources if peered[r['GroupId']]}
         self.log.debug(
             "%d of %d groups w/ peered refs", len(peered_ids), len(resources))
         return [r for r in resources if r['GroupId'] not in peered_ids]
@@ -978,10 +993,42 @@ class SGUsage(Filter):
             ("batch", self.get_batch_sgs),
         )
 
+    def get_usage_graph_key(self):
+        return {
+            'account': self.manager.config.account_id,
+            'region': self.manager.config.region,
+            'source': self.manager.source_type,
+            'sg-usage-graph': sorted(kind for kind, _ in self.get_scanners())}
+
+    def get_usage_graph(self):
+        graph = getattr(self, '_usage_graph', None)
+        if graph is not None:
+            return graph
+        with self.manager._cache as cache:
+            graph = cache.get(self.get_usage_graph_key())
+        if graph is None:
+            graph = {'scanners': self.scan_usage(), 'peered': {}}
+            graph['enis'] = self._get_eni_attributes()
+            self.save_usage_graph(graph)
+        self._usage_graph = graph
+        return graph
+
+    def save_usage_graph(self, graph):
+        with self.manager._cache as cache:
+            cache.save(self.get_usage_graph_key(), graph)
+
+    def scan_usage(self):
+        results = {}
+        scanners = self.get_scanners()
+        with self.executor_factory(max_workers=self.scan_workers) as w:
+            futures = {w.submit(scanner): kind for kind, scanner in scanners}
+            for f in as_completed(futures):
+                results[futures[f]] = f.result()
+        return results
+
     def scan_groups(self):
         used = set()
-        for kind, scanner in self.get_scanners():
-            sg_ids = scanner()
+        for kind, sg_ids in self.get_usage_graph()['scanners'].items():
             new_refs = sg_ids.difference(used)
             used = used.union(sg_ids)
             self.log.debug(
@@ -990,6 +1037,23 @@ class SGUsage(Filter):
 
         return used
 
+    def _get_eni_attributes(self):
+        group_enis = {}
+        for nic in self.nics:
+            instance_owner_id, interface_resource_type = '', ''
+            if nic['Status'] == 'in-use':
+                if nic.get('Attachment') and 'InstanceOwnerId' in nic['Attachment']:
+                    instance_owner_id = nic['Attachment']['InstanceOwnerId']
+                interface_resource_type = get_eni_resource_type(nic)
+            interface_type = nic.get('InterfaceType')
+            for g in nic['Groups']:
+                group_enis.setdefault(g['GroupId'], []).append({
+                    'InstanceOwnerId': instance_owner_id,
+                    'InterfaceType': interface_type,
+                    'InterfaceResourceType': interface_resource_type
+                })
+        return group_enis
+
     def get_launch_config_sgs(self):
         # Note assuming we also have launch config garbage collection
         # enabled.
@@ -1144,30 +1208,13 @@ class UsedSecurityGroup(SGUsage):
     interface_type_key = 'c7n:InterfaceTypes'
     interface_resource_type_key = 'c7n:InterfaceResourceTypes'
 
-    def _get_eni_attributes(self):
-        group_enis = {}
-        for nic in self.nics:
-            instance_owner_id, interface_resource_type = '', ''
-            if nic['Status'] == 'in-use':
-                if nic.get('Attachment') and 'InstanceOwnerId' in nic['Attachment']:
-                    instance_owner_id = nic['Attachment']['InstanceOwnerId']
-                interface_resource_type = get_eni_resource_type(nic)
-            interface_type = nic.get('InterfaceType')
-            for g in nic['Groups']:
-                group_enis.setdefault(g['GroupId'], []).append({
-                    'InstanceOwnerId': instance_owner_id,
-                    'InterfaceType': interface_type,
-                    'InterfaceResourceType': interface_resource_type
-                })
-        return group_enis
-
     def process(self, resources, event=None):
         used = self.scan_groups()
         unused = [
             r for r in resources
             if r['GroupId'] not in used and 'VpcId' in r]
         unused = {g['GroupId'] for g in self.filter_peered_refs(unused)}
-        group_enis = self._get_eni_attributes()
+        group_enis = self.get_usage_graph()['enis']
         for r in resources:
             enis = group_enis.get(r['GroupId'], ())
             r[self.instance_owner_id_key] = list({
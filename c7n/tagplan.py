@@ -0,0 +1,308 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+"""Coalesce tag mutations across actions and policies.
+
+Tag actions which support planning record their mutations on a planner
+instead of calling the tagging apis directly. The planner merges the
+mutations per resource, groups resources by identical tag set, and
+applies them using each api's maximum batch size, with regions flushed
+in parallel.
+
+Planned mutations are applied to the cached resources as they are
+recorded, so subsequent policies' filters see them without re-describing,
+while a policy's own resources are left as matched. A resource type's
+pending mutations are flushed before it's described again.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextlib
+import logging
+import threading
+import time
+
+from c7n.cache import encode
+from c7n.exceptions import ClientError
+from c7n.utils import chunks
+
+log = logging.getLogger('custodian.tagplan')
+
+THROTTLE_CODES = (
+    'TooManyRequestsException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+    'Throttled',
+    'ThrottledException',
+    'Throttling',
+    'Client.RequestLimitExceeded')
+
+_run_planner = None
+
+
+def get_planner():
+    """Return the planner for the current run, if any."""
+    return _run_planner
+
+
+@contextlib.contextmanager
+def run_scope():
+    """Defer planned tag mutations till the end of a run.
+
+    The caller is responsible for flushing the planner.
+    """
+    global _run_planner
+    if _run_planner is not None:
+        yield _run_planner
+        return
+    _run_planner = TagPlanner()
+    try:
+        yield _run_planner
+    finally:
+        _run_planner = None
+
+
+def patch_tags(resource, tags, remove):
+    """Return a copy of a resource with a tag mutation applied.
+
+    Returns None if the resource doesn't carry an ec2 style tag list,
+    as we can't tell if its tags were fetched.
+    """
+    rtags = resource.get('Tags')
+    if not isinstance(rtags, list) or not all(
+            isinstance(t, dict) and 'Key' in t for t in rtags):
+        return None
+    rtags = [dict(t) for t in rtags if t['Key'] not in remove]
+    current = {t['Key']: t for t in rtags}
+    for k, v in tags.items():
+        if k in current:
+            current[k]['Value'] = v
+        else:
+            rtags.append({'Key': k, 'Value': v})
+    return dict(resource, Tags=rtags)
+
+
+def is_throttle(error):
+    if isinstance(error, ClientError):
+        return error.response['Error']['Code'] in THROTTLE_CODES
+    # resource group tagging api throttles, per universal_retry
+    return 'Throttled' in str(error)
+
+
+class TagPlan:
+    """Pending tag mutations for a resource type in an account region."""
+
+    # delay before serially retrying batches that remained throttled
+    throttle_delay = 5
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.id_key = manager.get_model().id
+        self.resources = {}
+        self.tags = {}
+        self.remove = {}
+        self.policies = set()
+        self.adds = 0
+        self.patchable = True
+        self.patched = set()
+        self.touched = {}
+
+    def add(self, manager, resources, tags, remove):
+        self.policies.add(manager.ctx.policy.name)
+        for r in resources:
+            rid = r[self.id_key]
+            self.resources[rid] = r
+            rtags = self.tags.setdefault(rid, {})
+            rremove = self.remove.setdefault(rid, set())
+            for k in remove:
+                rtags.pop(k, None)
+                rremove.add(k)
+            for k, v in tags.items():
+                rremove.discard(k)
+                rtags[k] = v
+            if patch_tags(r, tags, remove) is None:
+                self.patchable = False
+        self.patch_cache(manager, resources, tags, remove)
+        self.adds += 1
+
+    def patch_cache(self, manager, resources, tags, remove):
+        cache = getattr(manager, '_cache', None)
+        if cache is None or not hasattr(manager, 'get_cache_key'):
+            return
+        key = manager.get_cache_key(manager.source.get_query_params(None))
+        ekey = encode(key)
+        ids = {r[self.id_key] for r in resources}
+        patched = False
+        with cache:
+            cached = cache.get(key)
+            if cached is not None and self.patchable:
+                self.touched[ekey] = key
+                patched = True
+                # copies, as an in memory cache shares resources with policies
+                cached = list(cached)
+                for idx, r in enumerate(cached):
+                    if r[self.id_key] not in ids:
+                        continue
+                    cached[idx] = patch_tags(r, tags, remove)
+                    if cached[idx] is None:
+                        patched = False
+                        cached[idx] = r
+                cache.save(key, cached)
+        if patched and (not self.adds or ekey in self.patched):
+            self.patched.add(ekey)
+        else:
+            self.patched.discard(ekey)
+
+    def is_patched(self, cache_key):
+        return cache_key is not None and encode(cache_key) in self.patched
+
+    def invalidate(self):
+        cache = self.manager._cache
+        with cache:
+            for key in self.touched.values():
+                cache.save(key, None)
+        self.patched.clear()
+
+    def get_groups(self, mutations):
+        groups = defaultdict(list)
+        for rid, value in mutations.items():
+            if not value:
+                continue
+            if isinstance(value, dict):
+                group = tuple(sorted(value.items()))
+            else:
+                group = tuple(sorted(value))
+            groups[group].append(self.resources[rid])
+        return groups
+
+    def execute(self):
+        registry = self.manager.action_registry
+        # removals first, a key is never both removed and set on a resource.
+        removes = self.get_groups(self.remove)
+        if removes:
+            untagger = registry['remove-tag']({}, self.manager)
+            untagger.id_key = self.id_key
+            self.process(untagger, [
+                (resources, list(keys)) for keys, resources in removes.items()])
+        tags = self.get_groups(self.tags)
+        if tags:
+            tagger = registry['tag']({}, self.manager)
+            tagger.id_key = self.id_key
+            self.process(tagger, [
+                (resources, tagger.format_tags(dict(items)))
+                for items, resources in tags.items()])
+
+    def process(self, executor, groups):
+        client = executor.get_client()
+        batch_size = executor.get_batch_size()
+        error = None
+        throttled = []
+        with executor.executor_factory(max_workers=executor.concurrency) as w:
+            futures = {}
+            for resources, tags in groups:
+                for resource_set in chunks(resources, size=batch_size):
+                    futures[w.submit(
+                        executor.process_resource_set, client, resource_set, tags)] = (
+                            resource_set, tags)
+            for f in as_completed(futures):
+                if not f.exception():
+                    continue
+                if is_throttle(f.exception()):
+                    throttled.append(futures[f])
+                    continue
+                error = f.exception()
+                log.error("Exception with tags: %s  %s", futures[f][1], error)
+
+        # batches still throttled after the api retries are retried one
+        # at a time, so we're not competing with our own requests.
+        for resource_set, tags in throttled:
+            time.sleep(self.throttle_delay)
+            try:
+                executor.process_resource_set(client, resource_set, tags)
+            except Exception as e:
+                error = e
+                log.error("Exception with tags: %s  %s", tags, e)
+        if error:
+            raise error
+
+
+class TagPlanner:
+    """Collect tag mutations and apply them in coalesced batches."""
+
+    def __init__(self):
+        self.plans = {}
+        self.errored = set()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_key(manager):
+        return (
+            getattr(manager.config, 'account_id', None),
+            manager.config.region,
+            manager.type)
+
+    def plan(self, action, resources):
+        """Record an action's tag mutation, if the action supports planning."""
+        plannable = getattr(action, 'plannable', None)
+        if plannable is None or not plannable():
+            return False
+        action.plan(resources, self)
+        return True
+
+    def add(self, manager, resources, tags=None, remove=()):
+        if not resources:
+            return
+        key = self.get_key(manager)
+        with self.lock:
+            plan = self.plans.get(key)
+            if plan is None:
+                plan = self.plans[key] = TagPlan(manager)
+            plan.add(manager, resources, tags or {}, remove)
+
+    def prepare(self, manager, cache_key=None):
+        """Flush a resource type's pending mutations before it's described.
+
+        Reads from a cache entry the planner kept up to date don't need to.
+        """
+        plan = self.plans.get(self.get_key(manager))
+        if plan is not None and not plan.is_patched(cache_key):
+            self.flush(manager)
+
+    def flush(self, manager=None):
+        """Apply pending mutations, for a manager's resource type or all."""
+        with self.lock:
+            if manager is None:
+                plans = list(self.plans.values())
+                self.plans.clear()
+            else:
+                plan = self.plans.pop(self.get_key(manager), None)
+                plans = plan and [plan] or []
+        if not plans:
+            return
+
+        regions = defaultdict(list)
+        for plan in plans:
+            regions[self.get_key(plan.manager)[:2]].append(plan)
+
+        error = None
+        with ThreadPoolExecutor(max_workers=len(regions)) as w:
+            futures = [w.submit(self.flush_region, region_plans)
+                       for region_plans in regions.values()]
+            for f in as_completed(futures):
+                if f.exception():
+                    error = f.exception()
+        if error:
+            raise error
+
+    def flush_region(self, plans):
+        error = None
+        for plan in plans:
+            try:
+                plan.execute()
+            except Exception as e:
+                error = e
+                self.errored.update(plan.policies)
+                plan.invalidate()
+                log.error(
+                    "Error applying planned tags for %s policies:%s",
+                    plan.manager.type, ", ".join(sorted(plan.policies)))
+        if error:
+            raise error
@@ -19,7 +19,7 @@ import time
 
 from c7n.manager import resources as aws_resources
 from c7n.actions import BaseAction as Action, AutoTagUser
-from c7n.exceptions import PolicyValidationError, PolicyExecutionError
+from c7n.exceptions import ClientError, PolicyValidationError, PolicyExecutionError
 from c7n.resources import load_resources
 from c7n.filters import Filter, OPERATORS
 from c7n.filters.offhours import Time
@@ -72,6 +72,10 @@ def universal_augment(self, resources):
     if not resources:
         return resources
 
+    keys = self.get_augment_keys()
+    if keys is not None and 'Tags' not in keys:
+        return resources
+
     region = utils.get_resource_tagging_region(self.resource_type, self.region)
     self.log.debug("Using region %s for resource tagging" % region)
     client = utils.local_session(
@@ -119,6 +123,43 @@ def _common_tag_processer(executor_factory, batch_size, concurrency, client,
         raise error
 
 
+def _tag_map(tags):
+    """Normalize an ec2 style tag list to a mapping."""
+    if isinstance(tags, dict):
+        return dict(tags)
+    return {t['Key']: t['Value'] for t in tags}
+
+
+def _plannable_tagger(tagger):
+    """Check if a tag action class can apply mutations from a tag planner."""
+    return (isinstance(tagger, type) and issubclass(tagger, Tag) and
+            tagger.process in (Tag.process, UniversalTag.process))
+
+
+def _is_invalid_id(error):
+    code = error.response['Error']['Code']
+    return code == 'InvalidID' or code.endswith(('.NotFound', '.Malformed'))
+
+
+def _skip_invalid_ids(call, ids, log):
+    """Invoke an api call on resource ids, skipping invalid or deleted ones.
+
+    The ec2 tagging apis fail the whole call on any invalid resource id, we
+    bisect the ids to isolate and skip those.
+    """
+    try:
+        return call(ids)
+    except ClientError as e:
+        if not _is_invalid_id(e):
+            raise
+        if len(ids) == 1:
+            log.warning("Skipping tag mutation on %s: %s", ids[0], e)
+            return
+    mid = len(ids) // 2
+    _skip_invalid_ids(call, ids[:mid], log)
+    _skip_invalid_ids(call, ids[mid:], log)
+
+
 class TagTrim(Action):
     """Automatically remove tags from an ec2 resource.
 
@@ -268,6 +309,7 @@ class TagActionFilter(Filter):
         skew_hours={'type': 'number', 'minimum': 0},
         op={'type': 'string'})
     schema_alias = True
+    resource_keys = ('Tags',)
 
     def validate(self):
         op = self.data.get('op')
@@ -345,6 +387,7 @@ class TagCountFilter(Filter):
         count={'type': 'integer', 'minimum': 0},
         op={'enum': list(OPERATORS.keys())})
     schema_alias = True
+    resource_keys = ('Tags',)
 
     def __call__(self, i):
         count = self.data.get('count', 10)
@@ -362,6 +405,8 @@ class Tag(Action):
 
     batch_size = 25
     concurrency = 2
+    # CreateTags accepts up to 1000 resource ids per call
+    max_batch_size = 1000
 
     deprecations = (
         deprecated.alias('mark'),
@@ -376,6 +421,7 @@ class Tag(Action):
     )
     schema_alias = True
     permissions = ('ec2:CreateTags',)
+    resource_keys = ()
     id_key = None
 
     def validate(self):
@@ -385,7 +431,7 @@ class Tag(Action):
                     self.manager.data,))
         return self
 
-    def process(self, resources):
+    def get_tags(self):
         # Legacy
         msg = self.data.get('msg')
         msg = self.data.get('value') or msg
@@ -405,21 +451,46 @@ class Tag(Action):
             tags.append({'Key': tag, 'Value': msg})
 
         self.interpolate_values(tags)
+        return tags
 
-        batch_size = self.data.get('batch_size', self.batch_size)
+    def process(self, resources):
+        tags = self.get_tags()
+        batch_size = self.data.get('batch_size', self.get_batch_size())
 
         client = self.get_client()
         _common_tag_processer(
             self.executor_factory, batch_size, self.concurrency, client,
             self.process_resource_set, self.id_key, resources, tags, self.log)
 
+    def plannable(self):
+        return (not self.data.get('batch_size') and
+                self.manager.action_registry.get('tag') is self.__class__ and
+                _plannable_tagger(self.__class__))
+
+    def plan(self, resources, planner):
+        planner.add(self.manager, resources, tags=_tag_map(self.get_tags()))
+
+    def format_tags(self, tags):
+        """Format a tag mapping for process_resource_set."""
+        return [{'Key': k, 'Value': v} for k, v in tags.items()]
+
+    @classmethod
+    def get_batch_size(cls):
+        # subclasses tagging via other apis keep their api constrained batch size.
+        if (cls.process_resource_set is Tag.process_resource_set and
+                cls.batch_size == Tag.batch_size):
+            return cls.max_batch_size
+        return cls.batch_size
+
     def process_resource_set(self, client, resource_set, tags):
         mid = self.manager.get_model().id
-        self.manager.retry(
-            client.create_tags,
-            Resources=[v[mid] for v in resource_set],
-            Tags=tags,
-            DryRun=self.manager.config.dryrun)
+        _skip_invalid_ids(
+            lambda ids: self.manager.retry(
+                client.create_tags,
+                Resources=ids,
+                Tags=tags,
+                DryRun=self.manager.config.dryrun),
+            [v[mid] for v in resource_set], self.log)
 
     def interpolate_single_value(self, tag):
         """Interpolate in a single tag value.
@@ -452,30 +523,51 @@ class RemoveTag(Action):
 
     batch_size = 100
     concurrency = 2
+    # DeleteTags accepts up to 1000 resource ids per call
+    max_batch_size = 1000
 
     schema = utils.type_schema(
         'remove-tag', aliases=('unmark', 'untag', 'remove-tag'),
         tags={'type': 'array', 'items': {'type': 'string'}})
     schema_alias = True
     permissions = ('ec2:DeleteTags',)
+    resource_keys = ()
 
     def process(self, resources):
         self.id_key = self.manager.get_model().id
 
         tags = self.data.get('tags', [DEFAULT_TAG])
-        batch_size = self.data.get('batch_size', self.batch_size)
+        batch_size = self.data.get('batch_size', self.get_batch_size())
 
         client = self.get_client()
         _common_tag_processer(
             self.executor_factory, batch_size, self.concurrency, client,
             self.process_resource_set, self.id_key, resources, tags, self.log)
 
+    def plannable(self):
+        return (not self.data.get('batch_size') and
+                self.manager.action_registry.get('remove-tag') is self.__class__ and
+                self.__class__.process is RemoveTag.process)
+
+    def plan(self, resources, planner):
+        planner.add(
+            self.manager, resources, remove=self.data.get('tags', [DEFAULT_TAG]))
+
+    @classmethod
+    def get_batch_size(cls):
+        if (cls.process_resource_set is RemoveTag.process_resource_set and
+                cls.batch_size == RemoveTag.batch_size):
+            return cls.max_batch_size
+        return cls.batch_size
+
     def process_resource_set(self, client, resource_set, tag_keys):
-        return self.manager.retry(
-            client.delete_tags,
-            Resources=[v[self.id_key] for v in resource_set],
-            Tags=[{'Key': k} for k in tag_keys],
-            DryRun=self.manager.config.dryrun)
+        return _skip_invalid_ids(
+            lambda ids: self.manager.retry(
+                client.delete_tags,
+                Resources=ids,
+                Tags=[{'Key': k} for k in tag_keys],
+                DryRun=self.manager.config.dryrun),
+            [v[self.id_key] for v in resource_set], self.log)
 
     def get_client(self):
         return utils.local_session(self.manager.session_factory).client(
@@ -493,6 +585,7 @@ class RenameTag(Action):
     schema_alias = True
 
     permissions = ('ec2:CreateTags', 'ec2:DeleteTags')
+    resource_keys = ('Tags',)
 
     tag_count_max = 50
 
@@ -621,6 +714,9 @@ class TagDelayedAction(Action):
     def get_permissions(self):
         return self.manager.action_registry['tag'].permissions
 
+    def get_resource_keys(self):
+        return self.manager.action_registry['tag'].resource_keys
+
     def validate(self):
         op = self.data.get('op')
         if self.manager and op not in self.manager.action_registry.keys():
@@ -661,6 +757,21 @@ class TagDelayedAction(Action):
             d['days'], d['hours'])
         return d
 
+    def plannable(self):
+        return (not self.data.get('batch_size') and
+                self.__class__.process in (
+                    TagDelayedAction.process, UniversalTagDelayedAction.process) and
+                _plannable_tagger(self.manager.action_registry.get('tag')))
+
+    def plan(self, resources, planner):
+        cfg = self.get_config_values()
+        msg = cfg['msg'].format(
+            op=cfg['op'], action_date=cfg['action_date'])
+
+        self.log.info("Tagging %d resources for %s on %s" % (
+            len(resources), cfg['op'], cfg['action_date']))
+        planner.add(self.manager, resources, tags={cfg['tag']: msg})
+
     def process(self, resources):
         cfg = self.get_config_values()
         self.tz = tzutil.gettz(Time.TZ_ALIASES.get(cfg['tz']))
@@ -676,8 +787,11 @@ class TagDelayedAction(Action):
 
         # if the tag implementation has a specified batch size, it's typically
         # due to some restraint on the api so we defer to that.
-        batch_size = getattr(
-            self.manager.action_registry.get('tag'), 'batch_size', self.batch_size)
+        tagger = self.manager.action_registry.get('tag')
+        if hasattr(tagger, 'get_batch_size'):
+            batch_size = tagger.get_batch_size()
+        else:
+            batch_size = getattr(tagger, 'batch_size', self.batch_size)
 
         client = self.get_client()
         _common_tag_processer(
@@ -847,9 +961,7 @@ class UniversalTag(Tag):
     concurrency = 1
     permissions = ('tag:TagResources',)
 
-    def process(self, resources):
-        self.id_key = self.manager.get_model().id
-
+    def get_tags(self):
         # Legacy
         msg = self.data.get('msg')
         msg = self.data.get('value') or msg
@@ -858,13 +970,20 @@ class UniversalTag(Tag):
         tag = self.data.get('key') or tag
 
         # Support setting multiple tags in a single go with a mapping
-        tags = self.data.get('tags', {})
+        tags = dict(self.data.get('tags', {}))
 
         if msg:
             tags[tag] = msg
 
         self.interpolate_values(tags)
+        return tags
+
+    def format_tags(self, tags):
+        return tags
 
+    def process(self, resources):
+        self.id_key = self.manager.get_model().id
+        tags = self.get_tags()
         batch_size = self.data.get('batch_size', self.batch_size)
         client = self.get_client()
 
@@ -1121,6 +1240,8 @@ class CopyRelatedResourceTag(Tag):
     )
     schema_alias = True
 
+    resource_keys = None
+
     def get_permissions(self):
         return self.manager.action_registry.get('tag').permissions
 
@@ -39,7 +39,9 @@ from c7n.resources.iam import (
     IamGroupInlinePolicy,
     SpecificIamRoleManagedPolicy,
     NoSpecificIamRoleManagedPolicy,
-    PolicyQueryParser
+    PolicyQueryParser,
+    AuthorizationDetails,
+    AuthorizationDetailsMixin,
 )
 
 
@@ -1140,6 +1142,68 @@ class IamUserGroupMembership(BaseTest):
         self.assertTrue(resources[0]["c7n:Groups"])
 
 
+AUTHORIZATION_DETAILS = {
+    'UserDetailList': [
+        {'UserName': 'kapil', 'GroupList': ['Admins'],
+         'UserPolicyList': [{'PolicyName': 'inline-s3', 'PolicyDocument': {}}],
+         'AttachedManagedPolicies': [
+             {'PolicyName': 'ReadOnlyAccess',
+              'PolicyArn': 'arn:aws:iam::aws:policy/ReadOnlyAccess'}]},
+        {'UserName': 'bob', 'GroupList': ['Admins', 'missing']}],
+    'GroupDetailList': [
+        {'GroupName': 'Admins', 'GroupId': 'AGPA1', 'Path': '/',
+         'Arn': 'arn:aws:iam::644160558196:group/Admins',
+         'GroupPolicyList': [], 'AttachedManagedPolicies': []},
+        {'GroupName': 'powerusers', 'GroupId': 'AGPA2', 'Path': '/',
+         'Arn': 'arn:aws:iam::644160558196:group/powerusers'}],
+    'RoleDetailList': [
+        {'RoleName': 'ops', 'RolePolicyList': [],
+         'AttachedManagedPolicies': []}],
+}
+
+
+class IamAuthorizationDetailsTest(BaseTest):
+
+    def test_authorization_details_index(self):
+        details = AuthorizationDetails(AuthorizationDetails.index(AUTHORIZATION_DETAILS))
+        self.assertEqual(details.get_inline_policies('user', 'kapil'), ['inline-s3'])
+        self.assertEqual(details.get_inline_policies('role', 'ops'), [])
+        self.assertEqual(details.get_inline_policies('role', 'dev'), None)
+        self.assertEqual(
+            [p['PolicyName'] for p in details.get_attached_policies('user', 'kapil')],
+            ['ReadOnlyAccess'])
+        self.assertEqual(
+            [g['GroupName'] for g in details.get_user_groups('kapil')], ['Admins'])
+        # a group missing from the snapshot forces a per user lookup
+        self.assertEqual(details.get_user_groups('bob'), None)
+        self.assertEqual(details.get_group_users('Admins'), ['kapil', 'bob'])
+        self.assertEqual(details.get_group_users('powerusers'), [])
+        self.assertEqual(details.get_group_users('c7n-test'), None)
+
+    def test_group_users_snapshot(self):
+        session_factory = self.replay_flight_data("test_iam_group_used_users")
+        self.patch(AuthorizationDetailsMixin, "snapshot_threshold", 0)
+        self.patch(
+            AuthorizationDetails, "fetch", staticmethod(lambda m: AUTHORIZATION_DETAILS))
+        p = self.load_policy(
+            {
+                "name": "iam-group-used",
+                "resource": "iam-group",
+                "filters": [{"type": "has-users", "value": True}],
+            },
+            session_factory=session_factory,
+        )
+        self.assertIn(
+            'iam:GetAccountAuthorizationDetails',
+            p.resource_manager.filters[0].get_permissions())
+        resources = p.run()
+        # Admins from the snapshot, c7n-test via GetGroup
+        self.assertEqual(
+            p.resource_manager.get_arns(resources),
+            ['arn:aws:iam::644160558196:group/Admins',
+             'arn:aws:iam::644160558196:group/c7n-test'])
+
+
 class IamInstanceProfileFilterUsage(BaseTest):
 
     def test_iam_instance_profile_inuse(self):
@@ -51,6 +51,32 @@ class KMSTest(BaseTest):
         resources = p.run()
         self.assertEqual(len(resources), 1)
 
+    def test_kms_key_selective_augment(self):
+        session_factory = self.replay_flight_data("test_kms_key_alias")
+        p = self.load_policy(
+            {
+                "name": "kms-key-alias-selective",
+                "resource": "kms-key",
+                "augment": "selective",
+                "filters": [
+                    {
+                        "type": "value",
+                        "key": "AliasNames",
+                        "op": "in",
+                        "value": "alias/aws/dms",
+                        "value_type": "swap"
+                    }
+                ],
+            },
+            session_factory=session_factory,
+        )
+        self.assertEqual(p.resource_manager.get_augment_keys(), {'AliasNames'})
+        resources = p.run()
+        self.assertEqual(len(resources), 1)
+        # keys aren't described, but always have an Arn
+        self.assertNotIn('KeyState', resources[0])
+        self.assertEqual(resources[0]['Arn'], resources[0]['KeyArn'])
+
     def test_key_rotation(self):
         session_factory = self.replay_flight_data("test_key_rotation")
         p = self.load_policy(
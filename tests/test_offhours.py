@@ -3,12 +3,14 @@
 import datetime
 import json
 import os
+from unittest.mock import MagicMock
 
 from dateutil import tz as tzutil
 
 from .common import BaseTest, instance
 
 from c7n.exceptions import PolicyValidationError
+from c7n.filters import offhours
 from c7n.filters.offhours import OffHour, OnHour, ScheduleParser, Time
 from c7n.testing import mock_datetime_now
 
@@ -105,6 +107,33 @@ class OffHoursFilterTest(BaseTest):
                 f.process(instances), [instances[0], instances[1], instances[2]]
             )
 
+    def test_process_shared_evaluation(self):
+        f = OffHour({"skip-days-from": {
+            "url": "s3://bucket/holidays.csv", "format": "csv", "expr": 0}})
+        values_from = MagicMock()
+        values_from.return_value.get_values.return_value = ["2015-12-25"]
+        self.patch(offhours, "ValuesFrom", values_from)
+        instances = [
+            instance(Tags=[{"Key": "maid_offhours", "Value": "tz=est"}]),
+            instance(Tags=[{"Key": "maid_offhours", "Value": "tz=est;"}]),
+            instance(Tags=[{"Key": "maid_offhours", "Value": "off=(m-f,20)"}]),
+            instance(Tags=[{"Key": "maid_offhours", "Value": "tz=est"}]),
+        ]
+        t = datetime.datetime(
+            year=2015,
+            month=12,
+            day=1,
+            hour=19,
+            minute=5,
+            tzinfo=tzutil.gettz("America/New_York"),
+        )
+        with mock_datetime_now(t, datetime):
+            self.assertEqual(
+                f.process(instances), [instances[0], instances[1], instances[3]])
+        values_from.assert_called_once()
+        self.assertEqual(set(f.schedules), {("tz=est", "off"), ("off=(m-f,20)", "off")})
+        self.assertIsNone(f.evaluations)
+
     def test_opt_out_behavior(self):
         # Some users want to match based on policy filters to
         # a resource subset with default opt out behavior
@@ -5,6 +5,7 @@ import logging
 import os
 
 
+from c7n.filters.core import resource_key
 from c7n.query import ResourceQuery, RetryPageIterator, TypeInfo
 from c7n.resources.vpc import InternetGateway
 
@@ -164,3 +165,112 @@ class QueryResourceManagerTest(BaseTest):
         self.assertEqual(len(resources), 1)
         resources = p.resource_manager.get_resources(["igw-5bce113f"])
         self.assertEqual(resources, [])
+
+
+class SelectiveAugmentTest(BaseTest):
+
+    def test_augment_keys(self):
+        p = self.load_policy({
+            'name': 's3-tagged',
+            'resource': 'aws.s3',
+            'augment': 'selective',
+            'filters': [
+                {'tag:Owner': 'absent'},
+                {'type': 'value', 'key': 'Versioning.Status', 'value': 'Enabled'},
+                {'or': [
+                    {'type': 'cross-account'},
+                    {'type': 'marked-for-op', 'op': 'delete'}]}],
+            'actions': [{'type': 'mark-for-op', 'op': 'delete'}]})
+        self.assertEqual(
+            p.resource_manager.get_augment_keys(), {'Tags', 'Versioning', 'Policy'})
+        self.assertEqual(
+            p.resource_manager.get_cache_key(None)['augment'],
+            ['Policy', 'Tags', 'Versioning'])
+
+    def test_augment_keys_full(self):
+        policy = {
+            'name': 's3-grants',
+            'resource': 'aws.s3',
+            'filters': [{'Name': 'abc'}]}
+        p = self.load_policy(policy)
+        self.assertIsNone(p.resource_manager.get_augment_keys())
+        self.assertNotIn('augment', p.resource_manager.get_cache_key(None))
+
+        # filters which don't declare their keys require full augmentation
+        policy['augment'] = 'selective'
+        policy['filters'].append({'type': 'global-grants'})
+        p = self.load_policy(policy)
+        self.assertIsNone(p.resource_manager.get_augment_keys())
+
+        policy['filters'] = [
+            {'type': 'value', 'key': 'length(Tags)', 'value': 2, 'op': 'gt'}]
+        p = self.load_policy(policy)
+        self.assertIsNone(p.resource_manager.get_augment_keys())
+
+    def test_resource_key(self):
+        self.assertEqual(resource_key('Name'), 'Name')
+        self.assertEqual(resource_key('Versioning.Status'), 'Versioning')
+        self.assertEqual(resource_key('Grants[0].Permission'), 'Grants')
+        self.assertEqual(resource_key('tag:Owner'), 'Tags')
+        for expr in (
+                'Foo.Bar || Policy',
+                'Foo && Policy',
+                'Foo | Policy',
+                'Foo[*].Bar',
+                'Foo[].Bar',
+                'Foo.*',
+                'Foo[?Bar == `1`]',
+                'length(Tags)',
+                '"Foo"',
+                {'Foo': 'Bar'}):
+            self.assertIsNone(resource_key(expr), expr)
+
+    def test_augment_keys_compound_expression(self):
+        p = self.load_policy({
+            'name': 's3-policy',
+            'resource': 'aws.s3',
+            'augment': 'selective',
+            'filters': [{'type': 'value', 'key': 'Name || Policy', 'value': 'present'}]})
+        self.assertIsNone(p.resource_manager.get_augment_keys())
+
+    def test_related_manager_full_augment(self):
+        p = self.load_policy({
+            'name': 'lambda-runtime',
+            'resource': 'aws.lambda',
+            'augment': 'selective',
+            'filters': [{'Runtime': 'python2.7'}]})
+        self.assertEqual(p.resource_manager.get_augment_keys(), {'Runtime'})
+        related = p.resource_manager.get_resource_manager('aws.lambda')
+        self.assertIsNone(related.get_augment_keys())
+
+    def test_prefilters(self):
+        p = self.load_policy({
+            'name': 's3-old',
+            'resource': 'aws.s3',
+            'augment': 'prefilter',
+            'filters': [
+                {'type': 'value', 'key': 'CreationDate', 'value_type': 'age',
+                 'value': 90, 'op': 'gt'},
+                {'tag:Owner': 'absent'},
+                {'type': 'value', 'key': 'c7n:MatchedFilters', 'value': 'present'},
+                {'or': [{'Name': 'abc'}]}]})
+        manager = p.resource_manager
+        self.assertEqual(
+            [f.data.get('key') for f in manager.get_prefilters()], ['CreationDate'])
+        self.assertIsNone(manager.get_augment_keys())
+
+        p = self.load_policy({
+            'name': 's3-old',
+            'resource': 'aws.s3',
+            'max-resources-percent': 10,
+            'augment': 'prefilter',
+            'filters': [{'Name': 'abc'}]})
+        self.assertEqual(p.resource_manager.get_prefilters(), [])
+
+        # detail spec augments may populate any key
+        p = self.load_policy({
+            'name': 'sqs-name',
+            'resource': 'aws.sqs',
+            'augment': 'prefilter',
+            'filters': [{'QueueUrl': 'abc'}]})
+        self.assertEqual(p.resource_manager.get_prefilters(), [])
@@ -1373,6 +1373,50 @@ class BucketPolicyStatements(BaseTest):
 
 class S3Test(BaseTest):
 
+    def test_bucket_selective_augment(self):
+        self.patch(s3.S3, "executor_factory", MainThreadExecutor)
+        session_factory = self.replay_flight_data("test_s3_iam_analyzers")
+        p = self.load_policy({
+            'name': 's3-selective',
+            'resource': 'aws.s3',
+            'augment': 'selective',
+            'filters': [{'Name': 'stacklet-tfstate'}]},
+            session_factory=session_factory)
+        resources = p.run()
+        self.assertEqual(len(resources), 1)
+        # only location is fetched, which all buckets require
+        self.assertIn('Location', resources[0])
+        self.assertNotIn('Tags', resources[0])
+        self.assertNotIn('Acl', resources[0])
+
+    def test_bucket_prefilter_augment(self):
+        self.patch(s3.S3, "executor_factory", MainThreadExecutor)
+        session_factory = self.replay_flight_data("test_s3_iam_analyzers")
+        p = self.load_policy({
+            'name': 's3-prefilter',
+            'resource': 'aws.s3',
+            'augment': 'prefilter',
+            'filters': [
+                {'Name': 'stacklet-tfstate'},
+                {'type': 'global-grants'}]},
+            session_factory=session_factory)
+        self.patch(s3, "S3_AUGMENT_TABLE", [
+            ('get_bucket_location', 'Location', {}, None, 's3:GetBucketLocation')])
+        resources = p.run()
+        self.assertEqual(len(resources), 0)
+        self.assertEqual(
+            p.resource_manager.get_prefilters(), p.resource_manager.filters[:1])
+
+        # non matching buckets are never augmented
+        p = self.load_policy({
+            'name': 's3-prefilter',
+            'resource': 'aws.s3',
+            'augment': 'prefilter',
+            'filters': [{'Name': 'some-other-bucket'}]},
+            session_factory=session_factory)
+        self.patch(s3, "assemble_bucket", lambda item: self.fail('augmented'))
+        self.assertEqual(p.run(), [])
+
     def test_bucket_get_resources(self):
         self.patch(s3.S3, "executor_factory", MainThreadExecutor)
         self.patch(s3, "S3_AUGMENT_TABLE", [
@@ -7,7 +7,11 @@ import time
 from freezegun import freeze_time
 from mock import MagicMock, call
 
-from c7n.tags import universal_retry, coalesce_copy_user_tags
+from botocore.exceptions import ClientError
+
+from c7n import tagplan
+from c7n.cache import InMemoryCache, encode
+from c7n.tags import RemoveTag, Tag, universal_retry, coalesce_copy_user_tags
 from c7n.exceptions import PolicyExecutionError, PolicyValidationError
 from c7n.utils import yaml_load
 
@@ -221,6 +225,170 @@ class UniversalTagTest(BaseTest):
             """)
 
 
+class TagMutationTest(BaseTest):
+
+    def test_tag_batch_size(self):
+        p = self.load_policy({
+            'name': 'ec2-tag',
+            'resource': 'ec2',
+            'actions': [
+                {'type': 'tag', 'key': 'App', 'value': 'web'},
+                {'type': 'remove-tag', 'tags': ['App']},
+                {'type': 'mark-for-op', 'op': 'stop', 'days': 1}]})
+        tag, untag, _ = p.resource_manager.actions
+        self.assertEqual(tag.get_batch_size(), 1000)
+        self.assertEqual(untag.get_batch_size(), 1000)
+        self.assertEqual(p.resource_manager.action_registry['tag'].get_batch_size(), 1000)
+        p = self.load_policy({
+            'name': 'sqs-tag',
+            'resource': 'sqs',
+            'actions': [{'type': 'tag', 'key': 'App', 'value': 'web'}]})
+        self.assertEqual(p.resource_manager.actions[0].get_batch_size(), 20)
+
+    def test_tag_resources_with_cached_tags(self):
+        p = self.load_policy({
+            'name': 'ec2-tag',
+            'resource': 'ec2',
+            'actions': [{'type': 'tag', 'tags': {'App': 'web', 'Env': 'dev'}}]})
+        client = MagicMock()
+        tag = p.resource_manager.actions[0]
+        self.patch(tag, 'get_client', lambda: client)
+        resources = [
+            {'InstanceId': 'i-1', 'Tags': [{'Key': 'App', 'Value': 'api'}]},
+            {'InstanceId': 'i-2', 'Tags': [
+                {'Key': 'App', 'Value': 'web'}, {'Key': 'Env', 'Value': 'dev'}]},
+            {'InstanceId': 'i-3'}]
+        tag.process(resources)
+        # cached tags may be stale, so resources appearing tagged are still tagged
+        client.create_tags.assert_called_once_with(
+            Resources=['i-1', 'i-2', 'i-3'], DryRun=False,
+            Tags=[{'Key': 'App', 'Value': 'web'}, {'Key': 'Env', 'Value': 'dev'}])
+
+
+class TagPlannerTest(BaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.client = MagicMock()
+        self.patch(Tag, 'get_client', lambda action: self.client)
+        self.patch(RemoveTag, 'get_client', lambda action: self.client)
+
+    def get_resources(self):
+        return [
+            {'InstanceId': 'i-1', 'Tags': [{'Key': 'Owner', 'Value': 'kapil'}]},
+            {'InstanceId': 'i-2', 'Tags': []},
+            {'InstanceId': 'i-3', 'Tags': [{'Key': 'App', 'Value': 'api'}]}]
+
+    def load_tag_policy(self, name, actions, resources):
+        p = self.load_policy({'name': name, 'resource': 'ec2', 'actions': actions})
+        self.patch(p.resource_manager, 'resources', lambda: resources)
+        return p
+
+    def test_planner_coalesces_policy_actions(self):
+        resources = self.get_resources()
+        p = self.load_tag_policy('ec2-tag', [
+            {'type': 'tag', 'key': 'App', 'value': 'web'},
+            {'type': 'tag', 'key': 'Env', 'value': 'dev'},
+            {'type': 'remove-tag', 'tags': ['Owner']}], resources)
+        p()
+        self.client.delete_tags.assert_called_once_with(
+            Resources=['i-1', 'i-2', 'i-3'], Tags=[{'Key': 'Owner'}], DryRun=False)
+        self.client.create_tags.assert_called_once_with(
+            Resources=['i-1', 'i-2', 'i-3'], DryRun=False,
+            Tags=[{'Key': 'App', 'Value': 'web'}, {'Key': 'Env', 'Value': 'dev'}])
+        # the policy's resources are left as matched
+        self.assertEqual(resources, self.get_resources())
+
+    def test_planner_flushes_before_actions(self):
+        p = self.load_tag_policy('ec2-tag', [
+            {'type': 'tag', 'key': 'App', 'value': 'web'},
+            {'type': 'stop'}], self.get_resources())
+        stop = p.resource_manager.actions[1]
+        self.patch(stop, 'process', lambda resources: self.assertEqual(
+            self.client.create_tags.call_count, 1))
+        p()
+        self.assertEqual(self.client.create_tags.call_count, 1)
+
+    def test_planner_run_scope_groups_tag_sets(self):
+        resources = self.get_resources()
+        p1 = self.load_tag_policy(
+            'ec2-app', [{'type': 'tag', 'key': 'App', 'value': 'web'}], resources[:2])
+        p2 = self.load_tag_policy(
+            'ec2-env', [{'type': 'tag', 'key': 'Env', 'value': 'dev'}], resources[1:])
+        with tagplan.run_scope() as planner:
+            p1()
+            p2()
+            self.assertFalse(self.client.create_tags.called)
+            planner.flush()
+        self.assertEqual(sorted(
+            (c[1]['Resources'], [t['Key'] for t in c[1]['Tags']])
+            for c in self.client.create_tags.call_args_list), [
+                (['i-1'], ['App']),
+                (['i-2'], ['App', 'Env']),
+                (['i-3'], ['Env'])])
+        self.assertEqual(planner.errored, set())
+
+    def test_planner_run_scope_errors(self):
+        self.client.create_tags.side_effect = ValueError('bad')
+        p = self.load_tag_policy(
+            'ec2-app', [{'type': 'tag', 'key': 'App', 'value': 'web'}],
+            self.get_resources())
+        with tagplan.run_scope() as planner:
+            p()
+            self.assertRaises(ValueError, planner.flush)
+        self.assertEqual(planner.errored, {'ec2-app'})
+
+    def test_planner_patches_cache(self):
+        resources = self.get_resources()
+        p = self.load_tag_policy(
+            'ec2-app', [{'type': 'tag', 'key': 'App', 'value': 'web'}], resources)
+        manager = p.resource_manager
+        manager._cache = InMemoryCache(None)
+        key = manager.get_cache_key(manager.source.get_query_params(None))
+        manager._cache.save(key, resources)
+        self.addCleanup(manager._cache.data.pop, encode(key))
+
+        with tagplan.run_scope() as planner:
+            p()
+            # reads from the patched cache entry see the pending tags
+            planner.prepare(manager, key)
+            self.assertFalse(self.client.create_tags.called)
+            self.assertEqual(
+                manager._cache.get(key)[1]['Tags'], [{'Key': 'App', 'Value': 'web'}])
+            self.assertEqual(resources[1]['Tags'], [])
+            # describing the resources flushes pending tags first
+            planner.prepare(manager)
+            self.assertEqual(self.client.create_tags.call_count, 1)
+            planner.flush()
+        self.assertEqual(self.client.create_tags.call_count, 1)
+
+    def test_planner_retries_throttled_batches(self):
+        self.patch(tagplan.TagPlan, 'throttle_delay', 0)
+        self.client.create_tags.side_effect = [
+            ClientError({'Error': {'Code': 'RequestLimitExceeded'}}, 'CreateTags'), {}]
+        p = self.load_tag_policy(
+            'ec2-app', [{'type': 'tag', 'key': 'App', 'value': 'web'}],
+            self.get_resources())
+        self.patch(p.resource_manager, 'retry', lambda f, **kw: f(**kw))
+        p()
+        self.assertEqual(self.client.create_tags.call_count, 2)
+
+    def test_tag_skips_invalid_ids(self):
+        def create_tags(Resources, **kw):
+            if 'i-2' in Resources:
+                raise ClientError(
+                    {'Error': {'Code': 'InvalidInstanceID.NotFound'}}, 'CreateTags')
+
+        self.client.create_tags.side_effect = create_tags
+        p = self.load_tag_policy(
+            'ec2-app', [{'type': 'tag', 'key': 'App', 'value': 'web'}],
+            self.get_resources())
+        p.resource_manager.actions[0].process(self.get_resources())
+        self.assertEqual(
+            [c[1]['Resources'] for c in self.client.create_tags.call_args_list],
+            [['i-1', 'i-2', 'i-3'], ['i-1'], ['i-2', 'i-3'], ['i-2'], ['i-3']])
+
+
 class CoalesceCopyUserTags(BaseTest):
     def test_copy_bool_user_tags(self):
         tags = [{'Key': 'test-key', 'Value': 'test-value'}]
@@ -6,6 +6,7 @@ from .common import BaseTest, functional, event_data, load_data
 from unittest.mock import MagicMock
 
 from botocore.exceptions import ClientError as BotoClientError
+from c7n.config import Config
 from c7n.exceptions import PolicyValidationError
 from c7n.resources.aws import shape_validate
 from pytest_terraform import terraform
@@ -2083,6 +2084,27 @@ class SecurityGroupTest(BaseTest):
         resources = p.run()
         self.assertEqual(len(resources), 2)
 
+    def test_usage_graph_shared(self):
+        factory = self.replay_flight_data("test_security_group_unused")
+        config = Config.empty(
+            cache='memory', cache_period=10, output_dir=self.get_temp_dir(),
+            account_id='644160558196')
+        p = self.load_policy(
+            {"name": "sg-unused", "resource": "security-group", "filters": ["unused"]},
+            session_factory=factory, cache=True, config=config)
+        unused = p.run()
+        self.assertEqual(len(unused), 2)
+
+        p = self.load_policy(
+            {"name": "sg-used", "resource": "security-group", "filters": ["used"]},
+            session_factory=factory, cache=True, config=config)
+        used = p.resource_manager.filters[0]
+        self.patch(used, 'scan_usage', MagicMock(side_effect=AssertionError('rescanned')))
+        resources = p.run()
+        self.assertTrue(resources)
+        self.assertFalse(
+            {r['GroupId'] for r in unused}.intersection(r['GroupId'] for r in resources))
+
     def test_match_resource_validator(self):
 
         try:
@@ -99,6 +99,18 @@ def dump(directory, var_file, output_file, output_query):
     help="Use a jmespath expression to filter json output",
 )
 @click.option("--summary", default="policy", type=click.Choice(summary_options.keys()))
+@click.option(
+    "-w",
+    "--workers",
+    type=int,
+    default=1,
+    help="Evaluate policies across this many processes (default 1)",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    help="Cache parsed sources and results here, to only evaluate changes on later runs",
+)
 def run(
     format,
     policy_dir,
@@ -110,6 +122,8 @@ def run(
     summary,
     filters,
     warn_on,
+    workers=1,
+    cache_dir=None,
     reporter=None,
 ):
     """evaluate policies against IaC sources.
@@ -129,6 +143,8 @@ def run(
         summary=summary,
         warn_on=warn_on,
         filters=filters,
+        workers=workers,
+        cache_dir=cache_dir,
     )
     policies = config.exec_filter.filter_policies(load_policies(policy_dir, config))
     if not policies:
@@ -196,6 +212,8 @@ def get_config(
     filters=None,
     warn_on=None,
     format="terraform",
+    workers=1,
+    cache_dir=None,
 ):
     config = Config.empty(
         source_dir=directory and Path(directory),
@@ -208,6 +226,8 @@ def get_config(
         filters=filters,
         warn_on=warn_on,
         format=format,
+        workers=workers,
+        cache_dir=cache_dir,
     )
     config["exec_filter"] = ExecutionFilter.parse(config.filters)
     config["warn_filter"] = ExecutionFilter.parse(config.warn_on, severity_direction="gte")
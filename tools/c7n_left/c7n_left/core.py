@@ -2,10 +2,13 @@
 # SPDX-License-Identifier: Apache-2.0
 #
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import fnmatch
 import logging
+import multiprocessing
 import operator
 import os
+import pickle
 
 from c7n.actions import ActionRegistry
 from c7n.cache import NullCache
@@ -17,6 +20,7 @@ from c7n.provider import Provider, clouds
 from c7n.policy import PolicyExecutionMode
 
 from .filters import Traverse
+from .incremental import ScanCache
 from .utils import SEVERITY_LEVELS
 
 log = logging.getLogger("c7n.iac")
@@ -34,7 +38,7 @@ class IACSourceProvider(Provider):
     def initialize_policies(self, policies, options):
         return policies
 
-    def parse(self, source_dir, var_files):
+    def parse(self, source_dir, var_files, cache=None):
         """Return the resource graph for the provider"""
 
 
@@ -227,6 +231,8 @@ class CollectionRunner:
         self.options = options
         self.reporter = reporter
         self.provider = None
+        self._type_index = None
+        self._type_policies = {}
 
     def run(self) -> bool:
         # return value is used to signal process exit code.
@@ -237,7 +243,11 @@ class CollectionRunner:
             log.warning("no %s source files found" % provider.type)
             return True
 
-        graph = self.provider.parse(self.options.source_dir, self.options.var_files)
+        cache = self.get_cache()
+        graph = self.provider.parse(self.options.source_dir, self.options.var_files, cache)
+        if cache:
+            cache.set_digests(graph.get_resource_digests())
+            event["result_cache"] = cache
 
         for p in self.policies:
             p.expand_variables(p.get_variables())
@@ -247,33 +257,83 @@ class CollectionRunner:
         # consider inverting this order to allow for results grouped by policy
         # at the moment, we're doing results grouped by resource.
         found = False
+        workers = self.options.get("workers") or 1
+        if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+            evaluations = self.evaluate_parallel(graph, event, workers)
+        else:
+            evaluations = self.evaluate(graph, event)
+
+        for p, rtype, resources, result_set, error in evaluations:
+            if cache and getattr(result_set, "evaluated", None) is not None:
+                cache.record(p, result_set.evaluated)
+            if error is not None:
+                found = True
+                self.reporter.on_policy_error(error, p, rtype, resources)
+            if result_set:
+                self.reporter.on_results(p, result_set)
+            if result_set and (
+                not self.options.warn_filter or not self.options.warn_filter.filter_policies((p,))
+            ):
+                found = True
+        if cache:
+            cache.save()
+        self.reporter.on_execution_ended()
+        return found
+
+    def get_shards(self, graph):
+        """Yield the (resource type, resources, policy) units of evaluation."""
         for rtype, resources in graph.get_resources_by_type():
             if self.options.exec_filter:
                 resources = self.options.exec_filter.filter_resources(rtype, resources)
             if not resources:
                 continue
-            for p in self.policies:
-                if not self.match_type(rtype, p):
-                    continue
-                result_set = []
-                try:
-                    result_set = self.run_policy(p, graph, resources, event, rtype)
-                except Exception as e:
-                    found = True
-                    self.reporter.on_policy_error(e, p, rtype, resources)
-                if result_set:
-                    self.reporter.on_results(p, result_set)
-                if result_set and (
-                    not self.options.warn_filter
-                    or not self.options.warn_filter.filter_policies((p,))
-                ):
-                    found = True
-        self.reporter.on_execution_ended()
-        return found
-
-    def run_policy(self, policy, graph, resources, event, resource_type):
+            for p in self.get_type_policies(rtype):
+                yield rtype, resources, p
+
+    def evaluate(self, graph, event):
+        for rtype, resources, p in self.get_shards(graph):
+            result_set, error = None, None
+            try:
+                result_set = self.run_policy(p, graph, resources, event, rtype)
+            except Exception as e:
+                error = e
+            yield p, rtype, resources, result_set, error
+
+    def evaluate_parallel(self, graph, event, workers):
+        """Evaluate shards across forked worker processes.
+
+        Workers inherit the graph and policies on fork, and are sent shard
+        indexes. Results are yielded in shard order, as with evaluate, so
+        output is stable regardless of which worker finishes first.
+        """
+        shards = list(self.get_shards(graph))
+        if not shards:
+            return
+        chunk_size = max(1, len(shards) // (workers * 4))
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_shard_worker,
+            initargs=(self, graph, event, shards),
+        ) as executor:
+            results = executor.map(_run_shard, range(len(shards)), chunksize=chunk_size)
+            for (rtype, resources, p), (matched, evaluated, error) in zip(shards, results):
+                self.reporter.on_policy_start(
+                    p, self.get_policy_event(graph, resources, event, rtype)
+                )
+                result_set = None
+                if error is None:
+                    result_set = ResultSet([PolicyResourceResult(r, p) for r in matched])
+                    result_set.evaluated = evaluated
+                yield p, rtype, resources, result_set, error
+
+    def get_policy_event(self, graph, resources, event, resource_type):
         event = dict(event)
         event.update({"graph": graph, "resources": resources, "resource_type": resource_type})
+        return event
+
+    def run_policy(self, policy, graph, resources, event, resource_type):
+        event = self.get_policy_event(graph, resources, event, resource_type)
         self.reporter.on_policy_start(policy, event)
         return policy.push(event)
 
@@ -286,6 +346,46 @@ class CollectionRunner:
     def get_event(self):
         return {"config": self.options, "env": dict(os.environ)}
 
+    def get_cache(self):
+        if self.options.get("cache_dir"):
+            return ScanCache(self.options.cache_dir)
+
+    def get_type_index(self):
+        """Index policies by resource type.
+
+        Returns a mapping of literal resource types to (policy position,
+        policy), and a list of (policy position, pattern, policy) for
+        policies using globs.
+        """
+        types, patterns = defaultdict(list), []
+        for idx, p in enumerate(self.policies):
+            rtypes = p.resource_type
+            if isinstance(rtypes, str):
+                rtypes = [rtypes]
+            elif not isinstance(rtypes, list):
+                continue
+            for rt in rtypes:
+                rt = rt.split(".", 1)[-1]
+                if any(c in rt for c in "*?["):
+                    patterns.append((idx, rt, p))
+                else:
+                    types[rt].append((idx, p))
+        return types, patterns
+
+    def get_type_policies(self, rtype):
+        """Return the policies matching a resource type, in policy order."""
+        if rtype in self._type_policies:
+            return self._type_policies[rtype]
+        if self._type_index is None:
+            self._type_index = self.get_type_index()
+        types, patterns = self._type_index
+        matched = dict(types.get(rtype, ()))
+        for idx, pattern, p in patterns:
+            if idx not in matched and fnmatch.fnmatch(rtype, pattern):
+                matched[idx] = p
+        policies = self._type_policies[rtype] = [matched[idx] for idx in sorted(matched)]
+        return policies
+
     @staticmethod
     def match_type(rtype, p):
         if isinstance(p.resource_type, str):
@@ -299,6 +399,29 @@ class CollectionRunner:
         return found
 
 
+# state of a parallel evaluation, inherited by forked workers
+_shard_state = None
+
+
+def _init_shard_worker(runner, graph, event, shards):
+    global _shard_state
+    _shard_state = (runner, graph, event, shards)
+
+
+def _run_shard(idx):
+    runner, graph, event, shards = _shard_state
+    rtype, resources, policy = shards[idx]
+    try:
+        result_set = policy.push(runner.get_policy_event(graph, resources, event, rtype))
+        return [r.resource for r in result_set], getattr(result_set, "evaluated", None), None
+    except Exception as e:
+        try:
+            pickle.dumps(e)
+        except Exception:
+            e = RuntimeError("%s: %s" % (e.__class__.__name__, e))
+        return None, None, e
+
+
 class IACSourceMode(PolicyExecutionMode):
     @property
     def manager(self):
@@ -310,15 +433,23 @@ class IACSourceMode(PolicyExecutionMode):
 
         resources = event["resources"]
         resources = self.manager.augment(resources, event)
-        resources = self.manager.filter_resources(resources, event)
-        return self.as_results(resources, event)
+        cache = event.get("result_cache")
+        if cache is None:
+            return self.as_results(self.manager.filter_resources(resources, event), event)
+        resources, evaluated = cache.filter_resources(
+            self.policy, resources, event, self.manager.filter_resources
+        )
+        results = self.as_results(resources, event)
+        results.evaluated = evaluated
+        return results
 
     def as_results(self, resources, event):
         return ResultSet([PolicyResourceResult(r, self.policy) for r in resources])
 
 
 class ResultSet(list):
-    pass
+    # whether each resource matched, by resource key, for incremental runs
+    evaluated = None
 
 
 class PolicyResourceResult:
@@ -419,3 +550,6 @@ class ResourceGraph:
 
     def resolve_refs(self, resource, target_type):
         raise NotImplementedError()
+
+    def get_resource_digests(self):
+        raise NotImplementedError()
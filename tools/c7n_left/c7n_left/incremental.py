@@ -0,0 +1,246 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+#
+"""Cache the parsed source graph and per resource policy results across
+runs, so only resources affected by a change are evaluated again.
+"""
+from collections import Counter
+import hashlib
+from importlib.metadata import version as pkg_version, PackageNotFoundError
+import json
+import logging
+import os
+from pathlib import Path
+
+log = logging.getLogger("c7n.iac")
+
+
+def get_digest(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf8")).hexdigest()
+
+
+class VarRecorder:
+    """Forward discovered variables to a reporter, keeping a copy to replay."""
+
+    def __init__(self, reporter):
+        self.reporter = reporter
+        self.vars = []
+
+    def on_vars_discovered(self, var_type, var_map, var_path=None):
+        self.vars.append((var_type, var_map, var_path and str(var_path)))
+        if self.reporter:
+            self.reporter.on_vars_discovered(var_type, var_map, var_path)
+
+
+class ScanCache:
+    """Parsed graph and per resource policy results of previous runs.
+
+    The parsed graph is reused when none of the source files, variable
+    files or TF_VAR_ environment variables have changed, nor the files of
+    any module directory the parse loaded, including local modules outside
+    the source directory. Graphs using remote module sources, whose
+    content may change on download, are never reused.
+
+    Policy results are kept per resource along with a digest of the
+    resource, as given by the graph, and of the policy. A resource is
+    evaluated again only if either has changed since its result was
+    recorded. Everything is discarded on a c7n-left or parser upgrade.
+    """
+
+    version = 2
+    source_suffixes = (".tf", ".tf.json", ".tfvars", ".tfvars.json")
+    packages = ("c7n-left", "tfparse")
+
+    def __init__(self, path):
+        self.path = Path(path).expanduser()
+        self.digests = {}
+        self.policy_digests = {}
+        self.results = None
+        self.stats = Counter()
+
+    def get_versions(self):
+        versions = {"cache": self.version}
+        for p in self.packages:
+            try:
+                versions[p] = pkg_version(p)
+            except PackageNotFoundError:
+                versions[p] = None
+        return versions
+
+    def get_source_files(self, source_dir):
+        for root, dirs, files in os.walk(source_dir):
+            dirs.sort()
+            for f in sorted(files):
+                # skip variable files written by a concurrent parse
+                if f.startswith("c7n-left-") or not f.endswith(self.source_suffixes):
+                    continue
+                yield Path(root) / f
+
+    def get_dir_digest(self, module_dir):
+        """Digest the source files of a module directory, not its sub directories."""
+        module_dir = Path(module_dir)
+        if not module_dir.is_dir():
+            return None
+        files = {}
+        for f in sorted(module_dir.iterdir()):
+            if f.is_file() and f.name.endswith(self.source_suffixes):
+                files[f.name] = hashlib.sha256(f.read_bytes()).hexdigest()
+        return get_digest(files)
+
+    @staticmethod
+    def get_module_dirs(source_dir, data):
+        """Return the directories of the modules in parsed graph data.
+
+        Returns None if a module's source isn't a local path.
+        """
+        dirs = set()
+        for blocks in data.values():
+            for block in blocks:
+                filename = block["__tfmeta"].get("filename")
+                if filename:
+                    dirs.add(os.path.normpath(os.path.join(source_dir, os.path.dirname(filename))))
+        for block in data.get("module", ()):
+            source = block.get("source")
+            if not isinstance(source, str) or not source.startswith(("./", "../")):
+                return None
+            block_dir = os.path.dirname(block["__tfmeta"]["filename"])
+            dirs.add(os.path.normpath(os.path.join(source_dir, block_dir, source)))
+        return sorted(dirs)
+
+    def get_source_key(self, source_dir, var_files=()):
+        files = {}
+        for f in self.get_source_files(source_dir):
+            files[str(f.relative_to(source_dir))] = hashlib.sha256(f.read_bytes()).hexdigest()
+        for f in var_files:
+            files["var-file:%s" % f] = hashlib.sha256(Path(f).read_bytes()).hexdigest()
+        env = {k: v for k, v in os.environ.items() if k.startswith("TF_VAR_")}
+        return get_digest(
+            {
+                "versions": self.get_versions(),
+                "files": files,
+                "env": env,
+                "source_dir": str(source_dir),
+            }
+        )
+
+    def read(self, name):
+        path = self.path / name
+        if not path.exists():
+            return None
+        try:
+            with open(path) as fh:
+                return json.load(fh)
+        except ValueError:
+            log.warning("ignoring unreadable scan cache %s", path)
+            return None
+
+    def write(self, name, data):
+        os.makedirs(self.path, exist_ok=True)
+        path = self.path / name
+        tmp_path = "%s.tmp" % path
+        with open(tmp_path, "w") as fh:
+            json.dump(data, fh, default=str)
+        os.replace(tmp_path, path)
+
+    def load_graph(self, source_key):
+        """Return the parsed graph data and variables of the source, if cached."""
+        cached = self.read("graph.json")
+        if not cached or cached.get("key") != source_key:
+            return None, ()
+        for module_dir, digest in cached["modules"].items():
+            if self.get_dir_digest(module_dir) != digest:
+                log.debug("Scan cache module changed %s", module_dir)
+                return None, ()
+        return cached["data"], cached["vars"]
+
+    def save_graph(self, source_key, data, variables, source_dir):
+        module_dirs = self.get_module_dirs(source_dir, data)
+        if module_dirs is None:
+            log.debug("Scan cache not saving graph with remote module sources")
+            (self.path / "graph.json").unlink(missing_ok=True)
+            return
+        modules = {d: self.get_dir_digest(d) for d in module_dirs}
+        self.write(
+            "graph.json", {"key": source_key, "vars": variables, "modules": modules, "data": data}
+        )
+
+    def load_results(self):
+        cached = self.read("results.json")
+        if not cached or cached.get("versions") != self.get_versions():
+            return {}
+        return cached["policies"]
+
+    def set_digests(self, digests):
+        """Set the current digests of resources, by path."""
+        self.digests = digests
+        self.results = self.load_results()
+
+    def save(self):
+        for entry in self.results.values():
+            entry["resources"] = {
+                k: v
+                for k, v in entry["resources"].items()
+                if v[0] is not None and self.digests.get(k.split("#", 1)[0]) == v[0]
+            }
+        self.write("results.json", {"versions": self.get_versions(), "policies": self.results})
+        log.debug(
+            "Scan cache evaluated:%d cached:%d", self.stats["evaluated"], self.stats["cached"]
+        )
+
+    def get_policy_digest(self, policy):
+        if policy.name not in self.policy_digests:
+            self.policy_digests[policy.name] = get_digest(policy.data)
+        return self.policy_digests[policy.name]
+
+    @staticmethod
+    def get_keys(resources):
+        """Key resources by path, numbering any that share a path."""
+        counts = Counter()
+        keys = []
+        for r in resources:
+            path = r["__tfmeta"]["path"]
+            keys.append(counts[path] and "%s#%d" % (path, counts[path]) or path)
+            counts[path] += 1
+        return keys
+
+    def get_result(self, policy, key):
+        """Return whether a resource matched the policy, or None if unknown."""
+        entry = self.results.get(policy.name)
+        if not entry or entry["digest"] != self.get_policy_digest(policy):
+            return None
+        result = entry["resources"].get(key)
+        digest = self.digests.get(key.split("#", 1)[0])
+        if not result or digest is None or result[0] != digest:
+            return None
+        return result[1]
+
+    def filter_resources(self, policy, resources, event, filter_resources):
+        """Filter resources, using recorded results where they're current.
+
+        Returns the matched resources in their original order, and a map
+        of resource key to whether it matched, to be recorded.
+        """
+        keys = self.get_keys(resources)
+        results = {k: self.get_result(policy, k) for k in keys}
+        stale = [r for k, r in zip(keys, resources) if results[k] is None]
+        self.stats["cached"] += len(resources) - len(stale)
+        self.stats["evaluated"] += len(stale)
+
+        matched_ids = set()
+        if stale:
+            matched_ids = {id(r) for r in filter_resources(stale, event)}
+        matched = []
+        for k, r in zip(keys, resources):
+            if results[k] is None:
+                results[k] = id(r) in matched_ids
+            if results[k]:
+                matched.append(r)
+        return matched, results
+
+    def record(self, policy, results):
+        entry = self.results.get(policy.name)
+        digest = self.get_policy_digest(policy)
+        if not entry or entry["digest"] != digest:
+            entry = self.results[policy.name] = {"digest": digest, "resources": {}}
+        for k, matched in results.items():
+            entry["resources"][k] = [self.digests.get(k.split("#", 1)[0]), matched]
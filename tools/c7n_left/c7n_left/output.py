@@ -15,6 +15,7 @@ from rich.console import Console
 from rich.syntax import Syntax
 from rich.table import Table
 from rich.text import Text
+from rich.traceback import Traceback
 
 from .core import CollectionRunner, PolicyMetadata
 from .utils import SEVERITY_LEVELS
@@ -101,7 +102,9 @@ class RichCli(Output):
 
     def on_policy_error(self, exception, policy, rtype, resources):
         self.console.print(f"[red]error[/red] policy:{policy.name} resource:{rtype}")
-        self.console.print_exception()
+        self.console.print(
+            Traceback.from_exception(type(exception), exception, exception.__traceback__)
+        )
 
     def on_vars_discovered(self, var_type, var_map, var_path=None):
         if var_type != "uninitialized" and var_map:
@@ -1,58 +1,99 @@
 # Copyright The Cloud Custodian Authors.
 # SPDX-License-Identifier: Apache-2.0
 #
+import hashlib
+import itertools
+import json
+import re
 
 from ...core import ResourceGraph
 from .resource import TerraformResource
 
+UUID_PATTERN = re.compile("[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
 
 class TerraformGraph(ResourceGraph):
     resolver = None
 
+    # non resource block types, and the type set on their blocks
+    block_types = {
+        "module": "module",
+        "moved": "moved",
+        "locals": "local",
+        "terraform": "terraform",
+        "provider": "provider",
+        "variable": "variable",
+        "output": "output",
+    }
+
+    def __init__(self, resource_data, src_dir):
+        super().__init__(resource_data, src_dir)
+        self._type_index = None
+        self._type_order = None
+        self._path_index = None
+
     def __len__(self):
         return sum([len(v) for k, v in self.resource_data.items() if "_" in k])
 
+    def get_type_index(self):
+        """Resources by type, with data sources keyed as data.type, in parse order.
+
+        Resources are wrapped once, and shared by all queries.
+        """
+        if self._type_index is not None:
+            return self._type_index
+        index = {}
+        for type_name, type_items in self.resource_data.items():
+            if type_name in self.block_types:
+                index[type_name] = [
+                    self.as_resource(type_name, d, self.block_types[type_name]) for d in type_items
+                ]
+                continue
+            data_resources = []
+            resources = []
+            for item in type_items:
+                name = item["__tfmeta"]["path"]
+                resource = self.as_resource(name, item)
+                if item["__tfmeta"].get("type", "resource") == "data":
+                    data_resources.append(resource)
+                else:
+                    resources.append(resource)
+            if resources:
+                index[type_name] = resources
+            if data_resources:
+                index[f"data.{type_name}"] = data_resources
+        self._type_order = {type_name: idx for idx, type_name in enumerate(index)}
+        self._type_index = index
+        return index
+
     def get_resources_by_type(self, types=()):
+        index = self.get_type_index()
         if isinstance(types, str):
             types = (types,)
-        for type_name, type_items in self.resource_data.items():
-            if types and (type_name not in types and f"data.{type_name}" not in types):
-                continue
-            elif type_name == "module":
-                yield type_name, [self.as_resource(type_name, d, "module") for d in type_items]
-            elif type_name == "moved":
-                yield type_name, [self.as_resource(type_name, d, "moved") for d in type_items]
-            elif type_name == "locals":
-                yield type_name, [self.as_resource(type_name, d, "local") for d in type_items]
-            elif type_name == "terraform":
-                yield type_name, [self.as_resource(type_name, d, "terraform") for d in type_items]
-            elif type_name == "provider":
-                yield type_name, [self.as_resource(type_name, d, "provider") for d in type_items]
-            elif type_name == "variable":
-                yield type_name, [self.as_resource(type_name, d, "variable") for d in type_items]
-            elif type_name == "output":
-                yield type_name, [self.as_resource(type_name, d, "output") for d in type_items]
-            else:
-                data_resources = []
-                resources = []
-                for item in type_items:
-                    name = item["__tfmeta"]["path"]
-                    resource = self.as_resource(name, item)
-                    if item["__tfmeta"].get("type", "resource") == "data":
-                        data_resources.append(resource)
-                    else:
-                        resources.append(resource)
-
-                if resources:
-                    if types and type_name in types:
-                        yield type_name, resources
-                    elif not types:
-                        yield type_name, resources
-                if data_resources:
-                    if types and f"data.{type_name}" in types:
-                        yield f"data.{type_name}", data_resources
-                    elif not types:
-                        yield f"data.{type_name}", data_resources
+        type_names = index
+        if types:
+            type_names = {t for t in types if t in index}
+            # non resource blocks have also matched as data sources
+            type_names.update(
+                t[5:]
+                for t in types
+                if t.startswith("data.") and t[5:] in self.block_types and t[5:] in index
+            )
+            type_names = sorted(type_names, key=self._type_order.get)
+        for type_name in type_names:
+            # callers may modify the list, but not the index
+            yield type_name, list(index[type_name])
+
+    def get_resource(self, path):
+        """Return a resource or block by path."""
+        if self._path_index is None:
+            self._path_index = {
+                r["__tfmeta"]["path"]: r
+                for resources in self.get_type_index().values()
+                for r in resources
+                if "path" in r["__tfmeta"]
+            }
+        return self._path_index.get(path)
 
     def as_resource(self, name, data, type_name=None):
         if type_name and "type" not in data["__tfmeta"]:
@@ -68,11 +109,80 @@ class TerraformGraph(ResourceGraph):
     def get_refs(self, resource, target_type):
         return self.resolver.resolve_refs(resource, (target_type,))
 
+    def get_resource_digests(self):
+        """Digest blocks by path, for detecting changes between parses.
+
+        A block's digest covers its content and that of every block
+        connected to it by references, along with provider blocks for
+        their default tags. Block ids are generated per parse, so they're
+        replaced by the path of the block they identify.
+        """
+        id_map = self.resolver._id_map
+
+        def get_ref_path(match):
+            block = id_map.get(match.group(0))
+            return block and block["__tfmeta"].get("path", "") or ""
+
+        digests = {}
+        contents = {}
+        parents = {}
+
+        def find(path):
+            while parents.setdefault(path, path) != path:
+                parents[path] = path = parents[parents[path]]
+            return path
+
+        for type_name, blocks in self.resource_data.items():
+            for block in blocks:
+                path = block["__tfmeta"].get("path", type_name)
+                content = UUID_PATTERN.sub(
+                    get_ref_path, json.dumps(block, sort_keys=True, default=str)
+                )
+                contents.setdefault(path, []).append(content)
+
+        def union(path, other):
+            parents[find(other)] = find(path)
+
+        for bid, refs in self.resolver._ref_map.items():
+            path = get_ref_path(UUID_PATTERN.match(bid))
+            for rid in refs:
+                union(path, get_ref_path(UUID_PATTERN.match(rid)))
+
+        for type_name, blocks in self.resource_data.items():
+            for block in blocks:
+                path = block["__tfmeta"].get("path", type_name)
+                for ref in block["__tfmeta"].get("references", ()):
+                    if ref.get("id") in id_map:
+                        union(path, id_map[ref["id"]]["__tfmeta"].get("path", ""))
+                # module resources depend on the module calls leading to them
+                parts = path.split(".")
+                for step in range(2, len(parts) - 1, 2):
+                    if parts[step - 2] == "module":
+                        union(path, ".".join(parts[:step]))
+
+        components = {}
+        for path in contents:
+            components.setdefault(find(path), []).append(path)
+        providers = sorted(
+            c for p, p_contents in contents.items() if p.startswith("provider.") for c in p_contents
+        )
+        for members in components.values():
+            h = hashlib.sha256()
+            for content in itertools.chain(
+                providers, *(sorted(contents[p]) for p in sorted(members))
+            ):
+                h.update(content.encode("utf8"))
+            digest = h.hexdigest()
+            for path in members:
+                digests[path] = digest
+        return digests
+
 
 class Resolver:
     def __init__(self):
         self._id_map = {}
         self._ref_map = {}
+        self._edges = {}
 
     @staticmethod
     def is_id_ref(v):
@@ -82,13 +192,25 @@ class Resolver:
             return False
         return True
 
+    @staticmethod
+    def get_type_name(block):
+        rtype = block["__tfmeta"]["label"]
+        if block["__tfmeta"].get("type") == "data":
+            rtype = f"data.{rtype}"
+        return rtype
+
+    def get_edges(self, bid):
+        """Return the (type name, block) of a block's references."""
+        edges = self._edges.get(bid)
+        if edges is None:
+            edges = self._edges[bid] = [
+                (self.get_type_name(self._id_map[rid]), self._id_map[rid])
+                for rid in self._ref_map.get(bid, ())
+            ]
+        return edges
+
     def resolve_refs(self, block, types=None):
-        refs = self._ref_map.get(block["id"], ())
-        for rid in refs:
-            r = self._id_map[rid]
-            rtype = r["__tfmeta"]["label"]
-            if r["__tfmeta"].get("type") == "data":
-                rtype = f"data.{rtype}"
+        for rtype, r in self.get_edges(block["id"]):
             if types and rtype not in types:
                 continue
             yield r
@@ -100,18 +222,21 @@ class Resolver:
         bid = None
         refs = set()
 
-        for k, v in list(block.items()):
+        for k, v in block.items():
             if k == "id":
                 bid = v
                 self._id_map[v] = block
-            elif isinstance(v, str) and self.is_id_ref(v):
-                refs.add(v)
-            if isinstance(v, (str, int, float, bool)):
-                continue
-            if isinstance(v, dict) and k != "__tfmeta":
-                refs.update(self.visit(v))
-            if isinstance(v, list):
-                list(map(self.visit, v))
+            elif isinstance(v, str):
+                if self.is_id_ref(v):
+                    refs.add(v)
+            elif isinstance(v, dict):
+                if k != "__tfmeta":
+                    refs.update(self.visit(v))
+            elif isinstance(v, list):
+                # references within list items aren't attributed to the block
+                for i in v:
+                    if isinstance(i, dict):
+                        self.visit(i)
 
         if refs and block.get("__tfmeta", {}).get("label"):
             self._ref_map.setdefault(bid, []).extend(refs)
@@ -120,4 +245,6 @@ class Resolver:
 
         return refs
 
-    build = visit
+    def build(self, data):
+        self._edges = {}
+        return self.visit(data)
@@ -18,6 +18,7 @@ from ...core import (
     ResultSet,
     PolicyResourceResult,
 )
+from ...incremental import VarRecorder
 from .graph import TerraformGraph
 from .filters import Taggable
 from .variables import VariableResolver
@@ -124,17 +125,31 @@ class TerraformProvider(IACSourceProvider):
             p.data["mode"] = {"type": "terraform-source"}
         return policies
 
-    def parse(self, source_dir, var_files=()):
-        resolver = VariableResolver(source_dir, var_files, self.reporter)
+    def parse(self, source_dir, var_files=(), cache=None):
+        source_key = None
+        if cache:
+            source_key = cache.get_source_key(source_dir, var_files)
+            graph_data, variables = cache.load_graph(source_key)
+            if graph_data is not None:
+                if self.reporter:
+                    for var_type, var_map, var_path in variables:
+                        self.reporter.on_vars_discovered(var_type, var_map, var_path)
+                graph = TerraformGraph(graph_data, source_dir)
+                graph.build()
+                log.debug("Loaded %d %s resources from cache", len(graph), self.type)
+                return graph
+
+        recorder = VarRecorder(self.reporter)
+        resolver = VariableResolver(source_dir, var_files, recorder)
         with resolver.get_variables() as var_files:
-            graph = TerraformGraph(
-                load_from_path(
-                    source_dir,
-                    vars_paths=var_files,
-                    allow_downloads=True,
-                ),
+            graph_data = load_from_path(
                 source_dir,
+                vars_paths=var_files,
+                allow_downloads=True,
             )
+            if cache:
+                cache.save_graph(source_key, graph_data, recorder.vars, source_dir)
+            graph = TerraformGraph(graph_data, source_dir)
             graph.build()
             log.debug("Loaded %d %s resources", len(graph), self.type)
             return graph
@@ -159,13 +174,8 @@ class TerraformSource(IACSourceMode):
         return ResultSet([PolicyResourceResult(r, self.policy) for r in resources])
 
     def resolve_module_ref(self, mod_resource, graph):
-        mod_map = {}
-        for _, modules in graph.get_resources_by_type("module"):
-            for m in modules:
-                mod_map[m["__tfmeta"]["path"]] = m
-
         call_stack = extract_mod_stack(mod_resource["__tfmeta"]["path"])
-        ancestor = mod_map[call_stack[0]]
+        ancestor = graph.get_resource(call_stack[0])
         ancestor["__tfmeta"].setdefault("refs", []).append(mod_resource["__tfmeta"]["path"])
         return ancestor
 
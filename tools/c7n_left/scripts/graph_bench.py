@@ -0,0 +1,78 @@
+"""Benchmark resource graph queries on a synthetic terraform tree.
+
+ie. python scripts/graph_bench.py --resources 20000 --types 200
+"""
+
+import json
+from pathlib import Path
+import tempfile
+import time
+
+import click
+
+from c7n_left.providers.terraform.provider import TerraformProvider
+
+
+def write_tree(tf_dir, resource_count, type_count, files=50):
+    types = json.loads(
+        (Path(__file__).parent.parent / "c7n_left" / "data" / "taggable.json").read_text()
+    )["aws"][:type_count]
+    blocks = [[] for i in range(files)]
+    blocks[0].append('provider "aws" {\n  default_tags {\n    tags = { Owner = "bench" }\n  }\n}\n')
+    vpcs = max(1, resource_count // 100)
+    for i in range(vpcs):
+        blocks[i % files].append(
+            'resource "aws_vpc" "v%d" {\n  cidr_block = "10.0.0.0/16"\n}\n' % i
+        )
+    for i in range(resource_count - vpcs):
+        blocks[i % files].append(
+            'resource "%s" "r%d" {\n  name = "r%d"\n  vpc_id = aws_vpc.v%d.id\n'
+            '  tags = { Env = "dev" }\n}\n' % (types[i % len(types)], i, i, i % vpcs)
+        )
+    for idx, file_blocks in enumerate(blocks):
+        (tf_dir / ("main%d.tf" % idx)).write_text("\n".join(file_blocks))
+    return types
+
+
+def timed(label, func, *args):
+    t = time.time()
+    result = func(*args)
+    click.echo("%-24s %0.3fs" % (label, time.time() - t))
+    return result
+
+
+@click.command()
+@click.option("--resources", type=int, default=5000, help="Number of resources to generate")
+@click.option("--types", type=int, default=100, help="Number of resource types to use")
+@click.option("--queries", type=int, default=1000, help="Number of single type queries")
+def main(resources, types, queries):
+    with tempfile.TemporaryDirectory() as tf_dir:
+        tf_dir = Path(tf_dir)
+        type_names = write_tree(tf_dir, resources, types)
+        graph = timed("parse", TerraformProvider().parse, tf_dir)
+        timed("build", graph.build)
+
+        def by_type():
+            return sum(len(r) for _, r in graph.get_resources_by_type())
+
+        def single_type():
+            for i in range(queries):
+                list(graph.get_resources_by_type((type_names[i % len(type_names)],)))
+                list(graph.get_resources_by_type(("provider",)))
+
+        def refs():
+            count = 0
+            for _, type_resources in graph.get_resources_by_type():
+                for r in type_resources:
+                    count += len(list(graph.get_refs(r, "aws_vpc")))
+            return count
+
+        click.echo("resources:%d" % timed("all types", by_type))
+        timed("all types (again)", by_type)
+        timed("%d type queries" % queries, single_type)
+        click.echo("refs:%d" % timed("refs to vpcs", refs))
+        timed("refs to vpcs (again)", refs)
+
+
+if __name__ == "__main__":
+    main()
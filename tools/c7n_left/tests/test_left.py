@@ -21,6 +21,7 @@ from c7n.resources import load_resources
 
 try:
     from c7n_left import cli, core, output, policy as policy_core
+    from c7n_left.incremental import ScanCache
     from c7n_left.providers.terraform.provider import (
         TerraformProvider,
         TerraformResourceManager,
@@ -218,6 +219,21 @@ def test_graph_resolver():
     )
 
 
+def test_graph_type_index():
+    graph = TerraformProvider().parse(terraform_dir / "vpc_flow_logs")
+    ((_, logs),) = graph.get_resources_by_type("aws_flow_log")
+    logs.pop()
+
+    # resources are wrapped once, and queries get their own list
+    ((_, again),) = graph.get_resources_by_type(("aws_flow_log",))
+    assert len(again) == 1
+    assert again[0] is graph.get_resource("aws_flow_log.example")
+    assert [t for t, _ in graph.get_resources_by_type(("aws_vpc", "provider", "aws_flow_log"))] == [
+        t for t, _ in graph.get_resources_by_type() if t in ("aws_vpc", "provider", "aws_flow_log")
+    ]
+    assert graph.get_resource("aws_flow_log.missing") is None
+
+
 def test_resource_type_interface():
     rtype = TerraformResourceManager(None, {}).get_model()
     assert rtype.id == "id"
@@ -1236,6 +1252,167 @@ def test_multi_resource_glob_policy(tmp_path):
     assert len(data["results"]) == 2
 
 
+def test_runner_type_policies(policy_env):
+    policy_env.write_policy({"name": "check-wild", "resource": "terraform.aws_*"})
+    policy_env.write_policy({"name": "check-bucket", "resource": "terraform.aws_s3_bucket"})
+    policy_env.write_policy(
+        {"name": "check-multi", "resource": ["terraform.aws_s3_*", "terraform.aws_s3_bucket"]}
+    )
+    policy_env.write_policy({"name": "check-log", "resource": "terraform.aws_cloudwatch_*"})
+    policies = policy_env.get_policies()
+    runner = core.CollectionRunner(policies, Config.empty(), None)
+
+    assert [p.name for p in runner.get_type_policies("aws_s3_bucket")] == [
+        "check-wild",
+        "check-bucket",
+        "check-multi",
+    ]
+    assert [p.name for p in runner.get_type_policies("aws_cloudwatch_log_group")] == [
+        "check-wild",
+        "check-log",
+    ]
+    assert runner.get_type_policies("google_storage_bucket") == []
+    for rtype in ("aws_s3_bucket", "aws_cloudwatch_log_group", "google_storage_bucket"):
+        assert runner.get_type_policies(rtype) == [
+            p for p in policies if runner.match_type(rtype, p)
+        ]
+
+
+def test_cli_parallel_workers(tmp_path):
+    (tmp_path / "policy.json").write_text(
+        json.dumps(
+            {
+                "policies": [
+                    {"name": "check-wild", "resource": "terraform.aws_*"},
+                    {
+                        "name": "check-lambda",
+                        "resource": "terraform.aws_lambda_function",
+                        "filters": [{"type": "value", "key": "runtime", "value": "present"}],
+                    },
+                ]
+            }
+        )
+    )
+    outputs = []
+    for workers in ("1", "2"):
+        runner = CliRunner()
+        result = runner.invoke(
+            cli.cli,
+            [
+                "run",
+                "-p",
+                str(tmp_path),
+                "-d",
+                str(terraform_dir / "aws_lambda_check_permissions"),
+                "-o",
+                "json",
+                "-w",
+                workers,
+                "--output-file",
+                str(tmp_path / "output.json"),
+            ],
+        )
+        assert result.exit_code == 1
+        outputs.append(json.loads((tmp_path / "output.json").read_text()))
+
+    assert outputs[0] == outputs[1]
+    assert [r["policy"]["name"] for r in outputs[1]["results"]] == [
+        "check-wild",
+        "check-wild",
+        "check-lambda",
+    ]
+
+
+def test_run_incremental_cache(policy_env, tmp_path):
+    log_groups = """
+resource "aws_cloudwatch_log_group" "yada" {
+  name = "%s"
+}
+resource "aws_cloudwatch_log_group" "june" {
+  name = "June"
+}
+"""
+    policy_env.write_tf(log_groups % "Bar")
+    policy_env.write_policy(
+        {
+            "name": "check-name",
+            "resource": "terraform.aws_cloudwatch_log_group",
+            "filters": [{"name": "June"}],
+        }
+    )
+    filter_resources = core.IACResourceManager.filter_resources
+
+    def run():
+        config = cli.get_config(
+            policy_env.policy_dir, policy_env.policy_dir, cache_dir=tmp_path / "cache"
+        )
+        policies = policy_core.load_policies(config.policy_dir, config)
+        reporter = ResultsReporter()
+        evaluated = []
+
+        def record_filter(manager, resources, event=None):
+            evaluated.extend(r["__tfmeta"]["path"] for r in resources)
+            return filter_resources(manager, resources, event)
+
+        with patch.object(core.IACResourceManager, "filter_resources", record_filter):
+            core.CollectionRunner(policies, config, reporter).run()
+        return [r.resource["__tfmeta"]["path"] for r in reporter.results], evaluated
+
+    results, evaluated = run()
+    assert results == ["aws_cloudwatch_log_group.june"]
+    assert sorted(evaluated) == ["aws_cloudwatch_log_group.june", "aws_cloudwatch_log_group.yada"]
+
+    # unchanged sources are neither parsed nor evaluated again
+    with patch(
+        "c7n_left.providers.terraform.provider.load_from_path", side_effect=AssertionError()
+    ):
+        assert run() == (["aws_cloudwatch_log_group.june"], [])
+
+    policy_env.write_tf(log_groups % "June")
+    results, evaluated = run()
+    assert sorted(results) == ["aws_cloudwatch_log_group.june", "aws_cloudwatch_log_group.yada"]
+    assert evaluated == ["aws_cloudwatch_log_group.yada"]
+
+
+def test_scan_cache_module_change(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "mod").mkdir()
+    (tmp_path / "src" / "main.tf").write_text('module "logs" {\n  source = "../mod"\n}\n')
+    log_group = 'resource "aws_cloudwatch_log_group" "yada" {\n  name = "%s"\n}\n'
+    (tmp_path / "mod" / "main.tf").write_text(log_group % "Bar")
+    cache = ScanCache(tmp_path / "cache")
+
+    def get_names():
+        graph = TerraformProvider().parse(tmp_path / "src", cache=cache)
+        return [r["name"] for _, rs in graph.get_resources_by_type() for r in rs if "name" in r]
+
+    assert get_names() == ["Bar"]
+    with patch(
+        "c7n_left.providers.terraform.provider.load_from_path", side_effect=AssertionError()
+    ):
+        assert get_names() == ["Bar"]
+
+    # a change to a module outside the source directory is parsed again
+    (tmp_path / "mod" / "main.tf").write_text(log_group % "June")
+    assert get_names() == ["June"]
+
+
+def test_scan_cache_remote_module():
+    data = {
+        "module": [
+            {"source": "./mod", "__tfmeta": {"filename": "main.tf"}},
+            {"source": "../shared", "__tfmeta": {"filename": "mod/main.tf"}},
+        ]
+    }
+    assert ScanCache.get_module_dirs("src", data) == [
+        os.path.normpath(p) for p in ("src", "src/mod", "src/shared")
+    ]
+    data["module"].append(
+        {"source": "terraform-aws-modules/rds/aws", "__tfmeta": {"filename": "main.tf"}}
+    )
+    assert ScanCache.get_module_dirs("src", data) is None
+
+
 def write_output_test_policy(tmp_path, policy=None, policy_path="policy.json"):
     policies = (
         policy
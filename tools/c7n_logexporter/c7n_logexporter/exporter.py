@@ -23,6 +23,8 @@ from tabulate import tabulate
 import yaml
 
 from c7n.executor import MainThreadExecutor
+from c7n_logexporter.manifest import ExportManifest
+from c7n_logexporter.scheduler import ExportScheduler, TaskLedger
 MainThreadExecutor.c7n_async = False
 
 logging.basicConfig(level=logging.INFO)
@@ -251,9 +253,17 @@ def subscribe(config, accounts, region, merge, debug):
 @click.option('--end')
 @click.option('-a', '--accounts', multiple=True)
 @click.option('-r', '--region', multiple=False)
+@click.option('--ledger', type=click.Path(),
+              help="sqlite file recording export tasks, to resume interrupted runs")
+@click.option('--poll-period', type=float, default=120,
+              help="maximum seconds between export task status checks")
 @click.option('--debug', is_flag=True, default=False)
-def run(config, start, end, accounts, region, debug):
-    """run export across accounts and log groups specified in config."""
+def run(config, start, end, accounts, region, ledger, poll_period, debug):
+    """run export across accounts and log groups specified in config.
+
+    Accounts are exported concurrently, each running its groups' daily
+    export tasks back to back.
+    """
     config = validate.callback(config)
     destination = config.get('destination')
     start = start and parse(start) or start
@@ -266,7 +276,8 @@ def run(config, start, end, accounts, region, debug):
                 continue
             futures[
                 w.submit(process_account, account, start,
-                         end, destination, region)] = account
+                         end, destination, region, ledger=ledger,
+                         poll_period=poll_period)] = account
         for f in as_completed(futures):
             account = futures[f]
             if f.exception():
@@ -299,7 +310,8 @@ def lambdafan(func):
 
 
 @lambdafan
-def process_account(account, start, end, destination, region, incremental=True):
+def process_account(account, start, end, destination, region, incremental=True,
+                    ledger=None, poll_period=120):
     session = get_session(account['role'], region)
     client = session.client('logs')
 
@@ -318,25 +330,44 @@ def process_account(account, start, end, destination, region, incremental=True):
 
     account_id = session.client('sts').get_caller_identity()['Account']
     prefix = destination.get('prefix', '').rstrip('/') + '/%s' % account_id
+    name = account.get('name') or account_id
 
     log.info("account:%s matched %d groups of %d",
-             account.get('name', account_id), len(groups), group_count)
+             name, len(groups), group_count)
 
     if not groups:
         log.warning("account:%s no groups matched, all groups \n  %s",
-                    account.get('name', account_id), "\n  ".join(
+                    name, "\n  ".join(
                         [g['logGroupName'] for g in all_groups]))
     t = time.time()
+    s3 = boto3.Session().client('s3')
+    manifest = ExportManifest(
+        s3, destination['bucket'], ExportManifest.get_key(prefix)).load()
+    group_prefixes = {}
+    units = []
     for g in groups:
-        export.callback(
-            g,
-            destination['bucket'], prefix,
-            g['exportStart'], end, account['role'],
-            name=account['name'])
+        group_prefix = get_group_prefix(prefix, g)
+        group_prefixes[g['logGroupName']] = group_prefix
+        units.extend(get_export_units(
+            s3, g, destination['bucket'], group_prefix,
+            g['exportStart'], end, name, manifest))
+
+    def on_complete(group_name, day):
+        record_export(
+            s3, destination['bucket'], group_prefixes[group_name],
+            manifest, group_name, day)
+
+    # one export task at a time per account region, so a single
+    # scheduler works through all of the account's groups.
+    scheduler = ExportScheduler(
+        client, TaskLedger(ledger or ':memory:'), name, region, poll_period)
+    try:
+        stats = scheduler.run(units, on_complete)
+    finally:
+        scheduler.ledger.close()
 
-    log.info("account:%s exported %d log groups in time:%0.2f",
-             account.get('name') or account_id,
-             len(groups), time.time() - t)
+    log.info("account:%s exported %d log groups in time:%0.2f tasks:%s",
+             name, len(groups), time.time() - t, dict(stats))
 
 
 def get_session(role, region, session_name="c7n-log-exporter", session=None):
@@ -429,6 +460,15 @@ def filter_extant_exports(client, bucket, prefix, days, start, end=None):
     """
     end = end or datetime.now()
     # days = [start + timedelta(i) for i in range((end-start).days)]
+    last_export = get_last_export(client, bucket, prefix)
+    if last_export is None:
+        return sorted(days)
+    return [d for d in sorted(days) if d > last_export]
+
+
+def get_last_export(client, bucket, prefix):
+    """Get the LastExport tag of a group's prefix key, if any.
+    """
     try:
         tag_set = client.get_object_tagging(Bucket=bucket, Key=prefix).get('TagSet', [])
     except ClientError as e:
@@ -438,11 +478,11 @@ def filter_extant_exports(client, bucket, prefix, days, start, end=None):
     tags = {t['Key']: t['Value'] for t in tag_set}
 
     if 'LastExport' not in tags:
-        return sorted(days)
+        return None
     last_export = parse(tags['LastExport'])
     if last_export.tzinfo is None:
         last_export = last_export.replace(tzinfo=tzutc())
-    return [d for d in sorted(days) if d > last_export]
+    return last_export
 
 
 @cli.command()
@@ -547,11 +587,13 @@ def size(config, accounts=(), day=None, group=None, human=True, region=None):
 
 @cli.command()
 @click.option('--config', type=click.Path(), required=True)
-@click.option('-g', '--group', required=True)
+@click.option('-g', '--group')
 @click.option('-a', '--accounts', multiple=True)
 @click.option('-r', '--region', multiple=False)
 @click.option('--dryrun/--no-dryrun', is_flag=True, default=False)
-def sync(config, group, accounts=(), dryrun=False, region=None):
+@click.option('--rebuild-index', is_flag=True, default=False,
+              help="rebuild the export manifest of accounts from the bucket's exports")
+def sync(config, group, accounts=(), dryrun=False, region=None, rebuild_index=False):
     """sync last recorded export to actual
 
     Use --dryrun to check status.
@@ -560,6 +602,15 @@ def sync(config, group, accounts=(), dryrun=False, region=None):
     destination = config.get('destination')
     client = boto3.Session().client('s3')
 
+    if rebuild_index:
+        for account in config.get('accounts', ()):
+            if accounts and account['name'] not in accounts:
+                continue
+            rebuild_manifest(client, account, destination, group, region, dryrun)
+        return
+    if not group:
+        raise click.UsageError("--group is required unless rebuilding the index")
+
     for account in config.get('accounts', ()):
         if accounts and account['name'] not in accounts:
             continue
@@ -688,6 +739,39 @@ def status(config, group, accounts=(), region=None):
     print(tabulate(accounts, headers='keys'))
 
 
+def rebuild_manifest(client, account, destination, group=None, region=None, dryrun=False):
+    """Rebuild an account's export manifest by listing its groups' exports.
+
+    Only the given group is rebuilt if specified, otherwise all of the
+    account's configured groups.
+    """
+    session = get_session(account['role'], region)
+    account_id = session.client('sts').get_caller_identity()['Account']
+    prefix = destination.get('prefix', '').rstrip('/') + '/%s' % account_id
+    manifest = ExportManifest(
+        client, destination['bucket'], ExportManifest.get_key(prefix))
+    if group:
+        manifest.load()
+
+    paginator = session.client('logs').get_paginator('describe_log_groups')
+    groups = []
+    for p in paginator.paginate():
+        groups.extend(p.get('logGroups', ()))
+    groups = filter_group_names(groups, group and [group] or account['groups'])
+
+    day_count = 0
+    for g in groups:
+        exports = get_exports(
+            client, destination['bucket'], get_group_prefix(prefix, g) + "/", latest=False)
+        manifest.set_days(g['logGroupName'], [datetime(*e) for e in exports])
+        day_count += len(exports)
+
+    log.info("account:%s indexed %d exported days across %d groups",
+             account.get('name', account_id), day_count, len(groups))
+    if not dryrun:
+        manifest.save(merge=False)
+
+
 def get_exports(client, bucket, prefix, latest=True):
     """Find exports for a given account
     """
@@ -751,19 +835,20 @@ def get_exports(client, bucket, prefix, latest=True):
 @click.option('--start', required=True, help="export logs from this date")
 @click.option('--end', help="export logs before this date")
 @click.option('--role', help="sts role to assume for log group access")
-@click.option('--poll-period', type=float, default=300)
+@click.option('--poll-period', type=float, default=300,
+              help="maximum seconds between export task status checks")
 @click.option('-r', '--region', multiple=False, help='aws region to use.')
+@click.option('--ledger', type=click.Path(),
+              help="sqlite file recording export tasks, to resume interrupted runs")
 # @click.option('--bucket-role', help="role to scan destination bucket")
 # @click.option('--stream-prefix)
 @lambdafan
 def export(group, bucket, prefix, start, end, role, poll_period=120,
-           session=None, name="", region=None):
+           session=None, name="", region=None, ledger=None):
     """export a given log group to s3"""
     start = start and isinstance(start, str) and parse(start) or start
     end = (end and isinstance(start, str) and
            parse(end) or end or datetime.now())
-    start = start.replace(tzinfo=tzlocal()).astimezone(tzutc())
-    end = end.replace(tzinfo=tzlocal()).astimezone(tzutc())
 
     if session is None:
         session = get_session(role, region)
@@ -785,10 +870,47 @@ def export(group, bucket, prefix, start, end, role, poll_period=120,
         if not found:
             raise ValueError("Log group %s not found." % group)
 
+    s3 = boto3.Session().client('s3')
+    manifest = ExportManifest(s3, bucket, ExportManifest.get_key(prefix or '')).load()
+    prefix = get_group_prefix(prefix, group)
+    units = get_export_units(s3, group, bucket, prefix, start, end, name, manifest)
+
+    t = time.time()
+    scheduler = ExportScheduler(
+        client, TaskLedger(ledger or ':memory:'), name, region, poll_period)
+    try:
+        stats = scheduler.run(
+            units, lambda group_name, day: record_export(
+                s3, bucket, prefix, manifest, group_name, day))
+    finally:
+        scheduler.ledger.close()
+
+    log.info(
+        ("Exported log group:%s:%s time:%0.2f days:%d"
+         " bucket:%s prefix:%s tasks:%s"),
+        name,
+        group['logGroupName'],
+        time.time() - t,
+        len(units),
+        bucket,
+        prefix,
+        dict(stats))
+
+
+def get_group_prefix(prefix, group):
     if prefix:
-        prefix = "%s/%s" % (prefix.rstrip('/'), group['logGroupName'].strip('/'))
-    else:
-        prefix = group['logGroupName']
+        return "%s/%s" % (prefix.rstrip('/'), group['logGroupName'].strip('/'))
+    return group['logGroupName']
+
+
+def get_export_units(s3, group, bucket, prefix, start, end, name="", manifest=None):
+    """Get the days of a log group left to export, as export scheduler units.
+
+    Groups in the export manifest are checked against it, otherwise
+    against the group's LastExport tag, which then seeds the manifest.
+    """
+    start = start.replace(tzinfo=tzlocal()).astimezone(tzutc())
+    end = end.replace(tzinfo=tzlocal()).astimezone(tzutc())
 
     named_group = "%s:%s" % (name, group['logGroupName'])
     log.info(
@@ -800,24 +922,44 @@ def export(group, bucket, prefix, start, end, role, poll_period=120,
         prefix,
         group['storedBytes'])
 
-    t = time.time()
     days = [(
         start + timedelta(i)).replace(minute=0, hour=0, second=0, microsecond=0)
         for i in range((end - start).days)]
     day_count = len(days)
-    s3 = boto3.Session().client('s3')
-    days = filter_extant_exports(s3, bucket, prefix, days, start, end)
+    group_name = group['logGroupName']
+    indexed = manifest is not None and group_name in manifest
+    if indexed:
+        days = manifest.get_pending(group_name, days)
+    else:
+        last_export = get_last_export(s3, bucket, prefix)
+        if last_export is not None:
+            days = [d for d in days if d > last_export]
+            if manifest is not None:
+                manifest.add_range(
+                    group_name,
+                    datetime.fromtimestamp(group['creationTime'] / 1000.0),
+                    last_export)
 
     log.info("Group:%s filtering s3 extant keys from %d to %d start:%s end:%s",
              named_group, day_count, len(days),
              days[0] if days else '', days[-1] if days else '')
-    t = time.time()
 
-    retry = get_retry(('SlowDown',))
+    if not days:
+        return []
 
-    for idx, d in enumerate(days):
+    # the group prefix key carries the group's LastExport tag, and
+    # already exists for groups that have been exported.
+    if not indexed and last_export is None:
+        s3.put_object(
+            Bucket=bucket,
+            Key=prefix,
+            Body=json.dumps({}),
+            ACL="bucket-owner-full-control",
+            ServerSideEncryption="AES256")
+
+    units = []
+    for d in days:
         date = d.replace(minute=0, microsecond=0, hour=0)
-        export_prefix = "%s%s" % (prefix, date.strftime("/%Y/%m/%d"))
         params = {
             'taskName': "%s-%s" % ("c7n-log-exporter",
                                    date.strftime("%Y-%m-%d")),
@@ -829,68 +971,29 @@ def export(group, bucket, prefix, start, end, role, poll_period=120,
                 date.replace(
                     minute=59, hour=23, microsecond=0).timetuple()) * 1000),
             'destination': bucket,
-            'destinationPrefix': export_prefix
+            'destinationPrefix': "%s%s" % (prefix, date.strftime("/%Y/%m/%d"))
         }
-
         # if stream_prefix:
         #    params['logStreamPrefix'] = stream_prefix
-        try:
-            s3.head_object(Bucket=bucket, Key=prefix)
-        except ClientError as e:
-            if e.response['Error']['Code'] != '404':  # Not Found
-                raise
-            s3.put_object(
-                Bucket=bucket,
-                Key=prefix,
-                Body=json.dumps({}),
-                ACL="bucket-owner-full-control",
-                ServerSideEncryption="AES256")
-
-        t = time.time()
-        counter = 0
-        while True:
-            counter += 1
-            try:
-                result = client.create_export_task(**params)
-            except ClientError as e:
-                if e.response['Error']['Code'] == 'LimitExceededException':
-                    time.sleep(poll_period)
-                    # log every 30m of export waiting
-                    if counter % 6 == 0:
-                        log.debug(
-                            "group:%s day:%s waiting for %0.2f minutes",
-                            named_group, d.strftime('%Y-%m-%d'),
-                            (counter * poll_period) / 60.0)
-                    continue
-                raise
-            retry(
-                s3.put_object_tagging,
-                Bucket=bucket, Key=prefix,
-                Tagging={
-                    'TagSet': [{
-                        'Key': 'LastExport',
-                        'Value': d.isoformat()}]})
-            break
-
-        log.info(
-            "Log export time:%0.2f group:%s day:%s bucket:%s prefix:%s task:%s",
-            time.time() - t,
-            named_group,
-            d.strftime("%Y-%m-%d"),
-            bucket,
-            params['destinationPrefix'],
-            result['taskId'])
+        units.append((group['logGroupName'], d, params))
+    return units
 
-    log.info(
-        ("Exported log group:%s time:%0.2f days:%d start:%s"
-         " end:%s bucket:%s prefix:%s"),
-        named_group,
-        time.time() - t,
-        len(days),
-        start.strftime('%Y/%m/%d'),
-        end.strftime('%Y/%m/%d'),
-        bucket,
-        prefix)
+
+def record_export(s3, bucket, prefix, manifest, group_name, day):
+    manifest.add(group_name, day)
+    manifest.save()
+    tag_last_export(s3, bucket, prefix, day)
+
+
+def tag_last_export(s3, bucket, prefix, day):
+    retry = get_retry(('SlowDown',))
+    retry(
+        s3.put_object_tagging,
+        Bucket=bucket, Key=prefix,
+        Tagging={
+            'TagSet': [{
+                'Key': 'LastExport',
+                'Value': day.isoformat()}]})
 
 
 if __name__ == '__main__':
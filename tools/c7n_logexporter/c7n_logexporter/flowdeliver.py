@@ -6,6 +6,7 @@ Intermediate lambda to convert firehose s3 to log group export format.
 """
 
 import boto3
+import codecs
 from datetime import datetime
 import gc
 import gzip
@@ -23,6 +24,8 @@ log = logging.getLogger('logregate')
 BUCKET = os.environ.get('DESTINATION_BUCKET')
 BUCKET_PREFIX = os.environ.get('DESTINATION_PREFIX')
 EVENTS_SIZE_BUFFER = int(os.environ.get('EVENTS_SIZE_BUFFER', 1900000))
+# log events per compressed write
+WRITE_BATCH_SIZE = 5000
 
 
 def handle(event, context):
@@ -97,60 +100,58 @@ def process_record_set(k, records):
         stream,
         records_key)
 
-    with tempfile.NamedTemporaryFile() as out_fh:
-        with gzip.GzipFile(
-                records_key, mode='wb',
-                fileobj=open(out_fh.name, 'wb')) as records_fh:
-            timestamp = None
-            record_counter = 0
-            buf = []
-            for r in records:
-                record_counter += 1
-                timestamp = datetime.fromtimestamp(
-                    r['timestamp'] / 1000).strftime(
-                        '%Y-%m-%dT%H:%M:%S.%fZ')
-                buf.append('%s %s\n' % (timestamp, r['message']))
-                if record_counter % 100 == 0:
-                    records_fh.write("".join(buf).encode('utf8'))
-                    buf = []
-            if buf:
+    with tempfile.TemporaryFile() as out_fh:
+        with gzip.GzipFile(records_key, mode='wb', fileobj=out_fh) as records_fh:
+            # flow log events are mostly batched on the same timestamps
+            timestamps = {}
+            for idx in range(0, len(records), WRITE_BATCH_SIZE):
+                buf = []
+                for r in records[idx:idx + WRITE_BATCH_SIZE]:
+                    timestamp = timestamps.get(r['timestamp'])
+                    if timestamp is None:
+                        timestamp = timestamps[r['timestamp']] = datetime.fromtimestamp(
+                            r['timestamp'] / 1000).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+                    buf.append('%s %s\n' % (timestamp, r['message']))
                 records_fh.write("".join(buf).encode('utf8'))
-            records_fh.close()
-            s3.put_object(
-                Bucket=BUCKET,
-                Key=out_key,
-                ACL='bucket-owner-full-control',
-                ServerSideEncryption='AES256',
-                Body=out_fh.read())
+        out_fh.seek(0)
+        s3.put_object(
+            Bucket=BUCKET,
+            Key=out_key,
+            ACL='bucket-owner-full-control',
+            ServerSideEncryption='AES256',
+            Body=out_fh)
 
 
 def records_iter(fh, buffer_size=1024 * 1024 * 16):
     """Split up a firehose s3 object into records
 
     Firehose cloudwatch log delivery of flow logs does not delimit
-    record boundaries. We have to use knowledge of content to split
-    the records on boundaries. In the context of flow logs we're
-    dealing with delimited records.
+    record boundaries, the json records are concatenated. Each read is
+    decoded once, and records are parsed in place by offset, carrying
+    only a trailing partial record over to the next read.
     """
-    buf = None
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf8')()
+    skip_whitespace = json.decoder.WHITESPACE.match
+    buf = ''
     while True:
         chunk = fh.read(buffer_size)
+        text = buf + text_decoder.decode(chunk, final=not chunk)
+        pos = skip_whitespace(text, 0).end()
+        end = len(text)
+        while pos < end:
+            try:
+                record, pos = decoder.raw_decode(text, pos)
+            except json.JSONDecodeError:
+                # a partial record, unless there's nothing left to read
+                if not chunk:
+                    raise
+                break
+            yield record
+            pos = skip_whitespace(text, pos).end()
+        buf = text[pos:]
         if not chunk:
-            if buf:
-                yield json.loads(buf)
             return
-        if buf:
-            chunk = b"%s%s" % (buf, chunk)
-            buf = None
-        while chunk:
-            idx = chunk.find(b'}{')
-            if idx == -1:
-                buf = chunk
-                chunk = None
-                continue
-            record = chunk[:idx + 1]
-            yield json.loads(record)
-            chunk = chunk[idx + 1:]
 
 
 def sizeof_fmt(num, suffix='B'):
@@ -0,0 +1,121 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+"""Index of exported log group days, so incremental runs don't need to
+inspect the archive bucket per group.
+"""
+from datetime import date
+import json
+
+from botocore.exceptions import ClientError
+
+
+class ExportManifest:
+    """Exported days of an account's log groups, kept as a single s3 object.
+
+    Days are stored per group as contiguous date ranges, and held in
+    memory as sets of day ordinals.
+    """
+
+    file_name = 'c7n-log-exporter-manifest.json'
+    version = 1
+    # attempts at writing the manifest while other writers update it
+    save_attempts = 5
+    conflict_codes = ('PreconditionFailed', 'ConditionalRequestConflict')
+
+    def __init__(self, client, bucket, key):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.groups = {}
+        # etag of the manifest as last read or written, None if absent
+        self.etag = None
+
+    @classmethod
+    def get_key(cls, prefix):
+        prefix = prefix.rstrip('/')
+        return prefix and "%s/%s" % (prefix, cls.file_name) or cls.file_name
+
+    def __contains__(self, group_name):
+        return group_name in self.groups
+
+    def fetch(self):
+        """Get the stored manifest's groups and etag."""
+        try:
+            result = self.client.get_object(Bucket=self.bucket, Key=self.key)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchKey':
+                raise
+            return {}, None
+        data = json.loads(result['Body'].read())
+        return {
+            group_name: {
+                o for start, end in ranges
+                for o in range(date.fromisoformat(start).toordinal(),
+                               date.fromisoformat(end).toordinal() + 1)}
+            for group_name, ranges in data.get('groups', {}).items()}, result['ETag']
+
+    def load(self):
+        self.groups, self.etag = self.fetch()
+        return self
+
+    def save(self, merge=True):
+        """Write the manifest, merging in days recorded by other writers.
+
+        Writes are conditional on the stored manifest being the one we
+        last read or wrote. If another writer has since updated it, their
+        days are merged in and the write retried. Without merge the
+        stored manifest is overwritten.
+        """
+        for attempt in range(self.save_attempts):
+            conditions = {}
+            if merge and self.etag:
+                conditions['IfMatch'] = self.etag
+            elif merge:
+                conditions['IfNoneMatch'] = '*'
+            try:
+                result = self.client.put_object(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    Body=json.dumps({
+                        'version': self.version,
+                        'groups': {
+                            group_name: self.get_ranges(days)
+                            for group_name, days in sorted(self.groups.items())}}),
+                    ACL="bucket-owner-full-control",
+                    ServerSideEncryption="AES256",
+                    **conditions)
+            except ClientError as e:
+                if (not merge or attempt + 1 == self.save_attempts or
+                        e.response['Error']['Code'] not in self.conflict_codes):
+                    raise
+                groups, self.etag = self.fetch()
+                for group_name, days in groups.items():
+                    self.groups.setdefault(group_name, set()).update(days)
+                continue
+            self.etag = result['ETag']
+            return
+
+    @staticmethod
+    def get_ranges(days):
+        ranges = []
+        for o in sorted(days):
+            if ranges and ranges[-1][1] == o - 1:
+                ranges[-1][1] = o
+            else:
+                ranges.append([o, o])
+        return [[date.fromordinal(start).isoformat(), date.fromordinal(end).isoformat()]
+                for start, end in ranges]
+
+    def get_pending(self, group_name, days):
+        exported = self.groups.get(group_name, ())
+        return [d for d in days if d.toordinal() not in exported]
+
+    def add(self, group_name, day):
+        self.groups.setdefault(group_name, set()).add(day.toordinal())
+
+    def add_range(self, group_name, start, end):
+        self.groups.setdefault(group_name, set()).update(
+            range(start.toordinal(), end.toordinal() + 1))
+
+    def set_days(self, group_name, days):
+        self.groups[group_name] = {d.toordinal() for d in days}
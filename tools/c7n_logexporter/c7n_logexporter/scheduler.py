@@ -0,0 +1,153 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+"""Keep an account region's export task slot busy, with a sqlite ledger
+of submitted tasks so interrupted runs can resume.
+"""
+from collections import Counter
+import logging
+import sqlite3
+import time
+
+from botocore.exceptions import ClientError
+
+from c7n.utils import get_retry
+
+log = logging.getLogger('c7n-log-exporter')
+
+
+class TaskLedger:
+    """Export tasks by account, region, log group and day."""
+
+    create_table = """
+    create table if not exists exports (
+        account text,
+        region text,
+        log_group text,
+        day text,
+        task_id text,
+        state text,
+        updated real,
+        primary key (account, region, log_group, day)
+    )
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute(self.create_table)
+
+    def close(self):
+        self.conn.close()
+
+    def get_done(self, account, region):
+        return set(self.conn.execute(
+            "select log_group, day from exports"
+            " where account = ? and region = ? and state = 'COMPLETED'",
+            (account, region)))
+
+    def get_active(self, account, region):
+        return self.conn.execute(
+            "select log_group, day, task_id from exports"
+            " where account = ? and region = ? and state = 'RUNNING'",
+            (account, region)).fetchall()
+
+    def set_state(self, account, region, log_group, day, task_id, state):
+        with self.conn:
+            self.conn.execute(
+                "insert or replace into exports"
+                " (account, region, log_group, day, task_id, state, updated)"
+                " values (?, ?, ?, ?, ?, ?, ?)",
+                (account, region, log_group, day, task_id, state, time.time()))
+
+
+class ExportScheduler:
+    """Run export tasks for an account region back to back.
+
+    CloudWatch Logs allows one active export task per account region,
+    so each task is submitted as soon as the previous one completes,
+    polling its status with backoff up to `poll_period` seconds.
+
+    Units are (log group name, day, create_export_task params), and
+    are run in order. Once a group's export fails its later days are
+    skipped, so the group's last exported day stays contiguous.
+    """
+
+    done_states = ('COMPLETED', 'CANCELLED', 'FAILED')
+
+    def __init__(self, client, ledger, account, region, poll_period=120, min_poll=2):
+        self.client = client
+        self.ledger = ledger
+        self.account = account
+        self.region = region or ''
+        self.poll_period = poll_period
+        self.min_poll = min_poll
+        self.retry = get_retry(('ThrottlingException',))
+
+    def get_delays(self):
+        delay = self.min_poll
+        while True:
+            yield delay
+            delay = min(delay * 2, self.poll_period)
+
+    def wait(self, task_id):
+        for delay in self.get_delays():
+            tasks = self.retry(
+                self.client.describe_export_tasks, taskId=task_id).get('exportTasks')
+            if not tasks:
+                return 'FAILED'
+            status = tasks[0]['status']['code']
+            if status in self.done_states:
+                return status
+            time.sleep(delay)
+
+    def submit(self, params):
+        for delay in self.get_delays():
+            try:
+                return self.client.create_export_task(**params)['taskId']
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'LimitExceededException':
+                    raise
+            # an export task not started by us is active
+            log.debug("account:%s waiting on active export task", self.account)
+            time.sleep(delay)
+
+    def resume(self):
+        """Wait out tasks left active by an interrupted run."""
+        for log_group, day, task_id in self.ledger.get_active(self.account, self.region):
+            log.info("account:%s resuming export group:%s day:%s task:%s",
+                     self.account, log_group, day, task_id)
+            self.ledger.set_state(
+                self.account, self.region, log_group, day, task_id, self.wait(task_id))
+
+    def run(self, units, on_complete=None):
+        self.resume()
+        done = self.ledger.get_done(self.account, self.region)
+        failed = set()
+        stats = Counter()
+
+        for log_group, day, params in units:
+            day_key = day.strftime('%Y-%m-%d')
+            if log_group in failed:
+                stats['SKIPPED'] += 1
+                continue
+            if (log_group, day_key) in done:
+                stats['SKIPPED'] += 1
+                if on_complete:
+                    on_complete(log_group, day)
+                continue
+            t = time.time()
+            task_id = self.submit(params)
+            self.ledger.set_state(
+                self.account, self.region, log_group, day_key, task_id, 'RUNNING')
+            status = self.wait(task_id)
+            self.ledger.set_state(
+                self.account, self.region, log_group, day_key, task_id, status)
+            stats[status] += 1
+            log.info(
+                "Log export time:%0.2f group:%s:%s day:%s task:%s status:%s",
+                time.time() - t, self.account, log_group, day_key, task_id, status)
+            if status != 'COMPLETED':
+                failed.add(log_group)
+            elif on_complete:
+                on_complete(log_group, day)
+        return stats
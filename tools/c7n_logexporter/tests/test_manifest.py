@@ -0,0 +1,220 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+from datetime import datetime
+import io
+import json
+
+from botocore.exceptions import ClientError
+from dateutil.tz import tzutc
+import pytest
+
+from c7n_logexporter import exporter
+from c7n_logexporter.manifest import ExportManifest
+
+
+def client_error(code, op):
+    return ClientError({'Error': {'Code': code}}, op)
+
+
+class StubS3:
+    """Objects with etags and conditional writes, and object tags."""
+
+    def __init__(self):
+        self.objects = {}
+        self.tags = {}
+        self.calls = []
+        self.version = 0
+
+    def get_object(self, Bucket, Key):
+        self.calls.append(('get_object', Key))
+        if Key not in self.objects:
+            raise client_error('NoSuchKey', 'GetObject')
+        body, etag = self.objects[Key]
+        return {'Body': io.BytesIO(body.encode('utf8')), 'ETag': etag}
+
+    def put_object(self, Bucket, Key, Body, IfMatch=None, IfNoneMatch=None, **kw):
+        self.calls.append(('put_object', Key))
+        current = self.objects.get(Key)
+        if (IfNoneMatch == '*' and current or
+                IfMatch and (current is None or current[1] != IfMatch)):
+            raise client_error('PreconditionFailed', 'PutObject')
+        self.version += 1
+        etag = '"%d"' % self.version
+        self.objects[Key] = (Body, etag)
+        return {'ETag': etag}
+
+    def get_object_tagging(self, Bucket, Key):
+        self.calls.append(('get_object_tagging', Key))
+        if Key not in self.objects:
+            raise client_error('NoSuchKey', 'GetObjectTagging')
+        return {'TagSet': self.tags.get(Key, [])}
+
+    def put_object_tagging(self, Bucket, Key, Tagging):
+        self.tags[Key] = Tagging['TagSet']
+
+
+def day(d):
+    return datetime(2024, 1, d, tzinfo=tzutc())
+
+
+def get_manifest(s3):
+    return ExportManifest(s3, 'archive', ExportManifest.get_key('logs/112233445566'))
+
+
+def test_get_key():
+    assert ExportManifest.get_key('logs/') == 'logs/c7n-log-exporter-manifest.json'
+    assert ExportManifest.get_key('') == 'c7n-log-exporter-manifest.json'
+
+
+def test_get_ranges():
+    days = {day(d).toordinal() for d in (1, 2, 3, 5, 7, 8)}
+    assert ExportManifest.get_ranges(days) == [
+        ['2024-01-01', '2024-01-03'],
+        ['2024-01-05', '2024-01-05'],
+        ['2024-01-07', '2024-01-08']]
+    assert ExportManifest.get_ranges(()) == []
+
+
+def test_get_pending():
+    manifest = get_manifest(StubS3())
+    manifest.add_range('/aws/lambda/app', day(1), day(3))
+    manifest.add('/aws/lambda/app', day(5))
+    days = [day(d) for d in range(1, 7)]
+    assert manifest.get_pending('/aws/lambda/app', days) == [day(4), day(6)]
+    assert manifest.get_pending('/aws/lambda/other', days) == days
+
+
+def test_save_load():
+    s3 = StubS3()
+    manifest = get_manifest(s3)
+    manifest.add_range('/aws/lambda/app', day(1), day(3))
+    manifest.save()
+    body, etag = s3.objects[manifest.key]
+    assert json.loads(body) == {
+        'version': 1, 'groups': {'/aws/lambda/app': [['2024-01-01', '2024-01-03']]}}
+    assert manifest.etag == etag
+
+    loaded = get_manifest(s3).load()
+    assert '/aws/lambda/app' in loaded
+    assert loaded.groups == manifest.groups
+    assert loaded.etag == etag
+
+
+def test_save_conditional():
+    s3 = StubS3()
+    get_manifest(s3).save()
+    first, second = get_manifest(s3).load(), get_manifest(s3).load()
+
+    s3.calls = []
+    first.add('/aws/lambda/app', day(1))
+    first.save()
+    # unchanged since loaded, so written without reading it again
+    assert s3.calls == [('put_object', first.key)]
+
+    # another writer saved in the meantime, their days are merged in
+    second.add('/aws/lambda/app', day(2))
+    second.add('/aws/lambda/web', day(2))
+    second.save()
+    loaded = get_manifest(s3).load()
+    assert loaded.get_pending('/aws/lambda/app', [day(1), day(2)]) == []
+    assert loaded.get_pending('/aws/lambda/web', [day(2)]) == []
+
+    # a manifest created by another writer isn't overwritten
+    third = get_manifest(StubS3())
+    third.client = s3
+    third.add('/aws/lambda/db', day(3))
+    third.save()
+    assert set(get_manifest(s3).load().groups) == {
+        '/aws/lambda/app', '/aws/lambda/web', '/aws/lambda/db'}
+
+
+def test_save_conflict_retries_exhausted():
+    s3 = StubS3()
+    manifest = get_manifest(s3)
+    manifest.save()
+    manifest.etag = '"stale"'
+    s3.get_object = lambda Bucket, Key: {
+        'Body': io.BytesIO(b'{"groups": {}}'), 'ETag': '"stale"'}
+    with pytest.raises(ClientError):
+        manifest.save()
+    assert s3.calls.count(('put_object', manifest.key)) == 1 + manifest.save_attempts
+
+
+def test_save_no_merge_overwrites():
+    s3 = StubS3()
+    other = get_manifest(s3)
+    other.add('/aws/lambda/web', day(1))
+    other.save()
+
+    manifest = get_manifest(s3)
+    manifest.set_days('/aws/lambda/app', [day(2)])
+    manifest.save(merge=False)
+    assert set(get_manifest(s3).load().groups) == {'/aws/lambda/app'}
+
+
+@pytest.fixture
+def group():
+    return {
+        'logGroupName': '/aws/lambda/app',
+        'creationTime': int(datetime(2023, 12, 30, 12, tzinfo=tzutc()).timestamp() * 1000),
+        'storedBytes': 1024}
+
+
+@pytest.fixture(autouse=True)
+def utc(monkeypatch):
+    # export days are computed from local time
+    monkeypatch.setattr(exporter, 'tzlocal', tzutc)
+
+
+def get_days(units):
+    return [d.day for _, d, _ in units]
+
+
+def test_export_units_new_group(group):
+    s3 = StubS3()
+    manifest = get_manifest(s3)
+    units = exporter.get_export_units(
+        s3, group, 'archive', 'logs/app', datetime(2024, 1, 1), datetime(2024, 1, 4),
+        manifest=manifest)
+    assert get_days(units) == [1, 2, 3]
+    assert units[0][2]['destinationPrefix'] == 'logs/app/2024/01/01'
+    # the group prefix key is created to carry the LastExport tag
+    assert 'logs/app' in s3.objects
+    assert '/aws/lambda/app' not in manifest
+
+
+def test_export_units_seeded_from_last_export(group):
+    s3 = StubS3()
+    s3.objects['logs/app'] = ('{}', '"1"')
+    s3.tags['logs/app'] = [{'Key': 'LastExport', 'Value': '2024-01-02T00:00:00+00:00'}]
+    manifest = get_manifest(s3)
+    units = exporter.get_export_units(
+        s3, group, 'archive', 'logs/app', datetime(2024, 1, 1), datetime(2024, 1, 5),
+        manifest=manifest)
+    assert get_days(units) == [3, 4]
+    # days from the group's creation through the last export
+    assert manifest.get_ranges(manifest.groups['/aws/lambda/app']) == [
+        ['2023-12-30', '2024-01-02']]
+
+
+def test_export_units_from_manifest(group):
+    s3 = StubS3()
+    manifest = get_manifest(s3)
+    manifest.add_range('/aws/lambda/app', day(1), day(2))
+    manifest.add('/aws/lambda/app', day(4))
+    s3.calls = []
+    units = exporter.get_export_units(
+        s3, group, 'archive', 'logs/app', datetime(2024, 1, 1), datetime(2024, 1, 6),
+        manifest=manifest)
+    assert get_days(units) == [3, 5]
+    # indexed groups don't check the archive bucket
+    assert s3.calls == []
+
+
+def test_record_export(group):
+    s3 = StubS3()
+    s3.objects['logs/app'] = ('{}', '"1"')
+    manifest = get_manifest(s3).load()
+    exporter.record_export(s3, 'archive', 'logs/app', manifest, '/aws/lambda/app', day(3))
+    assert get_manifest(s3).load().get_pending('/aws/lambda/app', [day(3)]) == []
+    assert s3.tags['logs/app'] == [{'Key': 'LastExport', 'Value': day(3).isoformat()}]
@@ -0,0 +1,96 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+from datetime import datetime
+
+from botocore.exceptions import ClientError
+
+from c7n_logexporter.scheduler import ExportScheduler, TaskLedger
+
+
+class StubLogs:
+    """Export tasks which finish on their second status check."""
+
+    def __init__(self, outcomes=None, limit_exceeded=0):
+        self.outcomes = outcomes or {}
+        self.limit_exceeded = limit_exceeded
+        self.created = []
+        self.checks = {}
+
+    def create_export_task(self, **params):
+        if self.limit_exceeded:
+            self.limit_exceeded -= 1
+            raise ClientError(
+                {'Error': {'Code': 'LimitExceededException'}}, 'CreateExportTask')
+        self.created.append(params['destinationPrefix'])
+        return {'taskId': params['destinationPrefix']}
+
+    def describe_export_tasks(self, taskId):
+        self.checks[taskId] = self.checks.get(taskId, 0) + 1
+        status = 'RUNNING'
+        if self.checks[taskId] > 1:
+            status = self.outcomes.get(taskId, 'COMPLETED')
+        return {'exportTasks': [{'taskId': taskId, 'status': {'code': status}}]}
+
+
+def get_units(group, days):
+    return [
+        (group, datetime(2024, 1, d),
+         {'logGroupName': group, 'destinationPrefix': '%s/2024/01/%02d' % (group, d)})
+        for d in days]
+
+
+def get_scheduler(client, ledger=None):
+    return ExportScheduler(
+        client, ledger or TaskLedger(), 'dev', 'us-east-1', poll_period=0, min_poll=0)
+
+
+def test_scheduler_run():
+    client = StubLogs(outcomes={'app/2024/01/02': 'FAILED'}, limit_exceeded=2)
+    scheduler = get_scheduler(client)
+    completed = []
+    stats = scheduler.run(
+        get_units('app', [1, 2, 3]) + get_units('web', [1, 2]),
+        lambda group, day: completed.append((group, day.day)))
+
+    # a group's days after a failed export are skipped
+    assert client.created == [
+        'app/2024/01/01', 'app/2024/01/02', 'web/2024/01/01', 'web/2024/01/02']
+    assert completed == [('app', 1), ('web', 1), ('web', 2)]
+    assert dict(stats) == {'COMPLETED': 3, 'FAILED': 1, 'SKIPPED': 1}
+    assert scheduler.ledger.get_done('dev', 'us-east-1') == {
+        ('app', '2024-01-01'), ('web', '2024-01-01'), ('web', '2024-01-02')}
+    assert scheduler.ledger.get_active('dev', 'us-east-1') == []
+
+
+def test_scheduler_resume(tmp_path):
+    path = str(tmp_path / 'ledger.db')
+    ledger = TaskLedger(path)
+    ledger.set_state('dev', 'us-east-1', 'app', '2024-01-01', 'app/2024/01/01', 'COMPLETED')
+    ledger.set_state('dev', 'us-east-1', 'app', '2024-01-02', 'app/2024/01/02', 'RUNNING')
+    # other account regions are left alone
+    ledger.set_state('qa', 'us-east-1', 'app', '2024-01-01', 'qa-task', 'RUNNING')
+    ledger.close()
+
+    client = StubLogs()
+    scheduler = get_scheduler(client, TaskLedger(path))
+    completed = []
+    stats = scheduler.run(
+        get_units('app', [1, 2, 3]), lambda group, day: completed.append(day.day))
+
+    # the interrupted run's active task is waited on rather than resubmitted
+    assert client.created == ['app/2024/01/03']
+    assert 'qa-task' not in client.checks
+    # days done by the interrupted run are still recorded
+    assert completed == [1, 2, 3]
+    assert dict(stats) == {'SKIPPED': 2, 'COMPLETED': 1}
+    assert scheduler.ledger.get_active('qa', 'us-east-1') == [
+        ('app', '2024-01-01', 'qa-task')]
+    scheduler.ledger.close()
+
+
+def test_scheduler_missing_task():
+    client = StubLogs()
+    client.describe_export_tasks = lambda taskId: {'exportTasks': []}
+    scheduler = get_scheduler(client)
+    stats = scheduler.run(get_units('app', [1]))
+    assert dict(stats) == {'FAILED': 1}
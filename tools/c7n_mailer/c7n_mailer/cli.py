@@ -11,7 +11,13 @@ from c7n_mailer import deploy, utils
 from c7n_mailer.azure_mailer import deploy as azure_deploy
 
 # from c7n_mailer.gcp_mailer import deploy as gcp_deploy
-from c7n_mailer.utils import session_factory, get_processor, get_provider, Providers
+from c7n_mailer.utils import (
+    session_factory,
+    get_processor,
+    get_provider,
+    precompile_templates,
+    Providers,
+)
 
 AZURE_KV_SECRET_SCHEMA = {
     "type": "object",
@@ -129,6 +135,7 @@ CONFIG_SCHEMA = {
         "smtp_ssl": {"type": "boolean"},
         "smtp_username": {"type": "string"},
         "smtp_password": SECURED_STRING_SCHEMA,
+        "smtp_pool_size": {"type": "integer"},
         "ldap_email_key": {"type": "string"},
         "ldap_uid_tags": {"type": "array", "items": {"type": "string"}},
         "debug": {"type": "boolean"},
@@ -141,9 +148,12 @@ CONFIG_SCHEMA = {
         "ldap_email_attribute": {"type": "string"},
         "ldap_bind_password_in_kms": {"type": "boolean"},
         "ldap_bind_password": SECURED_STRING_SCHEMA,
+        "ldap_cache_ttl": {"type": "integer"},
+        "ldap_negative_cache_ttl": {"type": "integer"},
         "cross_accounts": {"type": "object"},
         "ses_region": {"type": "string"},
         "ses_role": {"type": "string"},
+        "ses_max_send_rate": {"type": "number"},
         "redis_host": {"type": "string"},
         "redis_port": {"type": "integer"},
         "datadog_api_key": {"type": "string"},  # TODO: encrypt with KMS?
@@ -203,6 +213,8 @@ def get_c7n_mailer_parser():
     parser.add_argument("--max-num-processes", type=int, help=max_num_processes_help_msg)
     templates_folder_help_msg = "message templates folder location"
     parser.add_argument("-t", "--templates", help=templates_folder_help_msg)
+    precompile_help_msg = "compile the templates in the template folders before processing messages"
+    parser.add_argument("--precompile-templates", action="store_true", help=precompile_help_msg)
     group = parser.add_mutually_exclusive_group(required=True)
     update_lambda_help_msg = "packages your c7n_mailer, uploads the zip to aws lambda as a function"
     group.add_argument("--update-lambda", action="store_true", help=update_lambda_help_msg)
@@ -262,6 +274,10 @@ def main():
         # Select correct processor
         processor = get_processor(mailer_config, logger)
 
+        # compile once up front, parallel workers inherit the compiled templates
+        if args_dict.get("precompile_templates"):
+            precompile_templates(mailer_config["templates_folders"], logger)
+
         # Execute
         if max_num_processes:
             run_mailer_in_parallel(processor, max_num_processes)
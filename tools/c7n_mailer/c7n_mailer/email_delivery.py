@@ -1,10 +1,13 @@
 # Copyright The Cloud Custodian Authors.
 # SPDX-License-Identifier: Apache-2.0
+from concurrent.futures import ThreadPoolExecutor
 from itertools import chain
+import threading
+import time
 
 from c7n_mailer.azure_mailer.sendgrid_delivery import SendGridDelivery
 from c7n_mailer.graph_delivery import GraphDelivery
-from c7n_mailer.smtp_delivery import SmtpDelivery
+from c7n_mailer.smtp_delivery import SmtpPool
 
 from .ldap_lookup import LdapLookup
 from .utils import (
@@ -18,11 +21,35 @@ from .utils import (
 from .utils_email import get_mimetext_message, is_email
 
 
+class RateLimiter:
+    """Space out calls across threads to at most `rate` per second."""
+
+    def __init__(self, rate):
+        self.interval = rate and 1.0 / rate or 0
+        self.next_time = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
 class EmailDelivery:
-    def __init__(self, config, session, logger):
+    # concurrent ses sends per message, held to the ses_max_send_rate
+    ses_send_workers = 4
+
+    def __init__(self, config, session, logger, smtp_pool=None, rate_limiter=None):
         self.config = config
         self.logger = logger
         self.session = session
+        # smtp connections shared across messages, if any
+        self.smtp_pool = smtp_pool
+        # ses send spacing shared across messages, if any
+        self.rate_limiter = rate_limiter or RateLimiter(self.config.get("ses_max_send_rate", 14))
         self.provider = get_provider(self.config)
         if self.provider == Providers.AWS:
             self.aws_ses = self.get_ses_session()
@@ -120,6 +147,25 @@ class EmailDelivery:
             ldap_uid_emails = ldap_uid_emails + ldap_emails_set
         return ldap_uid_emails
 
+    def get_ldap_uids(self, sqs_message):
+        """Collect the ldap uids the message's resources will be resolved with."""
+        uids = []
+        action = sqs_message["action"]
+        ldap_uid_tag_keys = self.config.get("ldap_uid_tags", [])
+        contact_tag_keys = self.config.get("contact_tags", [])
+        for resource in sqs_message["resources"]:
+            if ldap_uid_tag_keys:
+                uids.extend(get_resource_tag_targets(resource, ldap_uid_tag_keys))
+            if action.get("resource_ldap_lookup_username"):
+                uids.append(resource.get("UserName"))
+            if "resource-owner" in action.get("to", []):
+                uids.extend(
+                    uid
+                    for uid in get_resource_tag_targets(resource, contact_tag_keys)
+                    if not is_email(uid)
+                )
+        return uids
+
     def get_resource_owner_emails_from_resource(self, sqs_message, resource):
         if "resource-owner" not in sqs_message["action"].get("to", []):
             return []
@@ -189,6 +235,9 @@ class EmailDelivery:
         account_emails = self.get_account_emails(sqs_message)
 
         policy_to_emails = policy_to_emails + event_owner_email + account_emails
+        # resolve the message's ldap uids together, rather than per resource
+        if self.ldap_lookup:
+            self.ldap_lookup.prefetch_uids(self.get_ldap_uids(sqs_message))
         for resource in sqs_message["resources"]:
             # this is the list of emails that will be sent for this resource
             resource_emails = []
@@ -233,9 +282,18 @@ class EmailDelivery:
         try:
             # if smtp_server is set in mailer.yml, send through smtp
             if "smtp_server" in self.config:
-                delivery = SmtpDelivery(self.config, self.session, self.logger)
-                for emails, mimetext_msg in emails_to_mimetext_map.items():
-                    delivery.send_message(message=mimetext_msg, to_addrs=list(emails))
+                smtp_pool = self.smtp_pool or SmtpPool(
+                    self.config, self.session, self.logger, max_size=1
+                )
+                self.send_messages(
+                    lambda emails, mimetext_msg: smtp_pool.send_message(
+                        message=mimetext_msg, to_addrs=list(emails)
+                    ),
+                    emails_to_mimetext_map,
+                    smtp_pool.max_size,
+                )
+                if smtp_pool is not self.smtp_pool:
+                    smtp_pool.close()
             elif "sendgrid_api_key" in self.config:
                 delivery = SendGridDelivery(self.config, self.session, self.logger)
                 delivery.sendgrid_handler(sqs_message, emails_to_mimetext_map)
@@ -244,8 +302,12 @@ class EmailDelivery:
                 delivery.send_message(emails_to_mimetext_map)
             # use aws ses normally.
             else:
-                for emails, mimetext_msg in emails_to_mimetext_map.items():
+
+                def send_raw_email(emails, mimetext_msg):
+                    self.rate_limiter.wait()
                     self.aws_ses.send_raw_email(RawMessage={"Data": mimetext_msg.as_string()})
+
+                self.send_messages(send_raw_email, emails_to_mimetext_map, self.ses_send_workers)
         except Exception as error:
             self.logger.error(
                 "policy:%s account:%s sending to:%s \n\n error: %s\n\n mailer.yml: %s"
@@ -270,3 +332,20 @@ class EmailDelivery:
                 email_to_addrs,
             )
         )
+
+    def send_messages(self, send, emails_to_mimetext_map, workers):
+        """Send each recipient group's message, concurrently with multiple workers.
+
+        All messages are attempted, the first error is raised afterwards.
+        """
+        if workers < 2 or len(emails_to_mimetext_map) < 2:
+            for emails, mimetext_msg in emails_to_mimetext_map.items():
+                send(emails, mimetext_msg)
+            return
+        with ThreadPoolExecutor(max_workers=workers) as w:
+            futures = [
+                w.submit(send, emails, mimetext_msg)
+                for emails, mimetext_msg in emails_to_mimetext_map.items()
+            ]
+        for f in futures:
+            f.result()
@@ -36,18 +36,21 @@ class MailerGcpQueueProcessor(MessageTargetMixin):
         # Get first set of messages to process
         messages = self.receive_messages()
 
-        while messages and len(messages["receivedMessages"]) > 0:
-            # Discard_date is the timestamp of the last published message in the messages list
-            # and will be the date we need to seek to when we ack_messages
-            discard_date = messages["receivedMessages"][-1]["message"]["publishTime"]
-
-            # Process received messages
-            for message in messages["receivedMessages"]:
-                self.process_message(message, discard_date)
-
-            # Acknowledge and purge processed messages then get next set of messages
-            self.ack_messages(discard_date)
-            messages = self.receive_messages()
+        try:
+            while messages and len(messages["receivedMessages"]) > 0:
+                # Discard_date is the timestamp of the last published message in the messages
+                # list and will be the date we need to seek to when we ack_messages
+                discard_date = messages["receivedMessages"][-1]["message"]["publishTime"]
+
+                # Process received messages
+                for message in messages["receivedMessages"]:
+                    self.process_message(message, discard_date)
+
+                # Acknowledge and purge processed messages then get next set of messages
+                self.ack_messages(discard_date)
+                messages = self.receive_messages()
+        finally:
+            self.close_targets()
 
         self.logger.info("No messages left in the gcp topic subscription, now exiting c7n_mailer.")
 
@@ -4,6 +4,8 @@ import json
 
 import re
 import redis
+import time
+from collections import OrderedDict
 
 try:
     import sqlite3
@@ -13,9 +15,15 @@ else:
     have_sqlite = True
 from ldap3 import Connection
 from ldap3.core.exceptions import LDAPSocketOpenError
+from ldap3.utils.conv import escape_filter_chars
 
 
 class LdapLookup:
+    # uids resolved per ldap query when prefetching
+    uid_batch_size = 50
+    # uids remembered by a lookup, least recently used are evicted first
+    memo_size = 1000
+
     def __init__(self, config, logger):
         self.log = logger
         self.connection = self.get_connection(
@@ -29,6 +37,11 @@ class LdapLookup:
         self.uid_key = config.get("ldap_uid_attribute", "sAMAccountName")
         self.attributes = ["displayName", self.uid_key, self.email_key, self.manager_attr]
         self.uid_regex = config.get("ldap_uid_regex", None)
+        # seconds to cache found users for, and to remember missing ones for
+        self.cache_ttl = config.get("ldap_cache_ttl", None)
+        self.negative_cache_ttl = config.get("ldap_negative_cache_ttl", 3600)
+        # uid -> (expiry, metadata ({} if not found)) resolved by this lookup
+        self.memo = OrderedDict()
         self.cache_engine = config.get("cache_engine", None)
         if self.cache_engine == "redis":
             redis_host = config.get("redis_host")
@@ -64,8 +77,11 @@ class LdapLookup:
         except Exception as e:
             self.log.warning(f"Error occurred getting LDAP connection: {e}")
 
-    def search_ldap(self, base_dn, ldap_filter, attributes):
+    def search_ldap(self, base_dn, ldap_filter, attributes, unique=True):
+        """Search for a user entry, or with unique false for all matching entries."""
         self.connection.search(base_dn, ldap_filter, attributes=self.attributes)
+        if not unique:
+            return list(self.connection.entries)
         if len(self.connection.entries) == 0:
             self.log.warning("user not found. base_dn: %s filter: %s", base_dn, ldap_filter)
             return {}
@@ -103,12 +119,13 @@ class LdapLookup:
         if ldap_results:
             ldap_user_metadata = self.get_dict_from_ldap_object(self.connection.entries[0])
         else:
-            self.caching.set(user_dn, {})
+            if self.cache_engine:
+                self.caching.set(user_dn, {}, self.negative_cache_ttl)
             return {}
         if self.cache_engine:
             self.log.debug("Writing user: %s metadata to cache engine." % user_dn)
-            self.caching.set(user_dn, ldap_user_metadata)
-            self.caching.set(ldap_user_metadata[self.uid_key], ldap_user_metadata)
+            self.caching.set(user_dn, ldap_user_metadata, self.cache_ttl)
+            self.caching.set(ldap_user_metadata[self.uid_key], ldap_user_metadata, self.cache_ttl)
         return ldap_user_metadata
 
     def get_dict_from_ldap_object(self, ldap_user_object):
@@ -139,28 +156,97 @@ class LdapLookup:
                 regex_msg = "uid does not match regex: %s %s" % (self.uid_regex, uid)
                 self.log.debug(regex_msg)
                 return {}
+        memo_result = self.get_memo(uid)
+        if memo_result is not None:
+            return memo_result
         if self.cache_engine:
             cache_result = self.caching.get(uid)
             if cache_result or cache_result == {}:
                 cache_msg = "Got ldap metadata from local cache for: %s" % uid
                 self.log.debug(cache_msg)
+                self.set_memo(uid, cache_result)
                 return cache_result
         ldap_filter = "(%s=%s)" % (self.uid_key, uid)
         ldap_results = self.search_ldap(self.base_dn, ldap_filter, attributes=self.attributes)
+        ldap_user_metadata = {}
         if ldap_results:
             ldap_user_metadata = self.get_dict_from_ldap_object(self.connection.entries[0])
-            if self.cache_engine:
-                self.log.debug("Writing user: %s metadata to cache engine." % uid)
-                if ldap_user_metadata.get("dn"):
-                    self.caching.set(ldap_user_metadata["dn"], ldap_user_metadata)
-                    self.caching.set(uid, ldap_user_metadata)
-                else:
-                    self.caching.set(uid, {})
+        self.cache_metadata(uid, ldap_user_metadata)
+        return ldap_user_metadata
+
+    def get_memo(self, uid):
+        if uid not in self.memo:
+            return None
+        expires, metadata = self.memo[uid]
+        if expires is not None and expires < time.time():
+            del self.memo[uid]
+            return None
+        self.memo.move_to_end(uid)
+        return metadata
+
+    def set_memo(self, uid, metadata):
+        # honour the same ttls as the cache engine
+        ttl = metadata and self.cache_ttl or not metadata and self.negative_cache_ttl
+        self.memo[uid] = (ttl and time.time() + ttl or None, metadata)
+        self.memo.move_to_end(uid)
+        while len(self.memo) > self.memo_size:
+            self.memo.popitem(last=False)
+
+    def cache_metadata(self, uid, ldap_user_metadata):
+        self.set_memo(uid, ldap_user_metadata)
+        if not self.cache_engine:
+            return
+        if ldap_user_metadata.get("dn"):
+            self.log.debug("Writing user: %s metadata to cache engine." % uid)
+            self.caching.set(ldap_user_metadata["dn"], ldap_user_metadata, self.cache_ttl)
+            self.caching.set(uid, ldap_user_metadata, self.cache_ttl)
         else:
+            self.caching.set(uid, {}, self.negative_cache_ttl)
+
+    def prefetch_uids(self, uids):
+        """Resolve uids not already cached, with a query per batch of uids.
+
+        Users that aren't found are cached as such, so later lookups of
+        any of the uids are answered from the cache.
+        """
+        pending = set()
+        for uid in uids:
+            if not uid:
+                continue
+            uid = uid.lower()
+            if self.get_memo(uid) is not None or (
+                self.uid_regex and not re.search(self.uid_regex, uid)
+            ):
+                continue
             if self.cache_engine:
-                self.caching.set(uid, {})
-            return {}
-        return ldap_user_metadata
+                cache_result = self.caching.get(uid)
+                if cache_result or cache_result == {}:
+                    self.set_memo(uid, cache_result)
+                    continue
+            pending.add(uid)
+        if not pending or self.connection is None:
+            return
+        pending = sorted(pending)
+        self.log.debug("Resolving %d uids from ldap", len(pending))
+        for idx in range(0, len(pending), self.uid_batch_size):
+            batch = pending[idx : idx + self.uid_batch_size]
+            ldap_filter = "(|%s)" % "".join(
+                "(%s=%s)" % (self.uid_key, escape_filter_chars(uid)) for uid in batch
+            )
+            found = {}
+            for entry in self.search_ldap(
+                self.base_dn, ldap_filter, attributes=self.attributes, unique=False
+            ):
+                ldap_user_metadata = self.get_dict_from_ldap_object(entry)
+                if ldap_user_metadata:
+                    found.setdefault(str(ldap_user_metadata[self.uid_key]).lower(), []).append(
+                        ldap_user_metadata
+                    )
+            for uid in batch:
+                matches = found.get(uid, ())
+                if len(matches) > 1:
+                    self.log.warning("too many results for uid %s", uid)
+                self.cache_metadata(uid, len(matches) == 1 and matches[0] or {})
 
 
 # Use sqlite as a local cache for folks not running the mailer in lambda, avoids extra daemons
@@ -172,19 +258,32 @@ class LocalSqlite:
         self.log = logger
         self.sqlite = sqlite3.connect(local_filename)
         self.sqlite.execute("""CREATE TABLE IF NOT EXISTS ldap_cache(key text, value text)""")
+        # caches from before expiry was supported lack the expires column
+        columns = [c[1] for c in self.sqlite.execute("PRAGMA table_info(ldap_cache)")]
+        if "expires" not in columns:
+            self.sqlite.execute("ALTER TABLE ldap_cache ADD COLUMN expires real")
 
     def get(self, key):
-        sqlite_result = self.sqlite.execute("select * FROM ldap_cache WHERE key=?", (key,))
+        sqlite_result = self.sqlite.execute(
+            "select value, expires FROM ldap_cache WHERE key=?", (key,)
+        )
         result = sqlite_result.fetchall()
         if len(result) != 1:
             error_msg = "Did not get 1 result from sqlite, something went wrong with key: %s" % key
             self.log.error(error_msg)
             return None
-        return json.loads(result[0][1])
+        value, expires = result[0]
+        if expires and expires < time.time():
+            return None
+        return json.loads(value)
 
-    def set(self, key, value):
+    def set(self, key, value, ttl=None):
+        expires = ttl and time.time() + ttl or None
         # note, the ? marks are required to ensure escaping into the database.
-        self.sqlite.execute("INSERT INTO ldap_cache VALUES (?, ?)", (key, json.dumps(value)))
+        self.sqlite.execute("DELETE FROM ldap_cache WHERE key=?", (key,))
+        self.sqlite.execute(
+            "INSERT INTO ldap_cache VALUES (?, ?, ?)", (key, json.dumps(value), expires)
+        )
         self.sqlite.commit()
 
 
@@ -199,5 +298,5 @@ class Redis:
         if cache_value:
             return json.loads(cache_value)
 
-    def set(self, key, value):
-        return self.connection.set(key, json.dumps(value))
+    def set(self, key, value, ttl=None):
+        return self.connection.set(key, json.dumps(value), ex=ttl)
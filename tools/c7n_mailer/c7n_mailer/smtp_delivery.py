@@ -2,7 +2,10 @@
 # SPDX-License-Identifier: Apache-2.0
 
 
+from contextlib import contextmanager
 import smtplib
+import threading
+
 import c7n_mailer.utils as utils
 
 
@@ -25,10 +28,72 @@ class SmtpDelivery:
         self._smtp_connection = smtp_connection
 
     def __del__(self):
+        self.close()
+
+    def close(self):
+        # not set if connecting failed
+        smtp_connection = getattr(self, "_smtp_connection", None)
+        self._smtp_connection = None
+        if smtp_connection is None:
+            return
         try:
-            self._smtp_connection.quit()
+            smtp_connection.quit()
         except smtplib.SMTPServerDisconnected:
             pass
 
     def send_message(self, message, to_addrs):
         self._smtp_connection.sendmail(message["From"], to_addrs, message.as_string())
+
+
+class SmtpPool:
+    """Reuse smtp connections across sends and messages.
+
+    Connections are opened as needed, at most `max_size` idle connections
+    are kept, and a send on a connection the server has since closed is
+    retried once on a new connection, after closing the idle connections
+    as they're likely just as stale.
+    """
+
+    def __init__(self, config, session, logger, max_size=4):
+        self.config = config
+        self.session = session
+        self.logger = logger
+        self.max_size = max_size
+        self.idle = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def connection(self, new=False):
+        delivery = None
+        if not new:
+            with self.lock:
+                delivery = self.idle and self.idle.pop() or None
+        if delivery is None:
+            delivery = SmtpDelivery(self.config, self.session, self.logger)
+        try:
+            yield delivery
+        except Exception:
+            # connections that error are dropped
+            delivery.close()
+            raise
+        with self.lock:
+            if len(self.idle) < self.max_size:
+                self.idle.append(delivery)
+                return
+        delivery.close()
+
+    def send_message(self, message, to_addrs):
+        try:
+            with self.connection() as delivery:
+                return delivery.send_message(message, to_addrs)
+        except smtplib.SMTPServerDisconnected:
+            self.logger.debug("smtp connection closed by server, reconnecting")
+        self.close()
+        with self.connection(new=True) as delivery:
+            return delivery.send_message(message, to_addrs)
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for delivery in idle:
+            delivery.close()
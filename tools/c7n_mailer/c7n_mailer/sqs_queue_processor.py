@@ -6,11 +6,16 @@ SQS Message Processing
 
 """
 import base64
+from collections import Counter
+from contextlib import contextmanager
 import json
 import logging
+import threading
+import time
 import zlib
 
 from c7n_mailer.target import MessageTargetMixin
+from c7n_mailer.utils import session_factory
 
 DATA_MESSAGE = "maidmsg/1.0"
 
@@ -18,6 +23,8 @@ DATA_MESSAGE = "maidmsg/1.0"
 class MailerSqsQueueIterator:
     # Copied from custodian to avoid runtime library dependency
     msg_attributes = ["sequence_id", "op", "ser"]
+    # sqs maximum for receive and batch calls
+    batch_size = 10
 
     def __init__(self, aws_sqs, queue_url, logger, limit=0, timeout=10):
         self.aws_sqs = aws_sqs
@@ -26,6 +33,10 @@ class MailerSqsQueueIterator:
         self.logger = logger
         self.timeout = timeout
         self.messages = []
+        # receipt handle -> (message, time received or last extended)
+        self.held = {}
+        # held is also updated by the visibility heartbeat thread
+        self.lock = threading.Lock()
 
     # this and the next function make this object iterable with a for loop
     def __iter__(self):
@@ -37,15 +48,18 @@ class MailerSqsQueueIterator:
         response = self.aws_sqs.receive_message(
             QueueUrl=self.queue_url,
             WaitTimeSeconds=self.timeout,
-            MaxNumberOfMessages=3,
+            MaxNumberOfMessages=self.batch_size,
             MessageAttributeNames=self.msg_attributes,
             AttributeNames=["SentTimestamp"],
         )
 
         msgs = response.get("Messages", [])
         self.logger.debug("Messages received %d", len(msgs))
-        for m in msgs:
-            self.messages.append(m)
+        now = time.time()
+        with self.lock:
+            for m in msgs:
+                self.messages.append(m)
+                self.held[m["ReceiptHandle"]] = (m, now)
         if self.messages:
             return self.messages.pop(0)
         raise StopIteration()
@@ -53,10 +67,126 @@ class MailerSqsQueueIterator:
     next = __next__  # python2.7
 
     def ack(self, m):
+        self.release(m)
         self.aws_sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=m["ReceiptHandle"])
 
+    def ack_batch(self, messages):
+        for m in messages:
+            self.release(m)
+        for batch in self._batches(messages):
+            response = self.aws_sqs.delete_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {"Id": str(idx), "ReceiptHandle": m["ReceiptHandle"]}
+                    for idx, m in enumerate(batch)
+                ],
+            )
+            for f in response.get("Failed", ()):
+                self.logger.warning(
+                    "Error deleting message id:%s %s",
+                    batch[int(f["Id"])]["MessageId"],
+                    f.get("Message", f["Code"]),
+                )
+
+    def release(self, m):
+        """Stop tracking a message, leaving it to be redelivered."""
+        with self.lock:
+            self.held.pop(m["ReceiptHandle"], None)
+
+    def get_visibility_timeout(self):
+        """Return the queue's visibility timeout in seconds, or None if unknown."""
+        try:
+            response = self.aws_sqs.get_queue_attributes(
+                QueueUrl=self.queue_url, AttributeNames=["VisibilityTimeout"]
+            )
+            return int(response["Attributes"]["VisibilityTimeout"])
+        except Exception as e:
+            self.logger.warning("Unable to get queue visibility timeout: %s", e)
+            return None
+
+    def extend_visibility(self, timeout, after):
+        """Extend the visibility of messages held for longer than `after` seconds."""
+        now = time.time()
+        with self.lock:
+            stale = [m for m, since in self.held.values() if now - since > after]
+        for batch in self._batches(stale):
+            self.aws_sqs.change_message_visibility_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {
+                        "Id": str(idx),
+                        "ReceiptHandle": m["ReceiptHandle"],
+                        "VisibilityTimeout": timeout,
+                    }
+                    for idx, m in enumerate(batch)
+                ],
+            )
+        with self.lock:
+            for m in stale:
+                # skip messages acked or released meanwhile
+                if m["ReceiptHandle"] in self.held:
+                    self.held[m["ReceiptHandle"]] = (m, now)
+        return len(stale)
+
+    def _batches(self, messages):
+        for idx in range(0, len(messages), self.batch_size):
+            yield messages[idx : idx + self.batch_size]
+
+
+# Parallel processing runs in a process pool, with a processor per
+# worker process, as boto3 sessions can't be passed to the workers.
+_worker_processor = None
+
+
+def init_worker(processor_class, config, logger_name, send_processes=1):
+    import multiprocessing.util
+
+    global _worker_processor
+    _worker_processor = processor_class(
+        config, session_factory(config), logging.getLogger(logger_name)
+    )
+    # workers share the ses send rate
+    _worker_processor.send_processes = send_processes
+    multiprocessing.util.Finalize(None, _worker_processor.close_targets, exitpriority=10)
+
+
+def process_worker_message(sqs_message):
+    _worker_processor.process_sqs_message(sqs_message)
+
+
+class VisibilityHeartbeat(threading.Thread):
+    """Extend the visibility of held messages while they're processed.
+
+    Every third of the queue's visibility timeout, messages held since
+    the previous beat are made invisible for the queue's visibility
+    timeout again, so they aren't redelivered while still held, without
+    ever shortening the timeout configured on the queue.
+    """
+
+    def __init__(self, processor, sqs_messages, timeout):
+        super().__init__(daemon=True)
+        self.processor = processor
+        self.sqs_messages = sqs_messages
+        self.timeout = timeout
+        self.interval = timeout / 3.0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.processor.extend_visibility(self.sqs_messages, self.timeout, self.interval)
+            except Exception:
+                self.processor.logger.exception("Error extending sqs_message visibility")
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
 
 class MailerSqsQueueProcessor(MessageTargetMixin):
+    # seconds to wait on the oldest pending message between collecting results
+    collect_interval = 20
+
     def __init__(self, config, session, logger, max_num_processes=16):
         self.config = config
         self.logger = logger
@@ -64,6 +194,7 @@ class MailerSqsQueueProcessor(MessageTargetMixin):
         self.max_num_processes = max_num_processes
         self.receive_queue = self.config["queue_url"]
         self.endpoint_url = self.config.get("endpoint_url", None)
+        self.stats = Counter()
         if self.config.get("debug", False):
             self.logger.debug("debug logging is turned on from mailer config file.")
             logger.setLevel(logging.DEBUG)
@@ -86,39 +217,143 @@ class MailerSqsQueueProcessor(MessageTargetMixin):
     """
 
     def run(self, parallel=False):
+        """Process messages until the queue is drained, returning throughput stats.
+
+        Messages are deleted in batches once processed successfully, messages
+        that fail processing are left on the queue to be redelivered.
+        """
         self.logger.info("Downloading messages from the SQS queue.")
         aws_sqs = self.session.client("sqs", endpoint_url=self.endpoint_url)
         sqs_messages = MailerSqsQueueIterator(aws_sqs, self.receive_queue, self.logger)
 
         sqs_messages.msg_attributes = ["mtype", "recipient"]
+        self.stats = Counter()
+        start = time.time()
         # lambda doesn't support multiprocessing, so we don't instantiate any mp stuff
         # unless it's being run from CLI on a normal system with SHM
-        if parallel:
-            import multiprocessing
-
-            process_pool = multiprocessing.Pool(processes=self.max_num_processes)
-        for sqs_message in sqs_messages:
-            self.logger.debug(
-                "Message id: %s received %s"
-                % (sqs_message["MessageId"], sqs_message.get("MessageAttributes", ""))
-            )
-            msg_kind = sqs_message.get("MessageAttributes", {}).get("mtype")
-            if msg_kind:
-                msg_kind = msg_kind["StringValue"]
-            if not msg_kind == DATA_MESSAGE:
-                warning_msg = "Unknown sqs_message or sns format %s" % (sqs_message["Body"][:50])
-                self.logger.warning(warning_msg)
+        try:
             if parallel:
-                process_pool.apply_async(self.process_sqs_message, args=sqs_message)
+                self.run_parallel(sqs_messages)
             else:
-                self.process_sqs_message(sqs_message)
-            self.logger.debug("Processed sqs_message")
-            sqs_messages.ack(sqs_message)
-        if parallel:
-            process_pool.close()
-            process_pool.join()
+                self.run_serial(sqs_messages)
+        finally:
+            self.close_targets()
+        elapsed = time.time() - start
+        self.stats["seconds"] = round(elapsed, 2)
+        self.logger.info(
+            "Processed %d sqs_messages (%d failed) in %0.2fs, %0.2f messages/s",
+            self.stats["processed"],
+            self.stats["failed"],
+            elapsed,
+            elapsed and self.stats["processed"] / elapsed or 0,
+        )
         self.logger.info("No sqs_messages left on the queue, exiting c7n_mailer.")
-        return
+        return self.stats
+
+    def run_serial(self, sqs_messages):
+        acks = []
+        try:
+            with self.keep_visible(sqs_messages):
+                for sqs_message in sqs_messages:
+                    self.check_message(sqs_message)
+                    self.process_sqs_message(sqs_message)
+                    self.logger.debug("Processed sqs_message")
+                    self.stats["processed"] += 1
+                    acks.append(sqs_message)
+                    # ack before waiting on the next receive
+                    if len(acks) == sqs_messages.batch_size or not sqs_messages.messages:
+                        self.ack(sqs_messages, acks)
+                        acks = []
+        finally:
+            self.ack(sqs_messages, acks)
+
+    def run_parallel(self, sqs_messages):
+        import multiprocessing
+
+        process_pool = multiprocessing.Pool(
+            processes=self.max_num_processes,
+            initializer=init_worker,
+            initargs=(type(self), self.config, self.logger.name, self.max_num_processes),
+        )
+        pending, acks = [], []
+        # the heartbeat thread starts once the pool's worker processes are forked
+        with self.keep_visible(sqs_messages):
+            for sqs_message in sqs_messages:
+                self.check_message(sqs_message)
+                pending.append(
+                    (sqs_message, process_pool.apply_async(process_worker_message, (sqs_message,)))
+                )
+                # bound the number of messages held awaiting a worker
+                while len(pending) >= self.max_num_processes * 2:
+                    pending[0][1].wait(self.collect_interval)
+                    pending = self.collect(sqs_messages, pending, acks)
+                pending = self.collect(sqs_messages, pending, acks)
+            while pending:
+                pending[0][1].wait(self.collect_interval)
+                pending = self.collect(sqs_messages, pending, acks)
+        self.ack(sqs_messages, acks)
+        process_pool.close()
+        process_pool.join()
+
+    def collect(self, sqs_messages, pending, acks):
+        """Record the outcome of completed messages, returning those still pending."""
+        remaining = []
+        for sqs_message, result in pending:
+            if not result.ready():
+                remaining.append((sqs_message, result))
+                continue
+            try:
+                result.get()
+            except Exception:
+                self.logger.exception(
+                    "Error processing sqs_message id:%s", sqs_message["MessageId"]
+                )
+                self.stats["failed"] += 1
+                sqs_messages.release(sqs_message)
+                continue
+            self.logger.debug("Processed sqs_message")
+            self.stats["processed"] += 1
+            acks.append(sqs_message)
+        if len(acks) >= sqs_messages.batch_size or (acks and not remaining):
+            self.ack(sqs_messages, acks)
+            acks[:] = []
+        return remaining
+
+    def ack(self, sqs_messages, acks):
+        if not acks:
+            return
+        sqs_messages.ack_batch(acks)
+        self.stats["deleted"] += len(acks)
+
+    @contextmanager
+    def keep_visible(self, sqs_messages):
+        """Keep held messages invisible on the queue until processed."""
+        timeout = sqs_messages.get_visibility_timeout()
+        if not timeout:
+            yield
+            return
+        heartbeat = VisibilityHeartbeat(self, sqs_messages, timeout)
+        heartbeat.start()
+        try:
+            yield
+        finally:
+            heartbeat.stop()
+
+    def extend_visibility(self, sqs_messages, timeout, after):
+        self.stats["extended"] += sqs_messages.extend_visibility(timeout, after)
+
+    def check_message(self, sqs_message):
+        self.stats["received"] += 1
+        self.logger.debug(
+            "Message id: %s received %s"
+            % (sqs_message["MessageId"], sqs_message.get("MessageAttributes", ""))
+        )
+        msg_kind = sqs_message.get("MessageAttributes", {}).get("mtype")
+        if msg_kind:
+            msg_kind = msg_kind["StringValue"]
+        if not msg_kind == DATA_MESSAGE:
+            warning_msg = "Unknown sqs_message or sns format %s" % (sqs_message["Body"][:50])
+            self.logger.warning(warning_msg)
 
     # This function when processing sqs messages will only deliver messages over email or sns
     # If you explicitly declare which tags are aws_usernames (synonymous with ldap uids)
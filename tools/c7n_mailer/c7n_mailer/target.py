@@ -3,16 +3,50 @@
 
 import traceback
 
-from .email_delivery import EmailDelivery
+from .email_delivery import EmailDelivery, RateLimiter
+from .smtp_delivery import SmtpPool
 from .utils import decrypt
 
 
 class MessageTargetMixin(object):
+    # smtp connections reused across the messages a processor handles
+    smtp_pool = None
+    # ses sends spaced across the messages a processor handles
+    rate_limiter = None
+    # processes sharing the ses send rate, eg. parallel workers
+    send_processes = 1
+
+    def get_rate_limiter(self):
+        if self.rate_limiter is None:
+            self.rate_limiter = RateLimiter(
+                self.config.get("ses_max_send_rate", 14) / self.send_processes
+            )
+        return self.rate_limiter
+
+    def close_targets(self):
+        """Close connections kept across messages."""
+        if self.smtp_pool is not None:
+            self.smtp_pool.close()
+            self.smtp_pool = None
+
     def handle_targets(self, message, sent_timestamp, email_delivery=True, sns_delivery=False):
         # get the map of email_to_addresses to mimetext messages (with resources baked in)
         # and send any emails (to SES or SMTP) if there are email addresses found
         if email_delivery:
-            email_delivery = EmailDelivery(self.config, self.session, self.logger)
+            if self.smtp_pool is None and "smtp_server" in self.config:
+                self.smtp_pool = SmtpPool(
+                    self.config,
+                    self.session,
+                    self.logger,
+                    max_size=self.config.get("smtp_pool_size", 4),
+                )
+            email_delivery = EmailDelivery(
+                self.config,
+                self.session,
+                self.logger,
+                smtp_pool=self.smtp_pool,
+                rate_limiter=self.get_rate_limiter(),
+            )
             email_delivery.send_c7n_email(message)
 
         # this sections gets the map of sns_to_addresses to rendered_jinja messages
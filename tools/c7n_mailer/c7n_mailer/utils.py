@@ -76,10 +76,39 @@ def get_jinja_env(template_folders):
     return env
 
 
+# environments shared across renders by template folders, each keeps
+# compiled templates cached by name and recompiles them if their source
+# file is modified.
+_jinja_envs = {}
+
+
+def get_shared_jinja_env(template_folders):
+    key = tuple(template_folders)
+    env = _jinja_envs.get(key)
+    if env is None:
+        env = _jinja_envs[key] = get_jinja_env(template_folders)
+    return env
+
+
+def precompile_templates(template_folders, logger):
+    """Compile all templates in the template folders ahead of rendering."""
+    env = get_shared_jinja_env(template_folders)
+    count = 0
+    for name in env.list_templates(extensions=["j2"]):
+        try:
+            env.get_template(name)
+        except Exception as error_msg:
+            logger.warning("Error compiling template %s\n%s" % (name, error_msg))
+            continue
+        count += 1
+    logger.debug("Compiled %d templates" % count)
+    return count
+
+
 def get_rendered_jinja(
     target, sqs_message, resources, logger, specified_template, default_template, template_folders
 ):
-    env = get_jinja_env(template_folders)
+    env = get_shared_jinja_env(template_folders)
     mail_template = sqs_message["action"].get(specified_template, default_template)
     if not os.path.isabs(mail_template):
         mail_template = "%s.j2" % mail_template
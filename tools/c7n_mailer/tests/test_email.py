@@ -202,6 +202,30 @@ class EmailTest(unittest.TestCase):
             # Check the mock has been called only once
             self.assertEqual(smtp_instance.sendmail.call_count, 2)
 
+    def test_ses_sends_concurrently(self):
+        config = copy.deepcopy(MAILER_CONFIG)
+        del config["smtp_server"]
+        config["ses_max_send_rate"] = 100
+        delivery = MockEmailDelivery(config, self.aws_session, logger)
+        delivery.ldap_lookup.uid_regex = ""
+        delivery.aws_ses = MagicMock()
+        SQS_MESSAGE = copy.deepcopy(SQS_MESSAGE_1)
+        SQS_MESSAGE["resources"].append(RESOURCE_4)
+        delivery.send_c7n_email(SQS_MESSAGE)
+        self.assertEqual(delivery.aws_ses.send_raw_email.call_count, 2)
+
+    def test_ses_shared_rate_limiter(self):
+        config = copy.deepcopy(MAILER_CONFIG)
+        del config["smtp_server"]
+        rate_limiter = MagicMock()
+        delivery = MockEmailDelivery(config, self.aws_session, logger, rate_limiter=rate_limiter)
+        delivery.ldap_lookup.uid_regex = ""
+        delivery.aws_ses = MagicMock()
+        SQS_MESSAGE = copy.deepcopy(SQS_MESSAGE_1)
+        SQS_MESSAGE["resources"].append(RESOURCE_4)
+        delivery.send_c7n_email(SQS_MESSAGE)
+        self.assertEqual(rate_limiter.wait.call_count, 2)
+
     def test_emails_resource_mapping_multiples(self):
         SQS_MESSAGE = copy.deepcopy(SQS_MESSAGE_1)
         SQS_MESSAGE["action"].pop("priority_header", None)
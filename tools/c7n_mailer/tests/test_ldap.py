@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import unittest
+from unittest.mock import patch
 
 from common import get_ldap_lookup, PETER, BILL
 from c7n_mailer.ldap_lookup import have_sqlite
@@ -97,3 +98,61 @@ class MailerLdapTest(unittest.TestCase):
         self.ldap_lookup.connection = None
         to_addr = self.ldap_lookup.get_email_to_addrs_from_uid("doesnotexist", manager=True)
         self.assertEqual(to_addr, [])
+
+    def test_prefetch_uids_single_query(self):
+        with patch.object(
+            self.ldap_lookup.connection, "search", wraps=self.ldap_lookup.connection.search
+        ) as search:
+            self.ldap_lookup.prefetch_uids(["Peter", "bill_lumbergh", "peter", "nobody", None])
+            self.assertEqual(search.call_count, 1)
+            self.assertEqual(
+                self.ldap_lookup.get_email_to_addrs_from_uid("peter", manager=True),
+                ["peter@initech.com", "bill_lumberg@initech.com"],
+            )
+            self.assertEqual(self.ldap_lookup.get_metadata_from_uid("nobody"), {})
+            self.assertEqual(search.call_count, 1)
+        # misses are cached, and shared with later lookups
+        self.assertEqual(self.ldap_lookup.caching.get("nobody"), {})
+        self.assertEqual(
+            self.ldap_lookup.caching.get("bill_lumbergh")["mail"], "bill_lumberg@initech.com"
+        )
+
+    def test_prefetch_uids_uses_search_ldap(self):
+        with patch.object(
+            self.ldap_lookup, "search_ldap", wraps=self.ldap_lookup.search_ldap
+        ) as search:
+            self.ldap_lookup.prefetch_uids(["peter", "nobody"])
+            self.assertEqual(search.call_count, 1)
+            self.assertFalse(search.call_args[1]["unique"])
+
+    def test_memo_bounded(self):
+        self.ldap_lookup.memo_size = 2
+        for uid in ("a", "b", "c"):
+            self.ldap_lookup.set_memo(uid, {"uid": uid})
+        self.assertEqual(list(self.ldap_lookup.memo), ["b", "c"])
+        # reads refresh an entry's recency
+        self.ldap_lookup.get_memo("b")
+        self.ldap_lookup.set_memo("d", {})
+        self.assertEqual(list(self.ldap_lookup.memo), ["b", "d"])
+
+    def test_memo_ttl(self):
+        self.ldap_lookup.cache_ttl = None
+        self.ldap_lookup.negative_cache_ttl = 60
+        with patch("c7n_mailer.ldap_lookup.time.time", return_value=1000):
+            self.ldap_lookup.set_memo("peter", {"uid": "peter"})
+            self.ldap_lookup.set_memo("nobody", {})
+        with patch("c7n_mailer.ldap_lookup.time.time", return_value=1100):
+            self.assertEqual(self.ldap_lookup.get_memo("peter"), {"uid": "peter"})
+            self.assertEqual(self.ldap_lookup.get_memo("nobody"), None)
+        self.ldap_lookup.cache_ttl = 60
+        with patch("c7n_mailer.ldap_lookup.time.time", return_value=1000):
+            self.ldap_lookup.set_memo("peter", {"uid": "peter"})
+        with patch("c7n_mailer.ldap_lookup.time.time", return_value=1100):
+            self.assertEqual(self.ldap_lookup.get_memo("peter"), None)
+        self.assertNotIn("peter", self.ldap_lookup.memo)
+
+    def test_sqlite_cache_expiry(self):
+        self.ldap_lookup.caching.set("nobody", {}, ttl=60)
+        self.assertEqual(self.ldap_lookup.caching.get("nobody"), {})
+        self.ldap_lookup.caching.set("nobody", {}, ttl=-1)
+        self.assertEqual(self.ldap_lookup.caching.get("nobody"), None)
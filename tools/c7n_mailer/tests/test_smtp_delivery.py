@@ -6,7 +6,7 @@ import unittest
 
 import smtplib
 
-from c7n_mailer.smtp_delivery import SmtpDelivery
+from c7n_mailer.smtp_delivery import SmtpDelivery, SmtpPool
 from mock import patch, call, MagicMock
 
 
@@ -119,3 +119,53 @@ class SmtpDeliveryTest(unittest.TestCase):
         d = SmtpDelivery(config, MagicMock(), MagicMock())
         d._smtp_connection.quit.side_effect = smtplib.SMTPServerDisconnected
         del d
+
+    @patch("smtplib.SMTP")
+    def test_pool_reuses_connection(self, mock_smtp):
+        config = {"smtp_server": "server", "smtp_port": 25, "smtp_ssl": False}
+        pool = SmtpPool(config, MagicMock(), MagicMock())
+        message_mock = MagicMock()
+        message_mock.as_string.return_value = "mock_text"
+        pool.send_message(message_mock, ["test1@test.com"])
+        pool.send_message(message_mock, ["test2@test.com"])
+        self.assertEqual(mock_smtp.call_count, 1)
+        self.assertEqual(mock_smtp.return_value.sendmail.call_count, 2)
+        pool.close()
+        mock_smtp.return_value.quit.assert_called_once()
+
+    @patch("smtplib.SMTP")
+    def test_pool_reconnects_on_new_connection(self, mock_smtp):
+        first, second, fresh = MagicMock(), MagicMock(), MagicMock()
+        mock_smtp.side_effect = [first, second, fresh]
+        config = {"smtp_server": "server", "smtp_port": 25, "smtp_ssl": False}
+        pool = SmtpPool(config, MagicMock(), MagicMock())
+        message_mock = MagicMock()
+        message_mock.as_string.return_value = "mock_text"
+        with pool.connection() as a, pool.connection() as b:
+            self.assertEqual((a._smtp_connection, b._smtp_connection), (first, second))
+        self.assertEqual(len(pool.idle), 2)
+
+        # the server closed both idle connections
+        first.sendmail.side_effect = smtplib.SMTPServerDisconnected
+        second.sendmail.side_effect = smtplib.SMTPServerDisconnected
+        pool.send_message(message_mock, ["test1@test.com"])
+        fresh.sendmail.assert_called_once()
+        # the remaining stale connection was closed rather than retried
+        self.assertEqual(first.sendmail.call_count + second.sendmail.call_count, 1)
+        first.quit.assert_called_once()
+        second.quit.assert_called_once()
+        self.assertEqual([d._smtp_connection for d in pool.idle], [fresh])
+
+    @patch("smtplib.SMTP")
+    def test_pool_reconnects(self, mock_smtp):
+        stale, fresh = MagicMock(), MagicMock()
+        stale.sendmail.side_effect = smtplib.SMTPServerDisconnected
+        mock_smtp.side_effect = [stale, fresh]
+        config = {"smtp_server": "server", "smtp_port": 25, "smtp_ssl": False}
+        pool = SmtpPool(config, MagicMock(), MagicMock())
+        message_mock = MagicMock()
+        message_mock.as_string.return_value = "mock_text"
+        pool.send_message(message_mock, ["test1@test.com"])
+        self.assertEqual(mock_smtp.call_count, 2)
+        fresh.sendmail.assert_called_once()
+        self.assertEqual(len(pool.idle), 1)
@@ -0,0 +1,124 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+import logging
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from c7n_mailer import sqs_queue_processor
+from common import MAILER_CONFIG, SQS_MESSAGE_1_ENCODED
+
+
+class SqsQueueProcessorTest(unittest.TestCase):
+    def get_processor(self, messages):
+        client = MagicMock()
+        client.receive_message.side_effect = [
+            {"Messages": messages[idx : idx + 10]} for idx in range(0, len(messages), 10)
+        ] + [{}]
+        client.delete_message_batch.return_value = {"Successful": []}
+        client.get_queue_attributes.return_value = {"Attributes": {"VisibilityTimeout": "300"}}
+        session = MagicMock()
+        session.client.return_value = client
+        processor = sqs_queue_processor.MailerSqsQueueProcessor(
+            MAILER_CONFIG, session, logging.getLogger("c7n_mailer"), max_num_processes=2
+        )
+        return processor, client
+
+    def get_messages(self, count):
+        return [
+            dict(SQS_MESSAGE_1_ENCODED, MessageId=str(idx), ReceiptHandle="rh-%d" % idx)
+            for idx in range(count)
+        ]
+
+    def test_batch_receive_and_ack(self):
+        processor, client = self.get_processor(self.get_messages(12))
+        with patch.object(processor, "process_sqs_message") as process_sqs_message:
+            stats = processor.run()
+        self.assertEqual(process_sqs_message.call_count, 12)
+        self.assertEqual(client.receive_message.call_args[1]["MaxNumberOfMessages"], 10)
+        self.assertEqual(
+            [len(c[1]["Entries"]) for c in client.delete_message_batch.call_args_list], [10, 2]
+        )
+        self.assertFalse(client.delete_message.called)
+        self.assertEqual((stats["received"], stats["processed"], stats["deleted"]), (12, 12, 12))
+
+    def test_visibility_extended_while_processing(self):
+        processor, client = self.get_processor(self.get_messages(2))
+        client.get_queue_attributes.return_value = {"Attributes": {"VisibilityTimeout": "1"}}
+        with patch.object(processor, "process_sqs_message", side_effect=lambda m: time.sleep(1)):
+            stats = processor.run()
+        self.assertGreater(stats["extended"], 0)
+        # extended from the heartbeat, to the queue's own visibility timeout
+        self.assertEqual(
+            {
+                e["VisibilityTimeout"]
+                for c in client.change_message_visibility_batch.call_args_list
+                for e in c[1]["Entries"]
+            },
+            {1},
+        )
+        self.assertEqual(stats["deleted"], 2)
+
+    def test_visibility_timeout_unknown(self):
+        processor, client = self.get_processor(self.get_messages(1))
+        client.get_queue_attributes.side_effect = ValueError("access denied")
+        with patch.object(processor, "process_sqs_message"):
+            stats = processor.run()
+        self.assertFalse(client.change_message_visibility_batch.called)
+        self.assertEqual(stats["processed"], 1)
+
+    def test_serial_failure_acks_processed(self):
+        processor, client = self.get_processor(self.get_messages(3))
+        with patch.object(
+            processor, "process_sqs_message", side_effect=[None, ValueError("delivery failed")]
+        ):
+            with self.assertRaises(ValueError):
+                processor.run()
+        self.assertEqual(
+            [e["ReceiptHandle"] for e in client.delete_message_batch.call_args[1]["Entries"]],
+            ["rh-0"],
+        )
+
+    def test_parallel_ack_after_processing(self):
+        def process_sqs_message(self, sqs_message):
+            if sqs_message["MessageId"] == "3":
+                raise ValueError("delivery failed")
+
+        processor, client = self.get_processor(self.get_messages(5))
+        with patch.object(
+            sqs_queue_processor.MailerSqsQueueProcessor,
+            "process_sqs_message",
+            process_sqs_message,
+        ):
+            stats = processor.run(parallel=True)
+        deleted = [
+            e["ReceiptHandle"]
+            for c in client.delete_message_batch.call_args_list
+            for e in c[1]["Entries"]
+        ]
+        self.assertEqual(sorted(deleted), ["rh-0", "rh-1", "rh-2", "rh-4"])
+        self.assertEqual((stats["processed"], stats["failed"]), (4, 1))
+
+    def test_run_closes_smtp_pool(self):
+        processor, _ = self.get_processor(self.get_messages(1))
+        pool = processor.smtp_pool = MagicMock()
+        with patch.object(processor, "process_sqs_message"):
+            processor.run()
+        pool.close.assert_called_once_with()
+        self.assertIsNone(processor.smtp_pool)
+
+    def test_rate_limiter_shared_by_workers(self):
+        processor, _ = self.get_processor([])
+        limiter = processor.get_rate_limiter()
+        self.assertIs(processor.get_rate_limiter(), limiter)
+        self.assertAlmostEqual(limiter.interval, 1.0 / 14)
+        with patch.object(sqs_queue_processor, "session_factory"), patch(
+            "multiprocessing.util.Finalize"
+        ) as finalize:
+            sqs_queue_processor.init_worker(
+                sqs_queue_processor.MailerSqsQueueProcessor, MAILER_CONFIG, "c7n_mailer", 2
+            )
+        worker = sqs_queue_processor._worker_processor
+        # each of two workers sends at half the rate
+        self.assertAlmostEqual(worker.get_rate_limiter().interval, 2.0 / 14)
+        self.assertEqual(finalize.call_args[0][1], worker.close_targets)
@@ -368,6 +368,16 @@ class OtherTests(unittest.TestCase):
         env = utils.get_jinja_env(MAILER_CONFIG["templates_folders"])
         self.assertEqual(env.__class__, jinja2.environment.Environment)
 
+    def test_shared_jinja_env(self):
+        folders = [os.path.join(os.path.dirname(__file__), "test-templates")]
+        env = utils.get_shared_jinja_env(folders)
+        self.assertIs(env, utils.get_shared_jinja_env(list(folders)))
+        self.assertEqual(utils.precompile_templates(folders, logging.getLogger("c7n_mailer")), 2)
+        # renders use the precompiled template
+        template = env.get_template("default.j2")
+        with patch.object(env, "compile", side_effect=AssertionError("recompiled")):
+            self.assertIs(env.get_template("default.j2"), template)
+
     def test_get_rendered_jinja(self):
         # Jinja paths must always be forward slashes regardless of operating system
         template_abs_filename = os.path.abspath(
@@ -6,6 +6,8 @@
 import csv
 from collections import Counter
 from datetime import timedelta, datetime
+import hashlib
+import json
 import logging
 import os
 import time
@@ -29,12 +31,18 @@ from c7n.exceptions import InvalidOutputConfig
 from c7n.config import Config
 from c7n.policy import PolicyCollection
 from c7n.provider import get_resource_class, clouds as cloud_providers
-from c7n.reports.csvout import Formatter, fs_record_set, record_set, strip_output_path
+from c7n.reports.csvout import (
+    Formatter, fs_record_set, record_keys, record_set, strip_output_path)
 from c7n.resources import load_available
 from c7n.utils import (
-    CONN_CACHE, dumps, filter_empty, format_string_values, get_policy_provider, join_output_path)
+    dumps, filter_empty, format_string_values, get_policy_provider, join_output_path,
+    jmespath_compile)
 
-from c7n_org.utils import environ, account_tags
+from c7n_org.credentials import CachedSessionFactory, CredentialCache
+from c7n_org.reportcache import ReportCache
+from c7n_org.scheduler import TimingDatabase, plan_units
+from c7n_org.taskqueue import get_queue
+from c7n_org.utils import environ, account_tags, reset_account_sessions
 
 log = logging.getLogger('c7n_org')
 
@@ -49,6 +57,8 @@ if sys.platform == 'darwin' and (
 WORKER_COUNT = int(
     os.environ.get('C7N_ORG_PARALLEL', multiprocessing.cpu_count() * 4))
 
+DEFAULT_CACHE_PATH = "~/.cache/c7n-org"
+
 
 CONFIG_SCHEMA = {
     '$schema': 'http://json-schema.org/draft-07/schema',
@@ -172,8 +182,7 @@ class LogFilter:
         return 0
 
 
-def init(config, use, debug, verbose, accounts, tags, policies,
-        resource=None, policy_tags=(), not_accounts=None):
+def init_logging(verbose):
     level = verbose and logging.DEBUG or logging.INFO
     logging.basicConfig(
         level=level,
@@ -185,17 +194,22 @@ def init(config, use, debug, verbose, accounts, tags, policies,
     logging.getLogger('custodian.s3').setLevel(logging.ERROR)
     logging.getLogger('urllib3').setLevel(logging.WARNING)
 
-    accounts = comma_expand(accounts)
-    policies = comma_expand(policies)
-    tags = comma_expand(tags)
-    policy_tags = comma_expand(policy_tags)
-
     # Filter out custodian log messages on console output if not
     # at warning level or higher, see LogFilter docs and #2674
     for h in logging.getLogger().handlers:
         if isinstance(h, logging.StreamHandler):
             h.addFilter(LogFilter())
 
+
+def init(config, use, debug, verbose, accounts, tags, policies,
+        resource=None, policy_tags=(), not_accounts=None):
+    init_logging(verbose)
+
+    accounts = comma_expand(accounts)
+    policies = comma_expand(policies)
+    tags = comma_expand(tags)
+    policy_tags = comma_expand(policy_tags)
+
     with open(config, 'rb') as fh:
         accounts_config = yaml.safe_load(fh.read())
         jsonschema.validate(accounts_config, CONFIG_SCHEMA)
@@ -249,9 +263,24 @@ def comma_expand(values):
     return list(dict.fromkeys(resolved_values))
 
 
-def get_session(account, session_name, region):
+def get_credential_cache(cache_path, cache_credentials):
+    if not cache_credentials:
+        return None
+    return os.path.join(os.path.expanduser(cache_path or DEFAULT_CACHE_PATH), 'credentials')
+
+
+def get_session(account, session_name, region, credential_cache=None):
     if account.get('provider') != 'aws':
         return None
+    if account.get('role') and credential_cache:
+        try:
+            return CredentialCache(credential_cache).get_session(
+                account['role'], session_name, region, account.get('external_id'))
+        except ClientError as e:
+            log.error(
+                "unable to obtain credentials for account:%s role:%s error:%s",
+                account['name'], account['role'], e)
+            raise
     if account.get('role'):
         roles = account['role']
         if isinstance(roles, str):
@@ -318,7 +347,33 @@ def filter_policies(policies_config, tags, policies, resource, not_policies=None
     policies_config['policies'] = filtered_policies
 
 
-def report_account(account, region, policies_config, output_path, cache_path, debug):
+def uniq_records(records, id_field):
+    """Keep the latest record of each resource, as outputs span executions.
+
+    Records without a resource id are deduplicated by their content.
+    """
+    def latest(r):
+        return r.get('CustodianDate') is not None, r.get('CustodianDate')
+
+    get_id = '.' in id_field and jmespath_compile(id_field).search or (
+        lambda r: r.get(id_field))
+    seen = set()
+    uniq = []
+    for r in sorted(records, key=latest, reverse=True):
+        rid = get_id(r)
+        if rid is None:
+            rid = json.dumps(
+                {k: v for k, v in r.items() if k != 'CustodianDate'},
+                sort_keys=True, default=str)
+        if rid in seen:
+            continue
+        seen.add(rid)
+        uniq.append(r)
+    return uniq
+
+
+def report_account(account, region, policies_config, output_path, cache_path, debug,
+                   credential_cache=None, report_cache=None):
     output_path = os.path.join(output_path, account['name'], region)
     cache_path = os.path.join(cache_path, "%s-%s.cache" % (account['name'], region))
 
@@ -329,13 +384,21 @@ def report_account(account, region, policies_config, output_path, cache_path, de
         account_id=account['account_id'], metrics_enabled=False,
         cache=cache_path, log_group=None, profile=None, external_id=None)
 
-    if account.get('role'):
+    session_factory = None
+    if account.get('role') and credential_cache:
+        session_factory = CachedSessionFactory(
+            region, account, CredentialCache(credential_cache))
+    elif account.get('role'):
         config['assume_role'] = account['role']
         config['external_id'] = account.get('external_id')
     elif account.get('profile'):
         config['profile'] = account['profile']
 
-    policies = PolicyCollection.from_data(policies_config, config)
+    policies = PolicyCollection.from_data(
+        policies_config, config, session_factory=session_factory)
+    manifest, previous = {}, {}
+    if report_cache:
+        previous = ReportCache(report_cache).load(account, region)
     records = []
     for p in policies:
         # initializee policy execution context for output access
@@ -344,18 +407,43 @@ def report_account(account, region, policies_config, output_path, cache_path, de
             "Report policy:%s account:%s region:%s path:%s",
             p.name, account['name'], region, output_path)
 
+        keys = None
         if p.ctx.output.type == "s3":
             delta = timedelta(days=1)
             begin_date = datetime.now() - delta
-
-            policy_records = record_set(
+            keys = record_keys(
                 p.session_factory,
                 p.ctx.output.config['netloc'],
                 strip_output_path(p.ctx.output.config['path'], p.name),
                 begin_date
             )
+            output_state = sorted([k['Key'], k['ETag']] for k in keys)
+        else:
+            record_path = os.path.join(p.ctx.log_dir, 'resources.json')
+            output_state = None
+            if os.path.exists(record_path):
+                st = os.stat(record_path)
+                output_state = [st.st_mtime_ns, st.st_size]
+
+        # records are annotated with the account name and tags, so changes
+        # to those also invalidate the cached records.
+        fingerprint = [
+            p.resource_type, account['name'], list(account.get('tags', ())), output_state]
+        policy_records = ReportCache.get_records(previous, p.name, fingerprint)
+        if policy_records is not None:
+            manifest[p.name] = previous[p.name]
+            records.extend(policy_records)
+            continue
+
+        if keys is not None:
+            policy_records = record_set(
+                p.session_factory,
+                p.ctx.output.config['netloc'],
+                None, None, keys=keys)
         else:
             policy_records = fs_record_set(p.ctx.log_dir, p.name)
+        policy_records = uniq_records(
+            policy_records, p.resource_manager.resource_type.id)
 
         for r in policy_records:
             r['policy'] = p.name
@@ -368,7 +456,11 @@ def report_account(account, region, policies_config, output_path, cache_path, de
                     if k in r:
                         k = 'tag:' + k
                     r[k] = v
+        manifest[p.name] = {'fingerprint': fingerprint, 'records': policy_records}
         records.extend(policy_records)
+
+    if report_cache:
+        ReportCache(report_cache).save(account, region, manifest)
     return records
 
 
@@ -389,10 +481,15 @@ def report_account(account, region, policies_config, output_path, cache_path, de
               multiple=True, default=None, help="Policy tag filter")
 @click.option('--format', default='csv', type=click.Choice(['csv', 'json']))
 @click.option('--resource', default=None)
-@click.option('--cache-path', required=False, type=click.Path(), default="~/.cache/c7n-org")
+@click.option('--cache-path', required=False, type=click.Path(), default=DEFAULT_CACHE_PATH)
+@click.option('--cache-credentials', default=False, is_flag=True,
+              help="Share assumed role credentials across workers and runs via the cache path")
+@click.option('--incremental', default=False, is_flag=True,
+              help="Reuse records of policy outputs unchanged since the last report")
 def report(config, output, use, output_dir, accounts,
            field, no_default_fields, tags, region, debug, verbose,
-           policy, policy_tags, format, resource, cache_path):
+           policy, policy_tags, format, resource, cache_path, cache_credentials,
+           incremental):
     """report on a cross account policy execution."""
     accounts_config, custodian_config, executor = init(
         config, use, debug, verbose, accounts, tags, policy,
@@ -406,42 +503,8 @@ def report(config, output, use, output_dir, accounts,
     elif not len(custodian_config['policies']) > 0:
         raise ValueError("no matching policies found")
 
-    records = []
-    with executor(max_workers=WORKER_COUNT) as w:
-        futures = {}
-        for a in accounts_config.get('accounts', ()):
-            for r in resolve_regions(region or a.get('regions', ()), a):
-                futures[w.submit(
-                    report_account,
-                    a, r,
-                    custodian_config,
-                    output_dir,
-                    cache_path,
-                    debug)] = (a, r)
-
-        for f in as_completed(futures):
-            a, r = futures[f]
-            if f.exception():
-                if debug:
-                    raise
-                log.warning(
-                    "Error running policy in %s @ %s exception: %s",
-                    a['name'], r, f.exception())
-            records.extend(f.result())
-
-    log.debug(
-        "Found %d records across %d accounts and %d policies",
-        len(records), len(accounts_config['accounts']),
-        len(custodian_config['policies']))
-
-    if format == 'json':
-        dumps(records, output, indent=2)
-        return
-
     prefix_fields = OrderedDict(
         (('Account', 'account'), ('Region', 'region'), ('Policy', 'policy')))
-    config = Config.empty()
-
     factory = get_resource_class(list(resource_types)[0])
     formatter = Formatter(
         factory.resource_type,
@@ -451,10 +514,62 @@ def report(config, output, use, output_dir, accounts,
         include_policy=False,
         fields=prefix_fields)
 
-    rows = formatter.to_csv(records, unique=False)
-    writer = csv.writer(output, formatter.headers(), quoting=csv.QUOTE_ALL)
-    writer.writerow(formatter.headers())
-    writer.writerows(rows)
+    if format == 'json':
+        output.write('[')
+    else:
+        writer = csv.writer(output, formatter.headers(), quoting=csv.QUOTE_ALL)
+        writer.writerow(formatter.headers())
+
+    record_count = 0
+    credential_cache = get_credential_cache(cache_path, cache_credentials)
+    report_cache = None
+    if incremental:
+        report_cache = os.path.join(
+            os.path.expanduser(cache_path or DEFAULT_CACHE_PATH), 'reports')
+    try:
+        with executor(max_workers=WORKER_COUNT) as w:
+            futures = {}
+            for a in accounts_config.get('accounts', ()):
+                for r in resolve_regions(region or a.get('regions', ()), a):
+                    futures[w.submit(
+                        report_account,
+                        a, r,
+                        custodian_config,
+                        output_dir,
+                        cache_path,
+                        debug,
+                        credential_cache=credential_cache,
+                        report_cache=report_cache)] = (a, r)
+
+            # write out records as each account region completes, rather
+            # than holding the whole organization's records in memory.
+            for f in as_completed(futures):
+                a, r = futures[f]
+                if f.exception():
+                    if debug:
+                        raise
+                    log.warning(
+                        "Error running policy in %s @ %s exception: %s",
+                        a['name'], r, f.exception())
+                    continue
+                records = f.result()
+                if format == 'json':
+                    for record in records:
+                        output.write(record_count and ',\n' or '\n')
+                        output.write(dumps(record, indent=2))
+                        record_count += 1
+                else:
+                    writer.writerows(formatter.to_csv(records, unique=False))
+                    record_count += len(records)
+    finally:
+        # keep the json output well formed, even when a worker errored
+        if format == 'json':
+            output.write('\n]\n')
+
+    log.debug(
+        "Found %d records across %d accounts and %d policies",
+        record_count, len(accounts_config['accounts']),
+        len(custodian_config['policies']))
 
 
 def _get_env_creds(account, session, region, env=None):
@@ -477,10 +592,11 @@ def _get_env_creds(account, session, region, env=None):
     return filter_empty(env)
 
 
-def run_account_script(account, region, output_dir, debug, script_args):
+def run_account_script(account, region, output_dir, debug, script_args,
+                       credential_cache=None):
 
     try:
-        session = get_session(account, "org-script", region)
+        session = get_session(account, "org-script", region, credential_cache)
     except ClientError:
         return 1
 
@@ -514,8 +630,12 @@ def run_account_script(account, region, output_dir, debug, script_args):
 @click.option('-r', '--region', default=None, multiple=True)
 @click.option('--echo', default=False, is_flag=True)
 @click.option('--serial', default=False, is_flag=True)
+@click.option('--cache-path', required=False, type=click.Path(), default=DEFAULT_CACHE_PATH)
+@click.option('--cache-credentials', default=False, is_flag=True,
+              help="Share assumed role credentials across workers and runs via the cache path")
 @click.argument('script_args', nargs=-1, type=click.UNPROCESSED)
-def run_script(config, output_dir, accounts, tags, region, echo, serial, script_args):
+def run_script(config, output_dir, accounts, tags, region, echo, serial,
+               cache_path, cache_credentials, script_args):
     """run an aws/azure/gcp script across accounts"""
     # TODO count up on success / error / error list by account
     accounts_config, _, executor = init(
@@ -533,13 +653,15 @@ def run_script(config, output_dir, accounts, tags, region, echo, serial, script_
     if "://" in output_dir:
         raise InvalidOutputConfig('run-script only supports local directory outputs')
 
+    credential_cache = get_credential_cache(cache_path, cache_credentials)
     with executor(max_workers=WORKER_COUNT) as w:
         futures = {}
         for a in accounts_config.get('accounts', ()):
             for r in resolve_regions(region or a.get('regions', ()), a):
                 futures[
                     w.submit(run_account_script, a, r, output_dir,
-                             serial, script_args)] = (a, r)
+                             serial, script_args,
+                             credential_cache=credential_cache)] = (a, r)
         for f in as_completed(futures):
             a, r = futures[f]
             if f.exception():
@@ -610,17 +732,24 @@ def _update(old, new):
 
 
 def run_account(account, region, policies_config, output_path,
-                cache_period, cache_path, metrics, dryrun, debug):
+                cache_period, cache_path, metrics, dryrun, debug, timings=None,
+                credential_cache=None, unit=None):
     """Execute a set of policies on an account.
+
+    If a timings dict is given, it's populated with each policy's duration.
+    A policy group unit gets its own resource cache file, as units of an
+    account region may run concurrently.
     """
     logging.getLogger('custodian.output').setLevel(logging.ERROR + 1)
-    CONN_CACHE.session = None
-    CONN_CACHE.time = None
+    reset_account_sessions(account)
     load_available()
 
     output_path = join_output_path(output_path, account['name'], region)
 
-    cache_path = os.path.join(cache_path, "%s-%s.cache" % (account['account_id'], region))
+    cache_name = "%s-%s" % (account['account_id'], region)
+    if unit:
+        cache_name = "%s-%s" % (cache_name, unit)
+    cache_path = os.path.join(cache_path, "%s.cache" % cache_name)
 
     config = Config.empty(
         region=region, cache=cache_path,
@@ -629,8 +758,12 @@ def run_account(account, region, policies_config, output_path,
         log_group=None, profile=None, external_id=None)
 
     env_vars = account_tags(account)
+    session_factory = None
 
-    if account.get('role'):
+    if account.get('role') and credential_cache:
+        session_factory = CachedSessionFactory(
+            region, account, CredentialCache(credential_cache))
+    elif account.get('role'):
         if isinstance(account['role'], str):
             config['assume_role'] = account['role']
             config['external_id'] = account.get('external_id')
@@ -644,7 +777,8 @@ def run_account(account, region, policies_config, output_path,
     if account.get("oci_compartments"):
         env_vars.update({"OCI_COMPARTMENTS": account.get("oci_compartments")})
 
-    policies = PolicyCollection.from_data(policies_config, config)
+    policies = PolicyCollection.from_data(
+        policies_config, config, session_factory=session_factory)
     policy_counts = {}
     success = True
     st = time.time()
@@ -659,6 +793,7 @@ def run_account(account, region, policies_config, output_path,
             log.debug(
                 "Running policy:%s account:%s region:%s",
                 p.name, account['name'], region)
+            pst = time.time()
             try:
                 resources = p.run()
                 policy_counts[p.name] = resources and len(resources) or 0
@@ -693,10 +828,81 @@ def run_account(account, region, policies_config, output_path,
                 traceback.print_exc()
                 pdb.post_mortem(sys.exc_info()[-1])
                 raise
+            finally:
+                if timings is not None:
+                    timings[p.name] = time.time() - pst
 
     return policy_counts, success
 
 
+def run_account_unit(account, region, policies_config, output_path,
+                     cache_period, cache_path, metrics, dryrun, debug,
+                     credential_cache=None):
+    """Execute a policy group unit on an account, returning policy durations."""
+    timings = {}
+    unit = hashlib.sha256(",".join(sorted(
+        p['name'] for p in policies_config['policies'])).encode('utf8')).hexdigest()[:12]
+    policy_counts, success = run_account(
+        account, region, policies_config, output_path,
+        cache_period, cache_path, metrics, dryrun, debug, timings=timings,
+        credential_cache=credential_cache, unit=unit)
+    return policy_counts, success, timings
+
+
+def run_queued_unit(payload, credential_cache=None):
+    """Run a unit claimed from a run queue."""
+    options = payload['options']
+    args = (payload['account'], payload['region'], payload['policies_config'],
+            options['output_dir'], options['cache_period'], options['cache_path'],
+            options['metrics'], options['dryrun'], options['debug'])
+    if options['policy_group_size']:
+        return run_account_unit(*args, credential_cache=credential_cache)
+    return run_account(*args, credential_cache=credential_cache) + (None,)
+
+
+def run_queue_worker(queue):
+    """Run units claimed from a run queue until none are pending.
+
+    Returns the number of units run.
+    """
+    task_queue = get_queue(queue)
+    count = 0
+    try:
+        while True:
+            task = task_queue.claim()
+            if task is None:
+                return count
+            task_id, payload = task
+            count += 1
+            try:
+                task_queue.complete(task_id, *run_queued_unit(
+                    payload, credential_cache=payload['options']['credential_cache']))
+            except Exception as e:
+                task_queue.fail(task_id, e)
+                if payload['options']['debug']:
+                    raise
+                log.warning(
+                    "Error running policy in %s @ %s exception: %s",
+                    payload['account']['name'], payload['region'], e)
+    finally:
+        task_queue.close()
+
+
+def run_queue_workers(executor, queue, debug, count):
+    """Consume a run queue with local worker processes, returning units run."""
+    units = 0
+    with executor(max_workers=count) as w:
+        futures = [w.submit(run_queue_worker, queue) for _ in range(count)]
+        for f in as_completed(futures):
+            if f.exception():
+                if debug:
+                    raise f.exception()
+                log.warning("Error in queue worker exception: %s", f.exception())
+                continue
+            units += f.result()
+    return units
+
+
 def initialize_provider_output(policies_config, output_dir, regions):
     """allow the provider an opportunity to initialize the output config.
     """
@@ -737,12 +943,25 @@ def initialize_provider_output(policies_config, output_dir, regions):
 @click.option("--metrics", default=False, is_flag=True)
 @click.option("--metrics-uri", default=None, help="Configure provider metrics target")
 @click.option("--dryrun", default=False, is_flag=True)
+@click.option('--cache-credentials', default=False, is_flag=True,
+              help="Share assumed role credentials across workers and runs via the cache path")
+@click.option('--policy-group-size', default=0, type=int,
+              help="Split account regions into units of this many policies, "
+              "scheduled longest first using durations from previous runs")
+@click.option('--queue', default=None,
+              help="Sqlite file or redis url of a queue to run units through, "
+              "units are checkpointed and may be run by workers on other hosts")
+@click.option('--resume', default=False, is_flag=True,
+              help="Only run units not completed by a previous run with the same queue")
 @click.option('--debug', default=False, is_flag=True)
 @click.option('-v', '--verbose', default=False, help="Verbose", is_flag=True)
 def run(config, use, output_dir, accounts, not_accounts, tags, region,
         policy, policy_tags, cache_period, cache_path, metrics,
-        dryrun, debug, verbose, metrics_uri):
+        dryrun, cache_credentials, policy_group_size, queue, resume,
+        debug, verbose, metrics_uri):
     """run a custodian policy across accounts"""
+    if resume and not queue:
+        raise click.UsageError("--resume requires --queue")
     accounts_config, custodian_config, executor = init(
         config, use, debug, verbose, accounts, tags, policy, policy_tags=policy_tags,
         not_accounts=not_accounts)
@@ -760,49 +979,119 @@ def run(config, use, output_dir, accounts, not_accounts, tags, region,
         metrics = metrics_uri
 
     if not cache_path:
-        cache_path = os.path.expanduser("~/.cache/c7n-org")
+        cache_path = os.path.expanduser(DEFAULT_CACHE_PATH)
         if not os.path.exists(cache_path):
             os.makedirs(cache_path)
+    credential_cache = get_credential_cache(cache_path, cache_credentials)
 
     output_dir = initialize_provider_output(custodian_config, output_dir, region)
 
-    with executor(max_workers=WORKER_COUNT) as w:
-        futures = {}
-        for a in accounts_config['accounts']:
-            for r in resolve_regions(region or a.get('regions', ()), a):
-                futures[w.submit(
-                    run_account,
-                    a, r,
-                    custodian_config,
-                    output_dir,
-                    cache_period,
-                    cache_path,
-                    metrics,
-                    dryrun,
-                    debug)] = (a, r)
+    timings = None
+    if policy_group_size:
+        timings = TimingDatabase(os.path.join(cache_path, TimingDatabase.file_name)).load()
+        units = [(run_account_unit, a, r, unit_config) for _, a, r, unit_config in plan_units(
+            [(a, r) for a in accounts_config['accounts']
+             for r in resolve_regions(region or a.get('regions', ()), a)],
+            custodian_config, policy_group_size, timings)]
+    else:
+        units = [(run_account, a, r, custodian_config) for a in accounts_config['accounts']
+                 for r in resolve_regions(region or a.get('regions', ()), a)]
 
-        for f in as_completed(futures):
-            a, r = futures[f]
-            if f.exception():
-                if debug:
-                    raise
-                log.warning(
-                    "Error running policy in %s @ %s exception: %s",
-                    a['name'], r, f.exception())
-                continue
+    st = time.time()
+    if queue:
+        task_queue = get_queue(queue)
+        pending = task_queue.enqueue(
+            [(a, r, unit_config) for _, a, r, unit_config in units], resume,
+            options=dict(
+                output_dir=output_dir, cache_period=cache_period, cache_path=cache_path,
+                metrics=metrics, dryrun=dryrun, debug=debug,
+                policy_group_size=policy_group_size, credential_cache=credential_cache))
+        if len(pending) != len(units):
+            log.info("Resuming run, skipping %d completed units",
+                     len(units) - len(pending))
+        # local workers, and any started on other hosts with `c7n-org worker`,
+        # claim units from the queue till it's drained.
+        if pending:
+            run_queue_workers(executor, queue, debug, min(len(pending), WORKER_COUNT))
+        task_queue.wait(log=log)
+        counts, _ = task_queue.status()
+        success = not counts['failed']
+        for payload, account_region_pcounts, unit_timings in task_queue.results():
+            policy_counts.update(account_region_pcounts)
+            if timings is not None and unit_timings:
+                timings.record(payload['account'], payload['region'], unit_timings)
+        task_queue.close()
+        units_run = len(pending)
+    else:
+        with executor(max_workers=WORKER_COUNT) as w:
+            futures = {}
+            # idle workers pick up the next unit from the executor queue
+            for func, a, r, unit_config in units:
+                futures[w.submit(
+                    func, a, r, unit_config, output_dir, cache_period, cache_path,
+                    metrics, dryrun, debug, credential_cache=credential_cache)] = (a, r)
+
+            for f in as_completed(futures):
+                a, r = futures[f]
+                if f.exception():
+                    if debug:
+                        raise
+                    log.warning(
+                        "Error running policy in %s @ %s exception: %s",
+                        a['name'], r, f.exception())
+                    continue
 
-            account_region_pcounts, account_region_success = f.result()
-            for p in account_region_pcounts:
-                policy_counts[p] += account_region_pcounts[p]
+                account_region_pcounts, account_region_success = f.result()[:2]
+                if timings is not None:
+                    timings.record(a, r, f.result()[2])
+                for p in account_region_pcounts:
+                    policy_counts[p] += account_region_pcounts[p]
 
-            if not account_region_success:
-                success = False
+                if not account_region_success:
+                    success = False
+        units_run = len(units)
 
     log.info("Policy resource counts %s" % policy_counts)
 
+    if timings is not None:
+        timings.save()
+        log.info("Ran %d units with %d workers makespan:%0.2f",
+                 units_run, WORKER_COUNT, time.time() - st)
+
     if not success:
         sys.exit(1)
 
 
+@cli.command()
+@click.option('--queue', required=True, help="Sqlite file or redis url of a run queue")
+@click.option('-w', '--workers', default=WORKER_COUNT, type=int,
+              help="Number of worker processes")
+@click.option('--debug', default=False, is_flag=True)
+@click.option('-v', '--verbose', default=False, help="Verbose", is_flag=True)
+def worker(queue, workers, debug, verbose):
+    """run the pending units of a queued run, eg. from another host"""
+    init_logging(verbose)
+    load_available()
+    MainThreadExecutor.c7n_async = False
+    executor = debug and MainThreadExecutor or ProcessPoolExecutor
+    units = run_queue_workers(executor, queue, debug, workers)
+    log.info("Ran %d queued units", units)
+
+
+@cli.command()
+@click.option('--queue', required=True, help="Sqlite file or redis url of a run queue")
+def status(queue):
+    """summarize the units of a queued run"""
+    if '://' not in queue and not os.path.exists(queue):
+        raise click.UsageError("queue %s does not exist" % queue)
+    task_queue = get_queue(queue)
+    counts, failed = task_queue.status()
+    task_queue.close()
+    click.echo(" ".join("%s:%d" % (state, count) for state, count in counts.items()))
+    for t in failed:
+        click.echo("failed %s @ %s policies:%s %s" % (
+            t['account'], t['region'], ",".join(t['policies']), t['error'] or ''))
+
+
 if __name__ == "__main__":
     cli()
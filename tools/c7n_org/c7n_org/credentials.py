@@ -0,0 +1,146 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+"""Share assumed role credentials across c7n-org workers, regions and runs.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import hashlib
+import json
+import logging
+import os
+
+from boto3 import Session
+from botocore.credentials import RefreshableCredentials
+from botocore.session import get_session
+from dateutil.parser import parse as parse_date
+from dateutil.tz import tzutc
+
+from c7n.credentials import SessionFactory, get_sts_client
+from c7n.utils import get_retry
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+log = logging.getLogger('c7n_org.credentials')
+
+
+class CredentialCache:
+    """On disk cache of assumed role credentials.
+
+    Credentials are keyed by role chain, so they're shared across
+    the regions of an account, by concurrent workers, and by
+    consecutive c7n-org commands using the same cache directory.
+    Credentials within `refresh_window` of expiry are refreshed,
+    with a file lock so only one worker assumes the role.
+    """
+
+    # botocore starts refreshing credentials 15m before expiry, so hand
+    # out credentials with more time left than that.
+    refresh_window = timedelta(minutes=20)
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self.retry = get_retry(('Throttling',))
+
+    def get_path(self, roles, session_name, external_id):
+        key = hashlib.sha256(
+            json.dumps([roles, session_name, external_id]).encode('utf8')).hexdigest()
+        return os.path.join(self.path, "%s.json" % key)
+
+    @contextmanager
+    def lock(self, path):
+        if fcntl is None:  # pragma: no cover
+            yield
+            return
+        with open("%s.lock" % path, 'w') as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def read(self, path):
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as fh:
+                credentials = json.load(fh)
+        except ValueError:
+            return None
+        expiry = parse_date(credentials['expiry_time'])
+        if expiry - datetime.now(tzutc()) < self.refresh_window:
+            return None
+        return credentials
+
+    def write(self, path, credentials):
+        tmp_path = "%s.tmp" % path
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(credentials, fh)
+        os.replace(tmp_path, path)
+
+    def assume(self, roles, session_name, region, external_id):
+        session = Session()
+        for role in roles:
+            parameters = {'RoleArn': role, 'RoleSessionName': session_name}
+            if external_id is not None:
+                parameters['ExternalId'] = external_id
+            credentials = self.retry(
+                get_sts_client(session, region).assume_role, **parameters)['Credentials']
+            session = Session(
+                aws_access_key_id=credentials['AccessKeyId'],
+                aws_secret_access_key=credentials['SecretAccessKey'],
+                aws_session_token=credentials['SessionToken'])
+        return dict(
+            access_key=credentials['AccessKeyId'],
+            secret_key=credentials['SecretAccessKey'],
+            token=credentials['SessionToken'],
+            expiry_time=credentials['Expiration'].isoformat())
+
+    def get_credentials(self, roles, session_name, region=None, external_id=None):
+        if isinstance(roles, str):
+            roles = [roles]
+        os.makedirs(self.path, exist_ok=True)
+        path = self.get_path(roles, session_name, external_id)
+        credentials = self.read(path)
+        if credentials is not None:
+            return credentials
+        with self.lock(path):
+            # another worker may have refreshed while we waited on the lock
+            credentials = self.read(path)
+            if credentials is None:
+                log.debug("assuming role chain %s", " -> ".join(roles))
+                credentials = self.assume(roles, session_name, region, external_id)
+                self.write(path, credentials)
+        return credentials
+
+    def get_session(self, roles, session_name, region=None, external_id=None):
+        def refresh():
+            return self.get_credentials(roles, session_name, region, external_id)
+
+        s = get_session()
+        s._credentials = RefreshableCredentials.create_from_metadata(
+            metadata=refresh(),
+            refresh_using=refresh,
+            method='sts-assume-role')
+        s.set_config_variable('region', region or 'us-east-1')
+        return Session(botocore_session=s)
+
+
+class CachedSessionFactory(SessionFactory):
+    """Policy session factory using credentials from a credential cache."""
+
+    def __init__(self, region, account, credential_cache, session_name='CloudCustodian'):
+        super().__init__(region)
+        self.account = account
+        self.credential_cache = credential_cache
+        self.session_name = session_name
+
+    def __call__(self, assume=True, region=None):
+        if not assume:
+            return super().__call__(assume, region)
+        return self.update(self.credential_cache.get_session(
+            self.account['role'], self.session_name, region or self.region,
+            self.account.get('external_id')))
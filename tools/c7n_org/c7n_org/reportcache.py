@@ -0,0 +1,55 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+"""Cache account region report records, along with a manifest of the
+policy outputs they were read from, so unchanged outputs aren't re-read.
+"""
+import json
+import logging
+import os
+
+from dateutil.parser import parse as parse_date
+
+from c7n.utils import dumps
+
+log = logging.getLogger('c7n_org.reportcache')
+
+
+class ReportCache:
+    """Per account region records keyed by policy, with output fingerprints."""
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+
+    def get_path(self, account, region):
+        return os.path.join(self.path, "%s-%s.json" % (account['account_id'], region))
+
+    def load(self, account, region):
+        path = self.get_path(account, region)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path) as fh:
+                return json.load(fh)
+        except ValueError:
+            log.warning("ignoring unreadable report cache %s", path)
+            return {}
+
+    def save(self, account, region, manifest):
+        os.makedirs(self.path, exist_ok=True)
+        path = self.get_path(account, region)
+        tmp_path = "%s.tmp" % path
+        with open(tmp_path, 'w') as fh:
+            dumps(manifest, fh)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def get_records(manifest, policy_name, fingerprint):
+        """Return the cached records of a policy if its outputs are unchanged."""
+        entry = manifest.get(policy_name)
+        if not entry or entry['fingerprint'] != fingerprint:
+            return None
+        records = entry['records']
+        for r in records:
+            if 'CustodianDate' in r:
+                r['CustodianDate'] = parse_date(r['CustodianDate'])
+        return records
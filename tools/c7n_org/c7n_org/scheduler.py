@@ -0,0 +1,70 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+"""Split account region execution into policy group units, ordered by
+historical duration so the longest units start first.
+"""
+import json
+import logging
+import os
+
+from c7n.utils import chunks
+
+log = logging.getLogger('c7n_org.scheduler')
+
+
+class TimingDatabase:
+    """Persisted policy execution durations by account and region."""
+
+    file_name = 'c7n-org-timings.json'
+    default_duration = 1.0
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {}
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return self
+        try:
+            with open(self.path) as fh:
+                self.data = json.load(fh)
+        except ValueError:
+            log.warning("ignoring unreadable timing database %s", self.path)
+        return self
+
+    def save(self):
+        tmp_path = "%s.tmp" % self.path
+        with open(tmp_path, 'w') as fh:
+            json.dump(self.data, fh, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def get_key(account, region, policy_name):
+        return "%s/%s/%s" % (account['account_id'], region, policy_name)
+
+    def record(self, account, region, timings):
+        for policy_name, duration in timings.items():
+            self.data[self.get_key(account, region, policy_name)] = round(duration, 3)
+
+    def estimate(self, account, region, policies):
+        # policies without history are assumed to be of average duration
+        default = self.data and (
+            sum(self.data.values()) / len(self.data)) or self.default_duration
+        return sum(
+            self.data.get(self.get_key(account, region, p['name']), default)
+            for p in policies)
+
+
+def plan_units(account_regions, policies_config, group_size, timings):
+    """Split account regions into units of policy groups, largest first.
+
+    Returns a list of (estimate, account, region, policies_config).
+    """
+    units = []
+    for account, region in account_regions:
+        for group in chunks(policies_config['policies'], group_size):
+            units.append((
+                timings.estimate(account, region, group), account, region,
+                dict(policies_config, policies=group)))
+    units.sort(key=lambda u: u[0], reverse=True)
+    return units
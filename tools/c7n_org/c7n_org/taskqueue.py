@@ -0,0 +1,271 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+"""Durable queues of c7n-org run units, consumed by workers on one or
+more hosts and checkpointing completed units so an interrupted run can
+be resumed.
+
+A queue is either a sqlite file, for workers sharing a host or file
+system, or a redis url, eg. redis://host:6379/0, for workers on other
+hosts. Using redis requires the redis package, and a redis database
+holds a single run's queue.
+"""
+from collections import Counter
+import contextlib
+import json
+import os
+import sqlite3
+import time
+
+
+def get_queue(url):
+    """Open a run queue by sqlite file path or redis url."""
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisTaskQueue(url)
+    return TaskQueue(url)
+
+
+class BaseTaskQueue:
+
+    states = ('pending', 'running', 'done', 'failed')
+
+    @staticmethod
+    def get_task_id(account, region, policies_config):
+        return "%s/%s/%s" % (
+            account['account_id'], region,
+            ",".join(sorted(p['name'] for p in policies_config['policies'])))
+
+    @staticmethod
+    def get_payload(account, region, policies_config, options):
+        return json.dumps({
+            'account': account, 'region': region,
+            'policies_config': policies_config, 'options': options or {}})
+
+    def close(self):
+        pass
+
+    def get_policy_counts(self):
+        """Sum the policy resource counts of units which ran."""
+        counts = Counter()
+        for _, policy_counts, _ in self.results():
+            counts.update(policy_counts)
+        return counts
+
+    def wait(self, interval=5, log=None):
+        """Wait for running units, eg. on other hosts, to finish."""
+        while True:
+            counts, _ = self.status()
+            if not counts['running']:
+                return
+            if log:
+                log.info("Waiting on %d running units", counts['running'])
+            time.sleep(interval)
+
+
+class TaskQueue(BaseTaskQueue):
+
+    create_table = """
+    create table if not exists tasks (
+        id text primary key,
+        account text,
+        region text,
+        policies text,
+        payload text,
+        state text,
+        attempts integer default 0,
+        result text,
+        timings text,
+        error text,
+        updated real
+    )
+    """
+
+    timeout = 30
+
+    def __init__(self, path):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        # workers update the queue concurrently as they claim units
+        self.conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        self.conn.execute(self.create_table)
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, units, resume=False, options=None):
+        """Record the units of a run, returning the ids of those left to run.
+
+        On resume, units already done are kept and skipped, anything
+        else is run again. Otherwise the queue starts afresh.
+        """
+        task_ids = []
+        with self.transaction():
+            if not resume:
+                self.conn.execute('delete from tasks')
+            for account, region, policies_config in units:
+                task_id = self.get_task_id(account, region, policies_config)
+                task_ids.append(task_id)
+                payload = self.get_payload(account, region, policies_config, options)
+                self.conn.execute(
+                    'insert or ignore into tasks'
+                    ' (id, account, region, policies, payload, state, updated)'
+                    ' values (?, ?, ?, ?, ?, ?, ?)',
+                    (task_id, account['name'], region,
+                     json.dumps([p['name'] for p in policies_config['policies']]),
+                     payload, 'pending', time.time()))
+                # run options may differ from those of the run being resumed
+                self.conn.execute(
+                    'update tasks set payload = ? where id = ?', (payload, task_id))
+            # drop units from previous runs no longer targeted
+            stale = {r[0] for r in self.conn.execute('select id from tasks')}.difference(
+                task_ids)
+            self.conn.executemany('delete from tasks where id = ?', [(t,) for t in stale])
+            self.conn.execute(
+                "update tasks set state = 'pending' where state != 'done'")
+        done = {r[0] for r in self.conn.execute("select id from tasks where state = 'done'")}
+        return [t for t in task_ids if t not in done]
+
+    @contextlib.contextmanager
+    def transaction(self):
+        # serialize writers, so a unit is only claimed by one worker
+        self.conn.execute('begin immediate')
+        try:
+            yield
+        except Exception:
+            self.conn.execute('rollback')
+            raise
+        self.conn.execute('commit')
+
+    def claim(self):
+        """Claim the next pending unit, returning its id and payload."""
+        with self.transaction():
+            row = self.conn.execute(
+                "select id, payload from tasks where state = 'pending'"
+                " order by rowid limit 1").fetchone()
+            if row is None:
+                return None
+            self.start(row[0])
+        return row[0], json.loads(row[1])
+
+    def start(self, task_id):
+        self.conn.execute(
+            "update tasks set state = 'running', attempts = attempts + 1,"
+            " updated = ? where id = ?", (time.time(), task_id))
+
+    def complete(self, task_id, policy_counts, success, timings=None):
+        self.conn.execute(
+            "update tasks set state = ?, result = ?, timings = ?, error = null, updated = ?"
+            " where id = ?",
+            (success and 'done' or 'failed', json.dumps(policy_counts),
+             timings is not None and json.dumps(timings) or None,
+             time.time(), task_id))
+
+    def fail(self, task_id, error):
+        self.conn.execute(
+            "update tasks set state = 'failed', error = ?, updated = ? where id = ?",
+            (str(error), time.time(), task_id))
+
+    def results(self):
+        """Yield the payload, policy counts and timings of units which ran."""
+        for payload, result, timings in self.conn.execute(
+                'select payload, result, timings from tasks'
+                ' where result is not null order by rowid').fetchall():
+            yield json.loads(payload), json.loads(result), timings and json.loads(timings)
+
+    def status(self):
+        """Summarize task counts by state, and list failed tasks."""
+        counts = dict.fromkeys(self.states, 0)
+        counts.update(self.conn.execute(
+            'select state, count(*) from tasks group by state').fetchall())
+        failed = [
+            {'account': account, 'region': region,
+             'policies': json.loads(policies), 'error': error}
+            for account, region, policies, error in self.conn.execute(
+                "select account, region, policies, error from tasks"
+                " where state = 'failed' order by id")]
+        return counts, failed
+
+
+class RedisTaskQueue(BaseTaskQueue):
+    """A run queue in redis, tasks are kept as json in a hash, with a
+    list of pending task ids for workers to pop.
+    """
+
+    prefix = 'c7n-org'
+
+    def __init__(self, url, connection=None):
+        self.path = url
+        if connection is None:
+            import redis
+            connection = redis.Redis.from_url(url)
+        self.conn = connection
+        self.tasks_key = '%s:tasks' % self.prefix
+        self.pending_key = '%s:pending' % self.prefix
+
+    def close(self):
+        self.conn.close()
+
+    def get_tasks(self):
+        return {
+            k.decode('utf8'): json.loads(v) for k, v in self.conn.hgetall(self.tasks_key).items()}
+
+    def get_task(self, task_id):
+        return json.loads(self.conn.hget(self.tasks_key, task_id))
+
+    def save_task(self, task_id, task, **updates):
+        task.update(updates, updated=time.time())
+        self.conn.hset(self.tasks_key, task_id, json.dumps(task))
+
+    def enqueue(self, units, resume=False, options=None):
+        tasks = resume and self.get_tasks() or {}
+        queued = {}
+        for account, region, policies_config in units:
+            task_id = self.get_task_id(account, region, policies_config)
+            task = queued[task_id] = tasks.get(task_id) or {
+                'account': account['name'], 'region': region,
+                'policies': [p['name'] for p in policies_config['policies']],
+                'attempts': 0, 'result': None, 'timings': None, 'error': None}
+            task['payload'] = json.loads(
+                self.get_payload(account, region, policies_config, options))
+            if task.get('state') != 'done':
+                task['state'] = 'pending'
+            task['updated'] = time.time()
+
+        pending = [t for t, task in queued.items() if task['state'] == 'pending']
+        pipe = self.conn.pipeline()
+        pipe.delete(self.tasks_key, self.pending_key)
+        if queued:
+            pipe.hset(self.tasks_key, mapping={t: json.dumps(v) for t, v in queued.items()})
+        if pending:
+            pipe.rpush(self.pending_key, *pending)
+        pipe.execute()
+        return pending
+
+    def claim(self):
+        task_id = self.conn.lpop(self.pending_key)
+        if task_id is None:
+            return None
+        task_id = task_id.decode('utf8')
+        task = self.get_task(task_id)
+        self.save_task(task_id, task, state='running', attempts=task['attempts'] + 1)
+        return task_id, task['payload']
+
+    def complete(self, task_id, policy_counts, success, timings=None):
+        self.save_task(
+            task_id, self.get_task(task_id), state=success and 'done' or 'failed',
+            result=policy_counts, timings=timings, error=None)
+
+    def fail(self, task_id, error):
+        self.save_task(task_id, self.get_task(task_id), state='failed', error=str(error))
+
+    def results(self):
+        for task in self.get_tasks().values():
+            if task['result'] is not None:
+                yield task['payload'], task['result'], task['timings']
+
+    def status(self):
+        tasks = self.get_tasks()
+        counts = dict.fromkeys(self.states, 0)
+        counts.update(Counter(t['state'] for t in tasks.values()))
+        failed = [
+            {k: tasks[t][k] for k in ('account', 'region', 'policies', 'error')}
+            for t in sorted(tasks) if tasks[t]['state'] == 'failed']
+        return counts, failed
@@ -1,9 +1,12 @@
 # Copyright The Cloud Custodian Authors.
 # SPDX-License-Identifier: Apache-2.0
 import os
+import threading
 from c7n.utils import reset_session_cache
 from contextlib import contextmanager
 
+SESSION_ACCOUNT = threading.local()
+
 
 def account_tags(account):
     tags = {'AccountName': account['name'], 'AccountId': account['account_id']}
@@ -28,4 +31,17 @@ def environ(**kw):
         for k in kw.keys():
             del os.environ[k]
         os.environ.update(current_env)
-        reset_session_cache()
+
+
+def reset_account_sessions(account):
+    """Reset the thread's session cache, unless it holds the account's sessions.
+
+    Consecutive runs on the same account, ie. its policy group units, reuse
+    the cached sessions rather than assuming the account's role again.
+    """
+    key = (account.get('account_id'), str(account.get('role')),
+           account.get('external_id'), account.get('profile'))
+    if getattr(SESSION_ACCOUNT, 'key', None) == key:
+        return
+    reset_session_cache()
+    SESSION_ACCOUNT.key = key
@@ -1,16 +1,23 @@
 # Copyright The Cloud Custodian Authors.
 # SPDX-License-Identifier: Apache-2.0
 import copy
+from datetime import datetime, timedelta
+import json
 from unittest import mock
 import os
 
+from dateutil.tz import tzutc
 import pytest
 import yaml
 
 from c7n.testing import TestUtils
+from c7n.utils import local_session
 from click.testing import CliRunner
 
-from c7n_org import cli as org
+from c7n_org import cli as org, credentials
+from c7n_org.scheduler import TimingDatabase, plan_units
+from c7n_org.taskqueue import RedisTaskQueue, TaskQueue
+from c7n_org.utils import reset_account_sessions
 
 
 ACCOUNTS_AWS_DEFAULT = yaml.safe_dump({
@@ -184,6 +191,244 @@ class OrgTest(TestUtils):
             log_output.getvalue().strip(),
             "Policy resource counts Counter({'compute': 96, 'serverless': 48})")
 
+    def test_cli_run_policy_groups(self):
+        run_dir = self.setup_run_dir()
+        self.change_cwd(run_dir)
+        timing_path = os.path.join(run_dir, 'cache', TimingDatabase.file_name)
+        history = {
+            '%s/%s/%s' % (a, r, p): 1.0
+            for a in ('112233445566', '002244668899')
+            for r in ('us-east-1', 'us-west-2')
+            for p in ('compute', 'serverless')}
+        history['112233445566/us-west-2/serverless'] = 90.0
+        with open(timing_path, 'w') as fh:
+            json.dump(history, fh)
+
+        def run_account(a, r, policies_config, *args, timings=None, **kw):
+            for p in policies_config['policies']:
+                timings[p['name']] = 2.0
+            return {p['name']: 1 for p in policies_config['policies']}, True
+
+        run_account = mock.MagicMock(side_effect=run_account)
+        self.patch(org, 'run_account', run_account)
+        log_output = self.capture_logging('c7n_org')
+        runner = CliRunner()
+        result = runner.invoke(
+            org.cli,
+            ['run', '-c', 'accounts.yml', '-u', 'policies.yml',
+             '--debug', '-s', 'output', '--cache-path', 'cache',
+             '--policy-group-size', '1'],
+            catch_exceptions=False)
+
+        self.assertEqual(result.exit_code, 0)
+        # 2 accounts x 2 regions x 2 policy groups, largest unit first
+        self.assertEqual(run_account.call_count, 8)
+        first = run_account.call_args_list[0][0]
+        self.assertEqual(
+            (first[0]['name'], first[1], [p['name'] for p in first[2]['policies']]),
+            ('dev', 'us-west-2', ['serverless']))
+        self.assertIn("Ran 8 units", log_output.getvalue())
+        # units of an account region run concurrently, so don't share a cache file
+        units = {(c[0][0]['name'], c[0][1], c[1]['unit']) for c in run_account.call_args_list}
+        self.assertEqual(len(units), 8)
+        self.assertIn("'compute': 4", log_output.getvalue())
+        self.assertIn("'serverless': 4", log_output.getvalue())
+        with open(timing_path) as fh:
+            timings = json.load(fh)
+        self.assertEqual(len(timings), 8)
+        self.assertEqual(timings['112233445566/us-west-2/serverless'], 2.0)
+
+    def test_plan_units(self):
+        timings = TimingDatabase('timings.json')
+        self.assertEqual(
+            timings.estimate({'account_id': '1'}, 'us-east-1', [{'name': 'a'}]),
+            TimingDatabase.default_duration)
+        timings.record({'account_id': '1'}, 'us-east-1', {'a': 4, 'b': 2})
+        policies = {'vars': {'x': 1}, 'policies': [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}]}
+        units = plan_units(
+            [({'account_id': '1'}, 'us-east-1'), ({'account_id': '2'}, 'us-east-1')],
+            policies, 2, timings)
+        self.assertEqual(
+            [(u[0], u[1]['account_id'], [p['name'] for p in u[3]['policies']]) for u in units],
+            [(6, '1', ['a', 'b']), (6, '2', ['a', 'b']), (3, '1', ['c']), (3, '2', ['c'])])
+        self.assertEqual(units[0][3]['vars'], {'x': 1})
+
+    def test_account_sessions_reused_across_units(self):
+        def factory():
+            return object()
+        factory.region = 'us-east-1'
+        dev, qa = yaml.safe_load(ACCOUNTS_AWS_DEFAULT)['accounts']
+
+        reset_account_sessions(qa)
+        reset_account_sessions(dev)
+        session = local_session(factory)
+        # another unit of the same account keeps its sessions
+        reset_account_sessions(dev)
+        self.assertIs(local_session(factory), session)
+        reset_account_sessions(qa)
+        self.assertIsNot(local_session(factory), session)
+
+    def test_cli_run_resume(self):
+        run_dir = self.setup_run_dir()
+        self.change_cwd(run_dir)
+
+        def run_account(a, r, policies_config, *args, **kw):
+            return {'compute': 1}, not (a['name'] == 'dev' and r == 'us-west-2')
+
+        run_account = mock.MagicMock(side_effect=run_account)
+        self.patch(org, 'run_account', run_account)
+        args = ['run', '-c', 'accounts.yml', '-u', 'policies.yml',
+                '--debug', '-s', 'output', '--cache-path', 'cache', '--queue', 'queue.db']
+        runner = CliRunner()
+        result = runner.invoke(org.cli, args, catch_exceptions=False)
+        self.assertEqual(result.exit_code, 1)
+        self.assertEqual(run_account.call_count, 4)
+
+        result = runner.invoke(org.cli, ['status', '--queue', 'queue.db'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('pending:0 running:0 done:3 failed:1', result.output)
+        self.assertIn('failed dev @ us-west-2 policies:compute,serverless', result.output)
+
+        # only the failed unit is run again, counts include completed units
+        run_account.reset_mock()
+        log_output = self.capture_logging('c7n_org')
+        result = runner.invoke(org.cli, args + ['--resume'], catch_exceptions=False)
+        self.assertEqual(run_account.call_count, 1)
+        self.assertEqual(run_account.call_args[0][1], 'us-west-2')
+        self.assertIn("skipping 3 completed units", log_output.getvalue())
+        self.assertIn("'compute': 4", log_output.getvalue())
+
+        # without resume the queue starts afresh
+        run_account.reset_mock()
+        runner.invoke(org.cli, args, catch_exceptions=False)
+        self.assertEqual(run_account.call_count, 4)
+
+    def test_cli_report_incremental(self):
+        run_dir = self.setup_run_dir()
+        self.change_cwd(run_dir)
+        record_dir = os.path.join(run_dir, 'output', 'dev', 'us-east-1', 'compute')
+        os.makedirs(record_dir)
+        with open(os.path.join(record_dir, 'resources.json'), 'w') as fh:
+            json.dump([{'InstanceId': 'i-1'}, {'InstanceId': 'i-2'}, {'InstanceId': 'i-1'},
+                       {'State': 'running'}, {'State': 'running'}], fh)
+
+        args = ['report', '-c', 'accounts.yml', '-u', 'policies.yml', '-p', 'compute',
+                '-r', 'us-east-1', '--debug', '-s', 'output', '--cache-path', 'cache',
+                '--format', 'json', '--incremental']
+        runner = CliRunner()
+        result = runner.invoke(org.cli, args, catch_exceptions=False)
+        self.assertEqual(result.exit_code, 0)
+        records = json.loads(result.output)
+        # records are deduplicated by id, or by content for those without one
+        self.assertEqual(
+            sorted((r['account'], r.get('InstanceId', '')) for r in records),
+            [('dev', ''), ('dev', 'i-1'), ('dev', 'i-2')])
+
+        # unchanged outputs are read from the report cache
+        fs_record_set = mock.MagicMock(side_effect=AssertionError('output reread'))
+        self.patch(org, 'fs_record_set', fs_record_set)
+        result = runner.invoke(org.cli, args, catch_exceptions=False)
+        self.assertEqual(json.loads(result.output), records)
+        self.assertEqual(fs_record_set.call_count, 0)
+
+        with open(os.path.join(record_dir, 'resources.json'), 'w') as fh:
+            json.dump([{'InstanceId': 'i-3'}], fh)
+        fs_record_set.side_effect = lambda *args: [
+            {'InstanceId': 'i-3', 'CustodianDate': datetime.now()}]
+        # changed outputs are read again, here reporting as csv
+        result = runner.invoke(org.cli, args[:-3] + ['--incremental'], catch_exceptions=False)
+        self.assertEqual(fs_record_set.call_count, 1)
+        self.assertIn('"i-3"', result.output)
+        self.assertNotIn('"i-1"', result.output)
+
+    def test_cli_report_json_closed_on_error(self):
+        run_dir = self.setup_run_dir()
+        self.change_cwd(run_dir)
+        self.patch(org, 'report_account', mock.MagicMock(side_effect=ValueError('bad')))
+        result = CliRunner().invoke(
+            org.cli, ['report', '-c', 'accounts.yml', '-u', 'policies.yml', '-p', 'compute',
+                      '-r', 'us-east-1', '--debug', '-s', 'output', '--format', 'json'])
+        self.assertIsInstance(result.exception, ValueError)
+        self.assertEqual(json.loads(result.output), [])
+
+    def test_cli_run_resume_requires_queue(self):
+        run_dir = self.setup_run_dir()
+        self.change_cwd(run_dir)
+        result = CliRunner().invoke(
+            org.cli, ['run', '-c', 'accounts.yml', '-u', 'policies.yml',
+                      '-s', 'output', '--resume'])
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn('--resume requires --queue', result.output)
+
+    def test_cli_worker(self):
+        queue_path = os.path.join(self.get_temp_dir(), 'queue.db')
+        queue = TaskQueue(queue_path)
+        self.addCleanup(queue.close)
+        account = {'name': 'dev', 'account_id': '112233445566'}
+        config = {'policies': [{'name': 'a'}]}
+        options = dict(
+            output_dir='output', cache_period=15, cache_path='cache', metrics=False,
+            dryrun=False, debug=True, policy_group_size=0, credential_cache=None)
+        queue.enqueue(
+            [(account, 'us-east-1', config), (account, 'us-west-2', config)], options=options)
+
+        def run_account(a, r, policies_config, *args, **kw):
+            # units are marked running when a worker claims them
+            counts, _ = queue.status()
+            self.assertEqual((counts['running'], kw['credential_cache']), (1, None))
+            return {'a': 1}, True
+
+        self.patch(org, 'run_account', mock.MagicMock(side_effect=run_account))
+        result = CliRunner().invoke(
+            org.cli, ['worker', '--queue', queue_path, '--debug'], catch_exceptions=False)
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(org.run_account.call_count, 2)
+        self.assertEqual(queue.status()[0]['done'], 2)
+        self.assertEqual(queue.get_policy_counts(), {'a': 2})
+        self.assertEqual(
+            [(p['region'], p['options']['cache_path']) for p, _, _ in queue.results()],
+            [('us-east-1', 'cache'), ('us-west-2', 'cache')])
+
+    def test_task_queue(self):
+        queue = TaskQueue(os.path.join(self.get_temp_dir(), 'queue.db'))
+        self.addCleanup(queue.close)
+        self.assert_task_queue(queue)
+
+    def test_redis_task_queue(self):
+        fakeredis = pytest.importorskip('fakeredis')
+        queue = RedisTaskQueue('redis://localhost', connection=fakeredis.FakeRedis())
+        self.assert_task_queue(queue)
+
+    def assert_task_queue(self, queue):
+        account = {'name': 'dev', 'account_id': '112233445566'}
+        config = {'policies': [{'name': 'b'}, {'name': 'a'}]}
+        units = [(account, 'us-east-1', config), (account, 'us-west-2', config)]
+        east, west = queue.enqueue(units, options={'debug': False})
+        self.assertEqual(east, '112233445566/us-east-1/a,b')
+
+        self.assertEqual(queue.claim(), (east, {
+            'account': account, 'region': 'us-east-1',
+            'policies_config': config, 'options': {'debug': False}}))
+        queue.complete(east, {'a': 2, 'b': 1}, True, {'a': 1.5, 'b': 0.5})
+        self.assertEqual(queue.claim()[0], west)
+        self.assertEqual(queue.claim(), None)
+        queue.fail(west, ValueError('access denied'))
+        counts, failed = queue.status()
+        self.assertEqual(counts, {'pending': 0, 'running': 0, 'done': 1, 'failed': 1})
+        self.assertEqual(failed, [{
+            'account': 'dev', 'region': 'us-west-2',
+            'policies': ['b', 'a'], 'error': 'access denied'}])
+        self.assertEqual(queue.get_policy_counts(), {'a': 2, 'b': 1})
+        self.assertEqual(
+            [(p['region'], t) for p, _, t in queue.results()],
+            [('us-east-1', {'a': 1.5, 'b': 0.5})])
+
+        # resuming drops units no longer targeted
+        self.assertEqual(queue.enqueue(units[1:], resume=True), [west])
+        self.assertEqual(queue.status()[0], {
+            'pending': 1, 'running': 0, 'done': 0, 'failed': 0})
+        self.assertEqual(queue.claim()[0], west)
+
     def test_filter_policies(self):
         d = {'policies': [
             {'name': 'find-ml',
@@ -366,3 +611,60 @@ class OrgTest(TestUtils):
              "--debug", "-s", "output", "--cache-path", "cache"],
             catch_exceptions=False)
         self.assertEqual(result.exit_code, 0)
+
+
+class CredentialCacheTest(TestUtils):
+
+    def get_sts(self, lifetime=timedelta(hours=1)):
+        sts = mock.MagicMock()
+        sts.assume_role.side_effect = lambda **kw: {'Credentials': {
+            'AccessKeyId': 'AKIA%s' % sts.assume_role.call_count,
+            'SecretAccessKey': 'secret',
+            'SessionToken': 'token',
+            'Expiration': datetime.now(tzutc()) + lifetime}}
+        self.patch(credentials, 'get_sts_client', lambda session, region: sts)
+        return sts
+
+    def test_credentials_shared_across_runs(self):
+        sts = self.get_sts()
+        cache_dir = os.path.join(self.get_temp_dir(), 'credentials')
+        roles = ['arn:aws:iam::112233445566:role/hub', 'arn:aws:iam::002244668899:role/spoke']
+
+        creds = credentials.CredentialCache(cache_dir).get_credentials(
+            roles, 'custodian', 'us-east-1', 'xyz')
+        # role chain assumed in order, with the external id
+        self.assertEqual(
+            [c[1]['RoleArn'] for c in sts.assume_role.call_args_list], roles)
+        self.assertEqual(sts.assume_role.call_args[1]['ExternalId'], 'xyz')
+        self.assertEqual(creds['access_key'], 'AKIA2')
+
+        # a new cache instance, ie. another worker or run, reuses the credentials
+        session = credentials.CredentialCache(cache_dir).get_session(
+            roles, 'custodian', 'us-west-2', 'xyz')
+        self.assertEqual(session.get_credentials().access_key, 'AKIA2')
+        self.assertEqual(session.region_name, 'us-west-2')
+        self.assertEqual(sts.assume_role.call_count, 2)
+
+        path = credentials.CredentialCache(cache_dir).get_path(roles, 'custodian', 'xyz')
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+
+    def test_credentials_refreshed_near_expiry(self):
+        sts = self.get_sts(lifetime=timedelta(minutes=10))
+        cache = credentials.CredentialCache(self.get_temp_dir())
+        cache.get_credentials('arn:aws:iam::112233445566:role/hub', 'custodian')
+        creds = cache.get_credentials('arn:aws:iam::112233445566:role/hub', 'custodian')
+        self.assertEqual(sts.assume_role.call_count, 2)
+        self.assertEqual(creds['access_key'], 'AKIA2')
+
+    def test_cached_session_factory(self):
+        self.get_sts()
+        factory = credentials.CachedSessionFactory(
+            'us-east-2',
+            {'role': 'arn:aws:iam::112233445566:role/hub', 'name': 'dev'},
+            credentials.CredentialCache(self.get_temp_dir()))
+        factory.policy_name = 'ec2-check'
+        session = factory()
+        self.assertEqual(session.region_name, 'us-east-2')
+        self.assertEqual(session.get_credentials().access_key, 'AKIA1')
+        self.assertEqual(
+            session._session.user_agent_extra, 'c7n/policy#ec2-check')
@@ -5,7 +5,8 @@
 
 import click
 import contextlib
-from collections import deque
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from dateutil.tz import tzoffset, tzutc
 from dateutil.parser import parse
@@ -17,8 +18,13 @@ import shutil
 import operator
 import os
 import pygit2
+from queue import Queue
+import random
 import requests
+import sqlite3
 import tempfile
+import threading
+import time
 import yaml
 
 from c7n.config import Config
@@ -26,7 +32,7 @@ from c7n.credentials import SessionFactory
 from c7n.policy import PolicyCollection as BaseCollection
 from c7n.policy import Policy as BasePolicy
 from c7n.resources import load_available
-from c7n.utils import get_retry, jmespath_search
+from c7n.utils import chunks, get_retry, jmespath_search, yaml_dump, yaml_load
 
 import boto3
 
@@ -249,14 +255,101 @@ def policy_path_matcher(path, patterns=('*.yaml', '*.yml')):
     return False
 
 
+def parse_policy_blob(data):
+    """Parse a policy file blob, returning any error rather than raising it."""
+    try:
+        return yaml_load(data)
+    except Exception as e:
+        return ValueError(str(e))
+
+
+class PolicyBlobCache:
+    """Parsed policy file contents by git blob id.
+
+    The most recently used blobs are kept in memory, and if a path is
+    given all parsed blobs are also kept in a sqlite file, as a blob's
+    contents never change. Parse errors are only kept in memory.
+    """
+
+    missing = object()
+
+    def __init__(self, path=None, size=16384):
+        self.size = size
+        self.data = OrderedDict()
+        self.conn = None
+        if path:
+            self.conn = sqlite3.connect(os.path.expanduser(path))
+            self.conn.execute(
+                'create table if not exists blobs (id text primary key, data text)')
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+    def get(self, blob_id):
+        if blob_id in self.data:
+            self.data.move_to_end(blob_id)
+            return self.data[blob_id]
+        if self.conn is None:
+            return self.missing
+        row = self.conn.execute('select data from blobs where id = ?', (blob_id,)).fetchone()
+        if row is None:
+            return self.missing
+        value = json.loads(row[0])
+        self._set(blob_id, value)
+        return value
+
+    def set(self, blob_id, value):
+        self._set(blob_id, value)
+        if self.conn is None or isinstance(value, Exception):
+            return
+        try:
+            serialized = json.dumps(value)
+        except TypeError:
+            return
+        # yaml allows content json doesn't round trip, ie. dates or int keys
+        if json.loads(serialized) != value:
+            return
+        self.conn.execute(
+            'insert or replace into blobs (id, data) values (?, ?)', (blob_id, serialized))
+
+    def _set(self, blob_id, value):
+        self.data[blob_id] = value
+        self.data.move_to_end(blob_id)
+        if len(self.data) > self.size:
+            self.data.popitem(last=False)
+
+
 class PolicyRepo:
     """Models a git repository containing policy files.
+
+    Parsed policy files are cached by blob id, and with `workers` the
+    files changed across a window of commits are parsed in parallel
+    before the window's commits are processed in order.
     """
-    def __init__(self, repo_uri, repo, matcher=None):
+
+    # commits to prefetch policy files for when parsing in parallel
+    window_size = 64
+
+    # commits between stream checkpoints
+    checkpoint_period = 500
+
+    # deltas whose new file is parsed
+    parsed_delta_types = (
+        GIT_DELTA_INVERT['GIT_DELTA_ADDED'],
+        GIT_DELTA_INVERT['GIT_DELTA_MODIFIED'],
+        GIT_DELTA_INVERT['GIT_DELTA_RENAMED'])
+
+    def __init__(self, repo_uri, repo, matcher=None, blob_cache=None, workers=1):
         self.repo_uri = repo_uri
         self.repo = repo
         self.policy_files = {}
         self.matcher = matcher or policy_path_matcher
+        self.blob_cache = blob_cache or PolicyBlobCache()
+        self.workers = workers
+        self.last_commit = None
 
     def initialize_tree(self, tree):
         assert not self.policy_files
@@ -266,9 +359,43 @@ class PolicyRepo:
             if not self.matcher(fpath):
                 continue
             self.policy_files[fpath] = PolicyCollection.from_data(
-                yaml.safe_load(self.repo.get(tree[fpath].id).data),
+                self._get_blob_data(tree[fpath].id),
                 Config.empty(), fpath)
 
+    def get_checkpoint(self):
+        """Stream state as of the last processed commit."""
+        return {
+            'repo_uri': self.repo_uri,
+            'commit': self.last_commit and str(self.last_commit),
+            'policy_files': {
+                f: [p.data for p in collection.policies]
+                for f, collection in self.policy_files.items()}}
+
+    def load_checkpoint(self, checkpoint, target='HEAD'):
+        """Restore stream state from a checkpoint.
+
+        Returns the checkpoint commit id to stream from, or None if
+        the checkpoint isn't for this repository or the commit is no
+        longer part of target's history.
+        """
+        if target == 'HEAD':
+            target = self.repo.head.target
+        if checkpoint.get('repo_uri') != self.repo_uri or not checkpoint.get('commit'):
+            return None
+        commit_id = pygit2.Oid(hex=checkpoint['commit'])
+        if commit_id != target and (
+                commit_id not in self.repo or
+                not self.repo.descendant_of(target, commit_id)):
+            log.warning(
+                "ignoring checkpoint, commit:%s not in history", checkpoint['commit'][:6])
+            return None
+        self.policy_files = {
+            f: PolicyCollection.from_data(
+                {'policies': policies}, Config.empty(), f)
+            for f, policies in checkpoint['policy_files'].items()}
+        self.last_commit = commit_id
+        return commit_id
+
     def _get_policy_fents(self, tree):
         # get policy file entries from a tree recursively
         results = {}
@@ -315,14 +442,22 @@ class PolicyRepo:
 
     def delta_stream(self, target='HEAD', limit=65536,
                      sort=pygit2.GIT_SORT_TIME | pygit2.GIT_SORT_REVERSE,
-                     after=None, before=None):
+                     after=None, before=None, since=None, checkpoint=None):
         """Return an iterator of policy changes along a commit lineage in a repo.
+
+        With `since`, a commit id restored via load_checkpoint, only
+        commits after it are streamed. `checkpoint` is called every
+        checkpoint_period commits, and once the stream is complete.
         """
         if target == 'HEAD':
             target = self.repo.head.target
 
+        walker = self.repo.walk(target, sort)
+        if since is not None:
+            walker.hide(since)
+
         commits = []
-        for commit in self.repo.walk(target, sort):
+        for commit in walker:
             cdate = commit_date(commit)
             log.debug(
                 "processing commit id:%s date:%s parents:%d msg:%s",
@@ -336,19 +471,73 @@ class PolicyRepo:
             if limit and len(commits) > limit:
                 break
 
-        if limit and limit < len(commits):
+        if since is None and limit and limit < len(commits):
             self.initialize_tree(commits[limit].tree)
             commits.pop(-1)
 
-        for commit in commits:
-            for policy_change in self._process_stream_commit(commit):
-                yield policy_change
+        executor = None
+        if self.workers > 1:
+            executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            count = 0
+            for window in chunks(commits, self.window_size):
+                window = [(commit, self._get_commit_diff(commit)) for commit in window]
+                if executor is not None:
+                    self._prefetch_blobs(executor, window)
+                for commit, change_diff in window:
+                    for policy_change in self._process_stream_commit(commit, change_diff):
+                        yield policy_change
+                    self.last_commit = commit.id
+                    count += 1
+                    if checkpoint and count % self.checkpoint_period == 0:
+                        checkpoint()
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        if checkpoint:
+            checkpoint()
+
+    def _get_commit_diff(self, commit):
+        if not commit.parents:
+            return self.repo.diff(self.repo.get(EMPTY_TREE, commit), commit)
+        return self.repo.diff(commit.parents[0], commit)
+
+    def _prefetch_blobs(self, executor, window):
+        """Parse the policy files changed in a window of commits in parallel."""
+        pending = {}
+        for commit, change_diff in window:
+            for delta in change_diff.deltas:
+                if delta.status not in self.parsed_delta_types or not self.matcher(
+                        delta.new_file.path):
+                    continue
+                blob_id = str(delta.new_file.id)
+                if blob_id not in pending and (
+                        self.blob_cache.get(blob_id) is PolicyBlobCache.missing):
+                    pending[blob_id] = delta.new_file.id
+        if not pending:
+            return
+        blob_ids = list(pending)
+        results = executor.map(
+            parse_policy_blob, [self.repo.get(pending[b]).data for b in blob_ids],
+            chunksize=8)
+        for blob_id, value in zip(blob_ids, results):
+            self.blob_cache.set(blob_id, value)
+
+    def _get_blob_data(self, oid):
+        blob_id = str(oid)
+        value = self.blob_cache.get(blob_id)
+        if value is PolicyBlobCache.missing:
+            value = parse_policy_blob(self.repo.get(oid).data)
+            self.blob_cache.set(blob_id, value)
+        if isinstance(value, Exception):
+            raise value
+        return value
 
     def _policy_file_rev(self, f, commit):
         try:
             return self._validate_policies(
                 PolicyCollection.from_data(
-                    yaml.safe_load(self.repo.get(commit.tree[f].id).data),
+                    self._get_blob_data(commit.tree[f].id),
                     Config.empty(), f))
         except Exception as e:
             log.warning(
@@ -368,11 +557,9 @@ class PolicyRepo:
             res.append(p)
         return PolicyCollection(res)
 
-    def _process_stream_commit(self, change):
-        if not change.parents:
-            change_diff = self.repo.diff(self.repo.get(EMPTY_TREE, change), change)
-        else:
-            change_diff = self.repo.diff(change.parents[0], change)
+    def _process_stream_commit(self, change, change_diff=None):
+        if change_diff is None:
+            change_diff = self._get_commit_diff(change)
 
         log.debug(
             "processing commit id:%s date:%s parents:%d add:%d del:%d files:%d change:%s",
@@ -461,34 +648,137 @@ def parse_arn(arn):
 
 
 class Transport:
+    """Sends policy changes to a destination in batches.
+
+    Batches are sized to the destination's per request record and byte
+    limits. Transports with a queue size send batches from a background
+    thread, so the git walk continues while batches are in flight, and
+    only blocks when the queue is full. A single sender keeps changes in
+    commit order.
+    """
 
     BUF_SIZE = 1
 
+    # maximum bytes in a batch, if the destination has a limit
+    BUF_BYTES = None
+
+    # batches queued for the sender before blocking, or 0 to send inline
+    QUEUE_SIZE = 0
+
+    # attempts at sending records a destination failed to accept
+    RETRIES = 5
+
     def __init__(self, session, info):
         self.session = session
         self.info = info
         self.buf = []
+        self.buf_bytes = 0
+        self.stats = Counter()
+        self.start_time = time.time()
+        self.error = None
+        self.queue = None
+        if self.QUEUE_SIZE:
+            self.queue = Queue(self.QUEUE_SIZE)
+            self.sender = threading.Thread(target=self._run_sender, daemon=True)
+            self.sender.start()
+
+    def prepare(self, change):
+        """Convert a change to the buffered record sent to the destination."""
+        return change
+
+    def get_size(self, record):
+        return 0
 
     def send(self, change):
         """send the given policy change"""
-        self.buf.append(change)
-        if len(self.buf) % self.BUF_SIZE == 0:
+        record = self.prepare(change)
+        size = self.get_size(record)
+        if self.BUF_BYTES and self.buf and self.buf_bytes + size > self.BUF_BYTES:
+            self.flush()
+        self.buf.append(record)
+        self.buf_bytes += size
+        if len(self.buf) >= self.BUF_SIZE:
             self.flush()
 
     def flush(self):
         """flush any buffered messages"""
         buf = self.buf
+        self.stats['bytes'] += self.buf_bytes
         self.buf = []
-        if buf:
-            self._flush(buf)
+        self.buf_bytes = 0
+        if not buf:
+            return
+        self.check()
+        if self.queue is None:
+            return self._send(buf)
+        t = time.time()
+        self.queue.put(buf)
+        self.stats['blocked'] += time.time() - t
+
+    def drain(self):
+        """flush and wait for all messages to be sent"""
+        self.flush()
+        if self.queue is not None:
+            self.queue.join()
+        self.check()
+
+    def check(self):
+        if self.error is not None:
+            raise self.error
 
     def close(self):
-        self.flush()
+        self.drain()
+        if self.queue is not None:
+            self.queue.put(None)
+            self.sender.join()
+        if self.stats['batches']:
+            elapsed = time.time() - self.start_time
+            log.info(
+                "Sent %d changes in %d batches bytes:%d time:%0.2f rate:%0.1f/s"
+                " send-time:%0.2f retried:%d blocked:%0.2f",
+                self.stats['records'], self.stats['batches'], self.stats['bytes'],
+                elapsed, self.stats['records'] / (elapsed or 1), self.stats['send_time'],
+                self.stats['retried'], self.stats['blocked'])
+
+    def _send(self, buf):
+        t = time.time()
+        self._flush(buf)
+        self.stats['send_time'] += time.time() - t
+        self.stats['batches'] += 1
+        self.stats['records'] += len(buf)
+
+    def _run_sender(self):
+        while True:
+            buf = self.queue.get()
+            try:
+                if buf is None:
+                    return
+                # after an error, discard batches until the stream checks
+                if self.error is None:
+                    self._send(buf)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def send_with_retry(self, send, records):
+        """Send records, retrying any that `send` returns as failed with backoff."""
+        for attempt in range(self.RETRIES):
+            records = send(records)
+            if not records:
+                return
+            self.stats['retried'] += len(records)
+            time.sleep(min(2 ** attempt * 0.2, 5) + random.random() * 0.2)
+        raise RuntimeError(
+            "%s failed to send %d records" % (self.__class__.__name__, len(records)))
 
 
 class KinesisTransport(Transport):
 
-    BUF_SIZE = 50
+    # put_records limits
+    BUF_SIZE = 500
+    BUF_BYTES = 5 * 1024 * 1024
+    QUEUE_SIZE = 8
 
     retry = staticmethod(get_retry(('ProvisionedThroughputExceededException',)))
 
@@ -496,14 +786,25 @@ class KinesisTransport(Transport):
         super(KinesisTransport, self).__init__(session, info)
         self.client = self.session.client('kinesis', region_name=info['region'])
 
+    def prepare(self, change):
+        return {'Data': json.dumps(change.data()).encode('utf8'),
+                'PartitionKey': change.repo_uri}
+
+    def get_size(self, record):
+        return len(record['Data']) + len(record['PartitionKey'].encode('utf8'))
+
     def _flush(self, buf):
-        self.retry(
+        self.send_with_retry(self._put_records, buf)
+
+    def _put_records(self, records):
+        response = self.retry(
             self.client.put_records,
             StreamName=self.info['resource'],
-            Records=[
-                {'Data': json.dumps(c.data()),
-                 'PartitionKey': c.repo_uri}
-                for c in buf])
+            Records=records)
+        if not response.get('FailedRecordCount'):
+            return []
+        return [r for r, result in zip(records, response['Records'])
+                if result.get('ErrorCode')]
 
 
 class IndexedTransport(Transport):
@@ -515,6 +816,7 @@ class IndexedTransport(Transport):
 
 class SQLTransport(IndexedTransport):
 
+    # sent inline, as the connection is used by the stream for last()
     BUF_SIZE = 200
 
     def __init__(self, session, info):
@@ -539,23 +841,23 @@ class SQLTransport(IndexedTransport):
         self.metadata.create_all()
         self.conn = self.engine.connect()
 
+    def prepare(self, c):
+        return dict(
+            commit_id=str(c.commit.id),
+            policy_name=c.policy.name,
+            resource_type=c.policy.resource_type,
+            change_type=c.kind,
+            commit_date=c.date,
+            committer_name=c.commit.committer.name,
+            committer_email=c.commit.committer.email,
+            repo_uri=c.repo_uri,
+            repo_file=c.file_path,
+            commit_msg=c.commit.message,
+            policy=json.dumps(c.policy.data))
+
     def _flush(self, buf):
         with self.conn.begin():
-            self.conn.execute(
-                self.table.insert(),
-                [dict(
-                    commit_id=str(c.commit.id),
-                    policy_name=c.policy.name,
-                    resource_type=c.policy.resource_type,
-                    change_type=c.kind,
-                    commit_date=c.date,
-                    committer_name=c.commit.committer.name,
-                    committer_email=c.commit.committer.email,
-                    repo_uri=c.repo_uri,
-                    repo_file=c.file_path,
-                    commit_msg=c.commit.message,
-                    policy=json.dumps(c.policy.data))
-                 for c in buf])
+            self.conn.execute(self.table.insert(), buf)
 
     def last(self):
         value = self.conn.execute(
@@ -574,21 +876,38 @@ class SQLTransport(IndexedTransport):
 
 class SQSTransport(Transport):
 
+    # send_message_batch limits
     BUF_SIZE = 10
+    BUF_BYTES = 256 * 1024
+    QUEUE_SIZE = 32
 
     def __init__(self, session, info):
         super(SQSTransport, self).__init__(session, info)
         self.client = self.session.client('sqs', region_name=info['region'])
 
+    def prepare(self, change):
+        return {
+            'MessageDeduplicationId': str(change.commit.id) + change.policy.name,
+            'MessageGroupId': change.repo_uri,
+            'MessageBody': json.dumps(change.data())}
+
+    def get_size(self, record):
+        return len(record['MessageBody'].encode('utf8'))
+
     def _flush(self, buf):
-        self.client.send_message_batch(
+        self.send_with_retry(self._send_batch, buf)
+
+    def _send_batch(self, entries):
+        # batch entry ids are only used to match up failures
+        response = self.client.send_message_batch(
             QueueUrl=self.info['resource'],
-            Entries=[{
-                'Id': str(change.commit.id) + change.policy.name,
-                'MessageDeduplicationId': str(change.commit.id) + change.policy.name,
-                'MessageGroupId': change.repo_uri,
-                'MessageBody': json.dumps(change.data())}
-                for change in buf])
+            Entries=[dict(e, Id=str(idx)) for idx, e in enumerate(entries)])
+        failed = response.get('Failed', ())
+        rejected = [f for f in failed if f.get('SenderFault')]
+        if rejected:
+            raise ValueError("sqs rejected messages: %s" % ", ".join(
+                "%s %s" % (f['Code'], f.get('Message', '')) for f in rejected))
+        return [entries[int(f['Id'])] for f in failed]
 
 
 class OutputTransport(Transport):
@@ -891,7 +1210,14 @@ def diff(repo_uri, source, target, output, verbose):
 @click.option('--sort', multiple=True, default=["reverse", "time"],
               type=click.Choice(SORT_TYPE.keys()),
               help="Git sort ordering")
-def stream(repo_uri, stream_uri, verbose, assume, sort, before=None, after=None, policy_pattern=()):
+@click.option('--blob-cache', type=click.Path(),
+              help="Sqlite file caching parsed policy files across runs")
+@click.option('-w', '--workers', type=int, default=1,
+              help="Processes to parse policy files with")
+@click.option('--checkpoint', type=click.Path(),
+              help="File recording stream progress, to resume from on the next run")
+def stream(repo_uri, stream_uri, verbose, assume, sort, before=None, after=None, policy_pattern=(),
+           blob_cache=None, workers=1, checkpoint=None):
     """Stream git history policy changes to destination.
 
 
@@ -905,6 +1231,9 @@ def stream(repo_uri, stream_uri, verbose, assume, sort, before=None, after=None,
     dependency.
 
     When using database destinations, streaming defaults to incremental.
+
+    With a checkpoint file, streaming resumes after the last commit
+    streamed by the previous run.
     """
     logging.basicConfig(
         format="%(asctime)s: %(name)s:%(levelname)s %(message)s",
@@ -931,13 +1260,28 @@ def stream(repo_uri, stream_uri, verbose, assume, sort, before=None, after=None,
         else:
             repo = pygit2.Repository(repo_uri)
         load_available()
-        policy_repo = PolicyRepo(repo_uri, repo, matcher)
+        policy_repo = PolicyRepo(
+            repo_uri, repo, matcher, PolicyBlobCache(blob_cache), workers)
         change_count = 0
 
-        with contextlib.closing(transport(stream_uri, assume)) as t:
-            if after is None and isinstance(t, IndexedTransport):
+        since = None
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as fh:
+                since = policy_repo.load_checkpoint(yaml_load(fh.read()))
+
+        with contextlib.closing(transport(stream_uri, assume)) as t, \
+                contextlib.closing(policy_repo.blob_cache):
+
+            def save_checkpoint():
+                # only checkpoint what the transport has delivered
+                t.drain()
+                write_checkpoint(checkpoint, policy_repo.get_checkpoint())
+
+            if since is None and after is None and isinstance(t, IndexedTransport):
                 after = t.last()
-            for change in policy_repo.delta_stream(after=after, before=before):
+            for change in policy_repo.delta_stream(
+                    after=after, before=before, since=since,
+                    checkpoint=checkpoint and save_checkpoint or None):
                 change_count += 1
                 t.send(change)
 
@@ -945,6 +1289,13 @@ def stream(repo_uri, stream_uri, verbose, assume, sort, before=None, after=None,
     return change_count
 
 
+def write_checkpoint(path, checkpoint):
+    tmp_path = "%s.tmp" % path
+    with open(tmp_path, 'w') as fh:
+        fh.write(yaml_dump(checkpoint))
+    os.replace(tmp_path, path)
+
+
 if __name__ == '__main__':
     try:
         cli()
@@ -284,6 +284,71 @@ class StreamTest(TestUtils):
              ('add', 'ec2-check', 'new file'),
              ('moved', 'lambda-check', 'move policy')])
 
+    def test_stream_parallel_blob_cache(self):
+        git = self.setup_basic_repo()
+        git.change('example.yml', {
+            'policies': [{
+                'name': 'codebuild-check',
+                'resource': 'aws.codebuild'}]})
+        git.commit('revert')
+
+        cache_path = os.path.join(self.get_temp_dir(), 'blobs.db')
+        blob_cache = policystream.PolicyBlobCache(cache_path)
+        policy_repo = policystream.PolicyRepo(
+            git.repo_path, git.repo(), blob_cache=blob_cache, workers=2)
+        changes = [c.data() for c in policy_repo.delta_stream(
+            sort=pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_REVERSE)]
+        blob_cache.close()
+        self.assertEqual(
+            [(c['change'],
+              c['policy']['data']['name'],
+              c['commit']['message'].strip()) for c in changes],
+            [('add', 'codebuild-check', 'add something'),
+             ('remove', 'codebuild-check', 'switch'),
+             ('add', 'lambda-check', 'switch'),
+             ('remove', 'lambda-check', 'revert'),
+             ('add', 'codebuild-check', 'revert')])
+
+        # parsed blobs persist across runs
+        blob_cache = policystream.PolicyBlobCache(cache_path)
+        blob_id = str(git.repo().revparse_single('HEAD').tree['example.yml'].id)
+        self.assertEqual(
+            blob_cache.get(blob_id),
+            {'policies': [{'name': 'codebuild-check', 'resource': 'aws.codebuild'}]})
+        blob_cache.close()
+
+    def test_cli_stream_checkpoint(self):
+        git = self.setup_basic_repo()
+        checkpoint = os.path.join(self.get_temp_dir(), 'checkpoint.yml')
+        runner = CliRunner()
+        result = runner.invoke(
+            policystream.cli,
+            ['stream', '-r', git.repo_path, '-s', 'jsonline', '--checkpoint', checkpoint])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(len(result.stdout.splitlines()), 3)
+
+        with open(checkpoint) as fh:
+            data = yaml.safe_load(fh)
+        self.assertEqual(
+            data['policy_files'],
+            {'example.yml': [{'name': 'lambda-check', 'resource': 'aws.lambda'}]})
+
+        git.change('example.yml', {
+            'policies': [{
+                'name': 'lambda-check',
+                'resource': 'aws.lambda',
+                'filters': [{'State': 'Active'}]}]})
+        git.commit('filter')
+        result = runner.invoke(
+            policystream.cli,
+            ['stream', '-r', git.repo_path, '-s', 'jsonline', '--checkpoint', checkpoint])
+        self.assertEqual(result.exit_code, 0)
+        rows = [json.loads(l) for l in result.stdout.splitlines()]
+        self.assertEqual(
+            [(r['change'], r['policy']['data']['name'], r['commit']['message'].strip())
+             for r in rows],
+            [('modified', 'lambda-check', 'filter')])
+
 
 @pytest.mark.skipif(pygit2 is None, reason="pygit2 not installed")
 def test_path_matcher():
@@ -298,3 +363,58 @@ def test_path_matcher():
             ('foo/bar.yml', ('dir/*.yaml',), False),
             ('foo/bar.json', ('foo/*.json',), True)):
         assert policystream.policy_path_matcher(p, patterns) is result
+
+
+class Change:
+
+    def __init__(self, name, size=10):
+        self.repo_uri = 'repo'
+        self.size = size
+        self.name = name
+
+    def data(self):
+        return {'name': self.name, 'pad': 'x' * self.size}
+
+
+class Client:
+
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.calls = []
+
+    def put_records(self, StreamName, Records):
+        self.calls.append([json.loads(r['Data'])['name'] for r in Records])
+        failed = self.failures and self.failures.pop(0) or ()
+        return {
+            'FailedRecordCount': len(failed),
+            'Records': [
+                json.loads(r['Data'])['name'] in failed and {'ErrorCode': 'InternalFailure'} or {}
+                for r in Records]}
+
+
+@pytest.mark.skipif(pygit2 is None, reason="pygit2 not installed")
+def test_kinesis_transport_retries_failed_records(monkeypatch):
+    monkeypatch.setattr(policystream.time, 'sleep', lambda s: None)
+    client = Client([('b',)])
+    session = type('Session', (), {'client': lambda self, *args, **kw: client})()
+    t = policystream.KinesisTransport(session, {'region': 'us-east-1', 'resource': 'stream'})
+    t.BUF_BYTES = 300
+    for name in 'abcd':
+        t.send(Change(name, 100))
+    t.close()
+    # batches sized by bytes, with the failed record resent on its own
+    assert client.calls == [['a', 'b'], ['b'], ['c', 'd']]
+    assert t.stats['records'] == 4
+    assert t.stats['retried'] == 1
+
+
+@pytest.mark.skipif(pygit2 is None, reason="pygit2 not installed")
+def test_kinesis_transport_raises_sender_errors(monkeypatch):
+    monkeypatch.setattr(policystream.time, 'sleep', lambda s: None)
+    client = Client([('a',)] * 10)
+    session = type('Session', (), {'client': lambda self, *args, **kw: client})()
+    t = policystream.KinesisTransport(session, {'region': 'us-east-1', 'resource': 'stream'})
+    t.send(Change('a'))
+    with pytest.raises(RuntimeError):
+        t.close()
+    assert len(client.calls) == t.RETRIES
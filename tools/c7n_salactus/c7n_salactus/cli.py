@@ -531,7 +531,8 @@ def watch(limit):
         progress = []
         prev_buckets = {b.bucket_id: b for b in prev.buckets()}
 
-        totals = {'scanned': 0, 'krate': 0, 'lrate': 0, 'bucket_id': 'totals'}
+        totals = {'scanned': 0, 'krate': 0, 'lrate': 0, 'bucket_id': 'totals',
+                  'workers': '', 'chunk_size': ''}
 
         for b in cur.buckets():
             if not b.scanned:
@@ -566,7 +567,8 @@ def watch(limit):
         format_plain(
             progress, None,
             explicit_only=True,
-            keys=['bucket_id', 'scanned', 'gkrate', 'lrate', 'krate'])
+            keys=['bucket_id', 'scanned', 'gkrate', 'lrate', 'krate',
+                  'workers', 'chunk_size'])
 
 
 @cli.command(name='inspect-partitions')
@@ -649,6 +651,8 @@ def inspect_bucket(bucket):
     click.echo("Inventory: %s" % found.inventory)
     click.echo("Partitions: %s" % found.partitions)
     click.echo("Scanned: %0.2f%%" % found.percent_scanned)
+    click.echo("Workers: %s" % found.workers)
+    click.echo("Chunk Size: %s" % found.chunk_size)
     click.echo("")
     click.echo("Errors")
 
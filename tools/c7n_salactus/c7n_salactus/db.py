@@ -176,6 +176,14 @@ class Bucket:
             int(self.data.get('keys-error', {}).get(self.bucket_id, 0)),
             int(self.data.get('keys-missing', {}).get(self.bucket_id, 0))))
 
+    @property
+    def workers(self):
+        return int(self.data['keyset-workers'].get(self.bucket_id, 0))
+
+    @property
+    def chunk_size(self):
+        return int(self.data['keyset-chunk-size'].get(self.bucket_id, 0))
+
     @property
     def gkrate(self):
         return int(self.data['gkrate'].get(self.bucket_id, 0))
@@ -232,6 +240,11 @@ def get_data():
     data['bucket-pages-time'] = {
         k: float(v) for k, v in conn.hgetall('bucket-pages-time').items()}
 
+    # adaptive key scan settings
+    for k in ('keyset-workers', 'keyset-chunk-size'):
+        data[k] = {
+            k: int(v) for k, v in conn.hgetall(k).items()}
+
     return data
 
 
@@ -29,6 +29,7 @@ monitor:
 import collections
 from contextlib import contextmanager
 from datetime import datetime, timedelta
+import functools
 import gc
 import itertools
 import json
@@ -97,6 +98,24 @@ PARTITION_QUEUE_THRESHOLD = 6
 
 DEFAULT_TTL = 60 * 60 * 48
 
+# Key scan threads per keyset (min, initial, max), adjusted per bucket
+KEYSET_WORKERS = (2, 10, 32)
+
+# Keys per scan task (min, initial, max), adjusted per bucket
+KEYSET_CHUNK_SIZE = (10, 100, 500)
+
+# Target seconds of work per key chunk
+KEYSET_CHUNK_SECONDS = 5.0
+
+# Fraction of throttled key requests before backing off a bucket
+KEYSET_THROTTLE_RATE = 0.01
+
+# Attempts at throttled keys within a keyset
+KEYSET_RETRIES = 3
+
+# Key requests per second per prefix, s3 supports 5500 gets per prefix
+PREFIX_REQUEST_RATE = int(os.environ.get("SALACTUS_PREFIX_RATE", 3500))
+
 # Default size of the bucket before checking for inventory
 DEFAULT_INVENTORY_BUCKET_SIZE_THRESHOLD = \
     int(os.environ.get("SALACTUS_INVENTORY_THRESHOLD", 100000))
@@ -815,40 +834,61 @@ def process_keyset(bid, key_set):
 
     error_count = sesserr = connerr = enderr = missing_count = 0
     throttle_count = denied_count = remediation_count = 0
+    request_count = request_time = 0
     key_count = len(key_set)
     start_time = time.time()
 
     objects = {v.visitor_name: [] for v in visitors}
     objects['objects_denied'] = []
 
+    controller = ThroughputController(bid)
+    workers, chunk_size = controller.get_settings()
+    pace = functools.partial(controller.acquire, get_key_prefix(key_set))
+
     with bucket_ops(bid, 'key'):
-        with ThreadPoolExecutor(max_workers=10) as w:
-            futures = {}
-            for kchunk in chunks(key_set, 100):
+        pending = {v.visitor_name: key_set for v in visitors}
+        for attempt in range(KEYSET_RETRIES):
+            retry = {}
+            with ThreadPoolExecutor(max_workers=workers) as w:
+                futures = {}
                 for v in visitors:
                     processor = (versioned and
                         v.process_version or v.process_key)
-                    futures[w.submit(
-                        process_key_chunk, s3, bucket, kchunk,
-                        processor, bool(object_reporting))] = v.visitor_name
-
-            for f in as_completed(futures):
-                if f.exception():
-                    log.warning("key error: %s", f.exception())
-                    error_count += 1
-                    continue
-                stats = f.result()
-                remediation_count += stats['remediated']
-                denied_count += stats['denied']
-                missing_count += stats['missing']
-                throttle_count += stats['throttle']
-                sesserr += stats['session']
-                enderr += stats['endpoint']
-                connerr += stats['connection']
-                if object_reporting:
-                    vname = futures[f]
-                    objects[vname].extend(stats['objects'])
-                    objects['objects_denied'].extend(stats['objects_denied'])
+                    for kchunk in chunks(pending.get(v.visitor_name, ()), chunk_size):
+                        futures[w.submit(
+                            process_key_chunk, s3, bucket, kchunk,
+                            processor, bool(object_reporting), pace)] = v.visitor_name
+
+                for f in as_completed(futures):
+                    if f.exception():
+                        log.warning("key error: %s", f.exception())
+                        error_count += 1
+                        continue
+                    stats = f.result()
+                    request_count += stats['requests']
+                    request_time += stats['elapsed']
+                    remediation_count += stats['remediated']
+                    denied_count += stats['denied']
+                    missing_count += stats['missing']
+                    throttle_count += stats['throttle']
+                    sesserr += stats['session']
+                    enderr += stats['endpoint']
+                    connerr += stats['connection']
+                    if stats['retry']:
+                        retry.setdefault(futures[f], []).extend(stats['retry'])
+                    if object_reporting:
+                        vname = futures[f]
+                        objects[vname].extend(stats['objects'])
+                        objects['objects_denied'].extend(stats['objects_denied'])
+            if not retry:
+                break
+            # back off throttled keys here, rather than in each scan thread
+            pending = retry
+            if attempt + 1 < KEYSET_RETRIES:
+                time.sleep(2 ** attempt + random.random())
+
+        controller.record(
+            workers, chunk_size, request_count, throttle_count, request_time)
 
         with connection.pipeline() as p:
             if remediation_count:
@@ -883,21 +923,32 @@ def process_keyset(bid, key_set):
         gc.collect()
 
 
-def process_key_chunk(s3, bucket, kchunk, processor, object_reporting):
+def process_key_chunk(s3, bucket, kchunk, processor, object_reporting, pace=None):
     stats = collections.defaultdict(lambda: 0)
+    stats['retry'] = []
     if object_reporting:
         stats['objects'] = []
         stats['objects_denied'] = []
 
-    for k in kchunk:
+    if pace is not None:
+        pace(len(kchunk))
+
+    for ok in kchunk:
+        k = ok
         if isinstance(k, str):
             k = {'Key': k}
         elif isinstance(k, (list, tuple)) and len(k) == 2:
             k = {'Key': k[0], 'VersionId': k[1] or 'null', 'IsLatest': False}
         else:
             k = {'Key': k[0], 'VersionId': k[1] or 'null', 'IsLatest': True}
+        stats['requests'] += 1
+        request_start = time.time()
         try:
-            result = processor(s3, bucket_name=bucket, key=k)
+            try:
+                result = processor(s3, bucket_name=bucket, key=k)
+            finally:
+                # time only the request, not pacing or error handling
+                stats['elapsed'] += time.time() - request_start
         except EndpointConnectionError:
             stats['endpoint'] += 1
         except ConnectionError:
@@ -912,8 +963,8 @@ def process_key_chunk(s3, bucket, kchunk, processor, object_reporting):
             elif code in ('404', 'NoSuchKey', 'NoSuchVersion'):  # Not Found
                 stats['missing'] += 1
             elif code in ('503', '500', 'SlowDown'):  # Slow down, or throttle
-                time.sleep(3)
                 stats['throttle'] += 1
+                stats['retry'].append(ok)
             elif code in ('400',):  # token err, typically
                 time.sleep(3)
                 stats['session'] += 1
@@ -927,6 +978,89 @@ def process_key_chunk(s3, bucket, kchunk, processor, object_reporting):
     return stats
 
 
+def get_key_prefix(key_set):
+    """The prefix common to a keyset's keys, as its s3 partition."""
+    keys = []
+    for k in key_set:
+        if isinstance(k, str):
+            keys.append(k)
+        else:
+            keys.append(k[0])
+    return os.path.commonprefix(keys)
+
+
+class ThroughputController:
+    """Key scan concurrency and chunking for a bucket.
+
+    Settings are kept in redis so the workers scanning a bucket
+    share them. Scan threads are added one at a time while a bucket's
+    keysets aren't throttled, and halved along with chunk size when
+    they are. Chunks are sized to take around KEYSET_CHUNK_SECONDS at
+    the observed key latency.
+    """
+
+    def __init__(self, bid):
+        self.bid = bid
+
+    def get_settings(self):
+        workers = connection.hget('keyset-workers', self.bid)
+        chunk_size = connection.hget('keyset-chunk-size', self.bid)
+        return (workers and int(workers) or KEYSET_WORKERS[1],
+                chunk_size and int(chunk_size) or KEYSET_CHUNK_SIZE[1])
+
+    def record(self, workers, chunk_size, request_count, throttle_count, elapsed):
+        """Adjust a bucket's settings from a keyset's key requests.
+
+        elapsed is the total seconds spent in those requests, excluding
+        any pacing or backoff waits.
+        """
+        if not request_count:
+            return
+        if float(throttle_count) / request_count > KEYSET_THROTTLE_RATE:
+            workers = max(KEYSET_WORKERS[0], workers // 2)
+            chunk_size = max(KEYSET_CHUNK_SIZE[0], chunk_size // 2)
+        else:
+            workers = min(KEYSET_WORKERS[2], workers + 1)
+            latency = float(elapsed) / request_count
+            chunk_size = int(KEYSET_CHUNK_SECONDS / (latency or KEYSET_CHUNK_SECONDS))
+            chunk_size = min(KEYSET_CHUNK_SIZE[2], max(KEYSET_CHUNK_SIZE[0], chunk_size))
+        with connection.pipeline() as p:
+            p.hset('keyset-workers', self.bid, workers)
+            p.hset('keyset-chunk-size', self.bid, chunk_size)
+            p.execute()
+
+    def acquire(self, prefix, count):
+        """Pace key requests within a prefix across workers.
+
+        Uses a counter per second per prefix, waiting for the next
+        second while PREFIX_REQUEST_RATE requests are taken. Requests
+        larger than the rate are taken over several seconds.
+        """
+        while count > 0:
+            taken = min(count, PREFIX_REQUEST_RATE)
+            while not self.take(prefix, taken):
+                now = time.time()
+                time.sleep(int(now) + 1 - now)
+            count -= taken
+
+    def take(self, prefix, count):
+        """Take requests from the current second's window, if they fit."""
+        window = 'prefix-rate:%s:%s:%d' % (self.bid, prefix, int(time.time()))
+
+        def take_window(p):
+            taken = int(p.get(window) or 0)
+            p.multi()
+            if taken + count > PREFIX_REQUEST_RATE:
+                return False
+            p.incrby(window, count)
+            p.expire(window, 5)
+            return True
+
+        # only requests which fit are counted, checked atomically
+        # across workers by watching the window.
+        return connection.transaction(take_window, window, value_from_callable=True)
+
+
 def publish_object_records(bid, objects, reporting):
     found = False
     for k in objects.keys():
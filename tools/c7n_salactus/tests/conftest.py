@@ -0,0 +1,6 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+import os
+
+# the worker connects lazily, tests swap in a fake connection
+os.environ.setdefault("SALACTUS_REDIS", "localhost")
@@ -0,0 +1,146 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+import json
+from unittest import mock
+
+from botocore.exceptions import ClientError
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+pytest.importorskip('rq')
+
+from c7n_salactus import worker  # noqa: E402
+
+
+class FakeClock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def redis_conn(monkeypatch):
+    conn = fakeredis.FakeStrictRedis()
+    monkeypatch.setattr(worker, 'connection', conn)
+    return conn
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(worker, 'time', clock)
+    return clock
+
+
+def test_get_key_prefix():
+    assert worker.get_key_prefix(['logs/a', 'logs/b']) == 'logs/'
+    assert worker.get_key_prefix([('logs/a', 'v1'), ('logs/b', None)]) == 'logs/'
+    assert worker.get_key_prefix(['', 'logs/a']) == ''
+    assert worker.get_key_prefix([('', 'v1')]) == ''
+
+
+def test_controller_record(redis_conn):
+    controller = worker.ThroughputController('acct:bucket')
+    assert controller.get_settings() == (
+        worker.KEYSET_WORKERS[1], worker.KEYSET_CHUNK_SIZE[1])
+
+    # 100 requests taking 0.1s each, chunks sized to KEYSET_CHUNK_SECONDS
+    controller.record(10, 100, 100, 0, 10.0)
+    assert controller.get_settings() == (11, 50)
+
+    # throttled, workers and chunks are halved
+    controller.record(11, 50, 100, 5, 10.0)
+    assert controller.get_settings() == (5, 25)
+
+    # nothing requested, settings unchanged
+    controller.record(5, 25, 0, 0, 0)
+    assert controller.get_settings() == (5, 25)
+
+
+def test_controller_acquire(redis_conn, clock, monkeypatch):
+    monkeypatch.setattr(worker, 'PREFIX_REQUEST_RATE', 10)
+    controller = worker.ThroughputController('acct:bucket')
+    window = 'prefix-rate:acct:bucket:logs/:1000'
+
+    assert controller.take('logs/', 6)
+    # requests that don't fit aren't counted
+    assert not controller.take('logs/', 6)
+    assert int(redis_conn.get(window)) == 6
+    assert controller.take('logs/', 4)
+    assert int(redis_conn.get(window)) == 10
+
+    # waits for the next second
+    controller.acquire('logs/', 5)
+    assert clock.sleeps == [1.0]
+    assert int(redis_conn.get('prefix-rate:acct:bucket:logs/:1001')) == 5
+
+
+def test_controller_acquire_over_rate(redis_conn, clock, monkeypatch):
+    monkeypatch.setattr(worker, 'PREFIX_REQUEST_RATE', 10)
+    controller = worker.ThroughputController('acct:bucket')
+    controller.acquire('logs/', 25)
+    assert [int(redis_conn.get('prefix-rate:acct:bucket:logs/:%d' % t))
+            for t in (1000, 1001, 1002)] == [10, 10, 5]
+
+
+def throttle_error():
+    return ClientError({'Error': {'Code': 'SlowDown'}}, 'GetObject')
+
+
+def test_process_keyset_retries_throttled(redis_conn, clock, monkeypatch):
+    redis_conn.hset('bucket-regions', 'acct:bucket', 'us-east-1')
+    redis_conn.hset('bucket-versions', 'acct:bucket', 0)
+    redis_conn.hset('bucket-accounts', 'acct', json.dumps({'name': 'acct'}))
+
+    attempts = {}
+
+    def process_key(s3, bucket_name, key):
+        attempts[key['Key']] = attempts.get(key['Key'], 0) + 1
+        clock.now += 0.5
+        if key['Key'] == 'logs/b' and attempts['logs/b'] < 3:
+            raise throttle_error()
+        return False
+
+    visitor = mock.MagicMock(visitor_name='encrypt-keys', process_key=process_key)
+    monkeypatch.setattr(worker, 'get_key_visitors', lambda account_info: [visitor])
+    monkeypatch.setattr(worker, 'get_session', mock.MagicMock())
+    monkeypatch.setattr(worker, 'patch_ssl', lambda: None)
+
+    with mock.patch.object(worker.ThroughputController, 'record') as record:
+        worker.process_keyset('acct:bucket', ['logs/a', 'logs/b'])
+
+    assert attempts == {'logs/a': 1, 'logs/b': 3}
+    # backoff between attempts isn't counted as request time
+    assert len(clock.sleeps) == 2
+    # requests, throttles and seconds spent in requests
+    assert record.call_args[0][2:] == (4, 2, 2.0)
+    assert int(redis_conn.hget('keys-throttled', 'acct:bucket')) == 2
+    assert int(redis_conn.hget('keys-scanned', 'acct:bucket')) == 2
+
+
+def test_process_keyset_gives_up(redis_conn, clock, monkeypatch):
+    redis_conn.hset('bucket-regions', 'acct:bucket', 'us-east-1')
+    redis_conn.hset('bucket-versions', 'acct:bucket', 0)
+    redis_conn.hset('bucket-accounts', 'acct', json.dumps({'name': 'acct'}))
+
+    def process_key(s3, bucket_name, key):
+        raise throttle_error()
+
+    visitor = mock.MagicMock(visitor_name='encrypt-keys', process_key=process_key)
+    monkeypatch.setattr(worker, 'get_key_visitors', lambda account_info: [visitor])
+    monkeypatch.setattr(worker, 'get_session', mock.MagicMock())
+    monkeypatch.setattr(worker, 'patch_ssl', lambda: None)
+
+    worker.process_keyset('acct:bucket', ['logs/a'])
+    assert int(redis_conn.hget('keys-throttled', 'acct:bucket')) == worker.KEYSET_RETRIES
+    # throttled keysets back off the bucket
+    assert worker.ThroughputController('acct:bucket').get_settings() == (
+        worker.KEYSET_WORKERS[1] // 2, worker.KEYSET_CHUNK_SIZE[1] // 2)
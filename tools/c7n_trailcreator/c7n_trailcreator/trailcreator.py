@@ -10,7 +10,7 @@ __author__ = "Kapil Thangavelu <https://twitter.com/kapilvt>"
 from botocore.exceptions import ClientError
 import click
 from collections import Counter
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import contextlib
 from dateutil.parser import parse
 import json
@@ -220,27 +220,38 @@ def get_stream_records(stream, delimiter, stats):
             yield rr
 
 
+def get_select_query():
+    return TRAIL_S3_QUERY.format(
+        events="'%s'" % "', '".join({k[1] for k in resource_map}))
+
+
+def process_select_object(s3, trail_bucket, key, query=None):
+    """Query a cloudtrail s3 object for resource creation records.
+    """
+    stats = Counter()
+    delimiter = '\n'
+    result = s3.select_object_content(
+        Bucket=trail_bucket,
+        Key=key,
+        ExpressionType='SQL',
+        InputSerialization={'CompressionType': 'GZIP', 'JSON': {'Type': 'Document'}},
+        OutputSerialization={'JSON': {'RecordDelimiter': delimiter}},
+        Expression=query or get_select_query())
+    records = list(get_stream_records(result['Payload'], delimiter, stats))
+    return {'stats': dict(stats), 'records': records}
+
+
 def process_select_set(s3, trail_bucket, object_set):
     """Query cloudtrail s3 objects for resource creation records.
     """
-    global resource_map
-
-    q = TRAIL_S3_QUERY.format(
-        events="'%s'" % "', '".join({k[1] for k in resource_map}))
+    query = get_select_query()
     stats = Counter()
-    delimiter = '\n'
     resource_records = []
 
     for o in object_set:
-        result = s3.select_object_content(
-            Bucket=trail_bucket,
-            Key=o['Key'],
-            ExpressionType='SQL',
-            InputSerialization={'CompressionType': 'GZIP', 'JSON': {'Type': 'Document'}},
-            OutputSerialization={'JSON': {'RecordDelimiter': delimiter}},
-            Expression=q)
-        resource_records.extend(
-            get_stream_records(result['Payload'], delimiter, stats))
+        results = process_select_object(s3, trail_bucket, o['Key'], query)
+        stats.update(results['stats'])
+        resource_records.extend(results['records'])
     return {'stats': dict(stats), 'records': resource_records}
 
 
@@ -326,6 +337,7 @@ def process_athena_query(athena, workgroup, athena_db, table, athena_output,
         db.insert(results)
         db.flush()
     log.info("Athena Processed %d records" % stats['RecordCount'])
+    db.index_owners()
     return {'stats': dict(stats)}
 
 
@@ -351,6 +363,18 @@ class TrailDB:
               rtype        varchar(42),
               resource_ids varchar(256))'''
         self.cursor.execute(command)
+        # creators by resource id, derived from events once loaded
+        self.cursor.execute('''
+           create table if not exists resource_owners (
+              account_id   varchar(16),
+              region       varchar(16),
+              rtype        varchar(42),
+              resource_id  varchar(256),
+              user_id      varchar(128),
+              event_date   datetime)''')
+        self.cursor.execute('''
+           create index if not exists resource_owners_id
+           on resource_owners (account_id, region, rtype, resource_id)''')
 
     def insert(self, records):
         command = "insert into events values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
@@ -363,29 +387,62 @@ class TrailDB:
             time.sleep(3)
             self.conn.commit()
 
+    def index_owners(self):
+        """Rebuild the resource owner table from the loaded events.
+        """
+        t = time.time()
+        self.cursor.execute('delete from resource_owners')
+        events = self.conn.execute('''
+           select account_id, region, rtype, resource_ids, user_id, event_date
+           from events''')
+
+        def get_owners():
+            for account_id, region, rtype, resource_ids, user_id, event_date in events:
+                for rid in resource_ids.split(','):
+                    yield (account_id, region, rtype, rid.strip(), user_id, event_date)
+
+        self.cursor.executemany(
+            "insert into resource_owners values (?, ?, ?, ?, ?, ?)", get_owners())
+        self.flush()
+        log.info("Indexed resource owners time:%0.2f", time.time() - t)
+
+    def has_owner_index(self):
+        return bool(
+            self.conn.execute('select 1 from resource_owners limit 1').fetchone() or
+            not self.conn.execute('select 1 from events limit 1').fetchone())
+
     def get_type_record_stats(self, account_id, region):  # nosec
         self.cursor.execute('''
             select rtype, count(*) as rcount
-            from events
+            from resource_owners
             where account_id=:account_id
               and region=:region
             group by rtype
         ''', dict(account_id=account_id, region=region))
         return self.cursor.fetchall()
 
-    def get_resource_owners(self, resource_type, account_id, region):  # nosec
-        self.cursor.execute('''
-           select user_id, resource_ids
-           from events
-           where rtype=:resource_type
-             and account_id=:account_id
-             and region=:region
-           order by event_date
-        ''', dict(resource_type=resource_type, account_id=account_id, region=region))
-        return self.cursor.fetchall()
-
+    def get_resource_owners(self, resource_type, account_id, region, resource_ids):  # nosec
+        """Get the (user id, resource id) of creation events for the given resources.
 
-def process_bucket(session_factory, bucket_name, prefix, db_path):
+        Ordered by event date for each resource.
+        """
+        results = []
+        for id_set in chunks(resource_ids, 500):
+            self.cursor.execute('''
+               select user_id, resource_id
+               from resource_owners
+               where account_id=?
+                 and region=?
+                 and rtype=?
+                 and resource_id in (%s)
+               order by event_date
+            ''' % ", ".join("?" * len(id_set)),
+                [account_id, region, resource_type] + list(id_set))
+            results.extend(self.cursor.fetchall())
+        return results
+
+
+def process_bucket(session_factory, bucket_name, prefix, db_path, workers=16):
     session = session_factory()
     s3 = session.client('s3', config=Config(signature_version='s3v4'))
     paginator = s3.get_paginator('list_objects')
@@ -393,43 +450,52 @@ def process_bucket(session_factory, bucket_name, prefix, db_path):
     db = TrailDB(db_path)
     stats = Counter()
     t = time.time()
-    bsize = 100
-    workers = 10
+    query = get_select_query()
+    # bound objects in flight, so listing doesn't run ahead of selects.
+    max_pending = workers * 4
 
-    log.info("Processing workers:%d cloud-trail:%s page_size:%d", workers, prefix, bsize)
-    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
-        objects = page.get('Contents', ())
-        page_stats = Counter()
-        page_stats['ObjectCount'] += len(objects)
-        page_stats['ObjectSize'] += sum([o['Size'] for o in objects])
-
-        pt = time.time()
-
-        with ThreadPoolExecutor(max_workers=workers) as w:
-            futures = {}
-            for page_objects in chunks(objects, bsize):
+    def store(done):
+        for f in done:
+            key = futures.pop(f)
+            if f.exception():
+                log.error("err processing records %s %s", f.exception(), key)
+                stats['ObjectErrors'] += 1
+                continue
+            results = f.result()
+            stats['records'] += len(results['records'])
+            stats.update(results['stats'])
+            for r in results['records']:
+                stats[r[-2]] += 1
+            db.insert(results['records'])
+
+    log.info("Processing workers:%d cloud-trail:%s", workers, prefix)
+    with ThreadPoolExecutor(max_workers=workers) as w:
+        futures = {}
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            objects = page.get('Contents', ())
+            stats['ObjectCount'] += len(objects)
+            stats['ObjectSize'] += sum([o['Size'] for o in objects])
+
+            pt = time.time()
+            for o in objects:
+                if len(futures) >= max_pending:
+                    store(wait(futures, return_when=FIRST_COMPLETED).done)
                 futures[w.submit(
-                    process_select_set, s3, bucket_name, page_objects)] = page_objects
-
-            for f in as_completed(futures):
-                if f.exception():
-                    log.error("err processing records %s %s", f.exception(), futures[f])
-
-                results = f.result()
-                page_stats['records'] += len(results['records'])
-                page_stats.update(results['stats'])
-                for r in results['records']:
-                    page_stats[r[-2]] += 1
-                db.insert(results['records'])
-
+                    process_select_object, s3, bucket_name, o['Key'], query)] = o['Key']
             db.flush()
 
-        log.info("Processed page time:%0.2f stats:%s", time.time() - pt, page_stats)
-        if objects:
-            log.info('Last Page Key: %s', objects[-1]['Key'])
+            log.info("Processed page time:%0.2f objects:%d scanned:%s returned:%s",
+                     time.time() - pt, stats['ObjectCount'],
+                     format_bytes(stats['BytesScanned']), format_bytes(stats['BytesReturned']))
+            if objects:
+                log.info('Last Page Key: %s', objects[-1]['Key'])
+
+        store(list(as_completed(futures)))
+        db.flush()
 
-        stats.update(page_stats)
-    log.info("Finished %0.2f seconds stats:%s", time.time() - t, stats)
+    db.index_owners()
+    log.info("Finished %0.2f seconds scanned:%s stats:%s",
+             time.time() - t, format_bytes(stats['BytesScanned']), stats)
 
 
 class ResourceTagger:
@@ -448,13 +514,14 @@ class ResourceTagger:
                 self.config['account_id'], self.config['region']):
             if self.types and rtype not in self.types:
                 continue
-            resource_map = self.get_creator_resource_map(rtype)
             resources, rmgr = self.get_untagged_resources(rtype)
 
             if not len(resources):
                 continue
 
             rtype_id = rmgr.resource_type.id
+            resource_map = self.get_creator_resource_map(
+                rtype, [r[rtype_id] for r in resources])
             # regroup by user/tag value to minimize api calls
             user_resources = {}
             found = 0
@@ -503,24 +570,17 @@ class ResourceTagger:
             for resource_set in chunks(resources, tagger.batch_size):
                 tagger.process_resource_set(client, resource_set, tags)
 
-    def get_creator_resource_map(self, rtype):
-        """Return a map of resource id to creator for the given resource type.
+    def get_creator_resource_map(self, rtype, resource_ids):
+        """Return a map of resource id to creator for the given resources.
         """
         resource_map = {}
-        for user_id, resource_ids in self.trail_db.get_resource_owners(
-                rtype, self.config['account_id'], self.config['region']):
+        for user_id, rid in self.trail_db.get_resource_owners(
+                rtype, self.config['account_id'], self.config['region'], resource_ids):
             if self.user_suffix and not user_id.endswith(self.user_suffix):
                 continue
             if 'AWSServiceRole' in user_id:
                 continue
-
-            if ',' in resource_ids:
-                resource_ids = [rid.strip() for rid in resource_ids.split(',')]
-            else:
-                resource_ids = [resource_ids]
-
-            for rid in resource_ids:
-                resource_map[rid] = user_id.rsplit('/', 1)[-1]
+            resource_map[rid] = user_id.rsplit('/', 1)[-1]
         return resource_map
 
     def get_untagged_resources(self, rtype):
@@ -616,14 +676,15 @@ def cli():
 @click.option("--year", help="Only process trail events for the given year")
 @click.option("--assume", help="Assume role for trail bucket access")
 @click.option("--profile", help="AWS cli profile for trail bucket access")
+@click.option("--workers", type=int, default=16, help="Concurrent s3 select queries")
 def load(bucket, prefix, account, org_id, region, resource_map, db, day, month, year,
-         assume, profile):
+         assume, profile, workers):
     """Ingest cloudtrail events from s3 into resource owner db.
     """
     load_resource_map(resource_map)
     prefix = get_bucket_path(prefix, account, region, day, month, year, org_id)
     session_factory = SessionFactory(region=region, profile=profile, assume_role=assume)
-    process_bucket(session_factory, bucket, prefix, db)
+    process_bucket(session_factory, bucket, prefix, db, workers)
 
 
 @cli.command('load-athena')
@@ -702,6 +763,12 @@ def tag_org(config, db, region, creator_tag, user_suffix, dryrun,
     total = 0
     start_exec = time.time()
 
+    # index owners once, rather than in each account region's worker
+    trail_db = TrailDB(db)
+    if not trail_db.has_owner_index():
+        trail_db.index_owners()
+    trail_db.conn.close()
+
     with executor(max_workers=WORKER_COUNT) as w:
         futures = {}
         for a in accounts_config['accounts']:
@@ -760,6 +827,8 @@ def tag(assume, region, db, creator_tag, user_suffix, dryrun,
     """Tag resources with their creator.
     """
     trail_db = TrailDB(db)
+    if not trail_db.has_owner_index():
+        trail_db.index_owners()
     load_resources(resource_types=('aws.*',))
 
     with temp_dir() as output_dir:
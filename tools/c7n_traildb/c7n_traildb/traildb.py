@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import argparse
+import codecs
 from dateutil.parser import parse
 from functools import partial
 from gzip import GzipFile
@@ -11,15 +12,11 @@ import math
 from multiprocessing import cpu_count, Pool
 from c7n.credentials import SessionFactory
 import os
+import re
 import tempfile
 import time
 import sqlite3
 
-try:
-    from cStringIO import StringIO
-except ImportError:
-    from io import BytesIO as StringIO
-
 from botocore.client import Config
 
 
@@ -48,6 +45,54 @@ def chunks(iterable, size=50):
         yield batch
 
 
+RECORDS_START = re.compile(r'"Records"\s*:\s*\[')
+RECORDS_SEPARATOR = re.compile(r'[\s,]*')
+
+
+def iter_trail_records(fh, buffer_size=1024 * 1024):
+    """Decode the records of a cloudtrail log file incrementally.
+
+    Trail files are a single json object with a Records array, which
+    is decoded a record at a time as the file is read, rather than
+    reading and loading the whole file.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf8')()
+    buf = ''
+    in_records = False
+    while True:
+        chunk = fh.read(buffer_size)
+        text = buf + text_decoder.decode(chunk, final=not chunk)
+        pos = 0
+        if not in_records:
+            match = RECORDS_START.search(text)
+            if match is None:
+                if not chunk:
+                    return
+                buf = text
+                continue
+            in_records = True
+            pos = match.end()
+        end = len(text)
+        while True:
+            pos = RECORDS_SEPARATOR.match(text, pos).end()
+            if pos >= end:
+                break
+            if text[pos] == ']':
+                return
+            try:
+                record, pos = decoder.raw_decode(text, pos)
+            except json.JSONDecodeError:
+                # a partial record, unless there's nothing left to read
+                if not chunk:
+                    raise
+                break
+            yield record
+        buf = text[pos:]
+        if not chunk:
+            return
+
+
 def process_trail_set(
         object_set, map_records, reduce_results=None, trail_bucket=None):
 
@@ -60,20 +105,35 @@ def process_trail_set(
     previous = None
     for o in object_set:
         body = s3.get_object(Key=o['Key'], Bucket=trail_bucket)['Body']
-        fh = GzipFile(fileobj=StringIO(body.read()))
-        data = json.load(fh)
-        s = map_records(data['Records'])
+        s = map_records(iter_trail_records(GzipFile(fileobj=body)))
         if reduce_results:
             previous = reduce_results(s, previous)
     return previous
 
 
 class TrailDB:
+    """Sqlite database of trail events.
+
+    Events are bulk loaded with write ahead logging, committing every
+    batch_size records, and indexed once loaded.
+    """
+
+    batch_size = 50000
+
+    indices = {
+        'events_date': ('event_date',),
+        'events_user': ('user_id', 'event_date'),
+        'events_source': ('event_source', 'event_name'),
+        'events_name': ('event_name', 'event_date'),
+    }
 
     def __init__(self, path):
         self.path = path
         self.conn = sqlite3.connect(self.path)
         self.cursor = self.conn.cursor()
+        self.cursor.execute('pragma journal_mode = wal')
+        self.cursor.execute('pragma synchronous = normal')
+        self.cursor.execute('pragma temp_store = memory')
         self._init()
 
     def _init(self):
@@ -97,17 +157,37 @@ class TrailDB:
         self.cursor.execute(command)
 
     def insert(self, records):
+        """Insert an iterable of records, a transaction per batch_size."""
         command = "insert into events values (?, ?, ?, ?, ?, ?, ?, ?, ?"
 
         if options.field:
             command += ', ?' * len(options.field)
 
         command += ")"
-        self.cursor.executemany(command, records)
+        count = 0
+        for batch in chunks(records, self.batch_size):
+            self.cursor.executemany(command, batch)
+            self.conn.commit()
+            count += len(batch)
+        return count
 
     def flush(self):
         self.conn.commit()
 
+    def create_indices(self):
+        t = time.time()
+        for name, columns in self.indices.items():
+            self.cursor.execute(
+                "create index if not exists %s on events (%s)" % (name, ", ".join(columns)))
+        self.cursor.execute('analyze')
+        self.conn.commit()
+        log.info("Indexed events time:%0.2fs", time.time() - t)
+
+    def close(self):
+        # leave a self contained database file for readers
+        self.cursor.execute('pragma journal_mode = delete')
+        self.conn.close()
+
 
 def reduce_records(x, y):
     if y is None:
@@ -150,6 +230,10 @@ def process_records(records,
                     data_dir=None):
 
     user_records = []
+    if data_dir:
+        # Spool to temporary files to get out of mem
+        fh = tempfile.NamedTemporaryFile(dir=data_dir, delete=False, mode='w')
+    record_count = 0
     for r in records:
         if not_service_filter and r['eventSource'] == not_service_filter:
             continue
@@ -189,20 +273,28 @@ def process_records(records,
             for field in options.field:
                 user_record += (json.dumps(r[field]), )
 
-        user_records.append(user_record)
+        record_count += 1
+        if data_dir:
+            fh.write(dump(user_record))
+            fh.write('\n')
+        else:
+            user_records.append(user_record)
 
     if data_dir:
-        if not user_records:
-            return
-        # Spool to temporary files to get out of mem
-        fh = tempfile.NamedTemporaryFile(dir=data_dir, delete=False, mode='w')
-        fh.write(dump(user_records))
-        fh.flush()
         fh.close()
+        if not record_count:
+            os.remove(fh.name)
+            return
         return [fh.name]
     return user_records
 
 
+def load_spool(fpath):
+    with open(fpath) as fh:
+        for line in fh:
+            yield tuple(load(line))
+
+
 def process_bucket(
         bucket_name, prefix,
         output=None, uid_filter=None, event_filter=None,
@@ -245,32 +337,33 @@ def process_bucket(
         object_count += len(objects)
         object_size += sum([o['Size'] for o in objects])
 
+        # store each object set's records as soon as they're parsed
         pt = time.time()
         if pool:
-            results = pool.map(object_processor, chunks(objects, bsize))
+            results = pool.imap_unordered(object_processor, chunks(objects, bsize))
         else:
             results = map(object_processor, chunks(objects, bsize))
 
-        st = time.time()
-        log.info("Loaded page time:%0.2fs", st - pt)
-
+        record_count = 0
         for r in results:
-            for fpath in r:
-                with open(fpath) as fh:
-                    db.insert(load(fh.read()))
+            for fpath in r or ():
+                record_count += db.insert(load_spool(fpath))
                 os.remove(fpath)
             db.flush()
 
         l = t # NOQA
         t = time.time()
 
-        log.info("Stored page time:%0.2fs", t - st)
         log.info(
-            "Processed paged time:%0.2f size:%s count:%s" % (
-                t - l, object_size, object_count))
+            "Processed paged time:%0.2f parse+store:%0.2f size:%s count:%s records:%d" % (
+                t - l, t - pt, object_size, object_count, record_count))
         if objects:
             log.info('Last Page Key: %s', objects[-1]['Key'])
 
+    pool.close()
+    db.create_indices()
+    db.close()
+
 
 def get_bucket_path(options):
     prefix = "AWSLogs/%(account)s/CloudTrail/%(region)s/" % {
@@ -162,8 +162,10 @@ def query_by(
                     t.c.error_code != 'Client.RequestLimitExceeded')))
 
     if since:
+        # filter on the event_date column, rather than the derived
+        # short_time, so the event date index is used.
         query = query.where(
-            rdb.text("short_time > '%s'" % (since.strftime("%Y-%m-%dT%H:%M"))))
+            t.c.event_date >= (since + datetime.timedelta(minutes=1)).strftime("%Y-%m-%dT%H:%M"))
 
     return query
 